@@ -1,8 +1,39 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+_start_import = time.perf_counter()
 from routers import ocr_router, vector_db_router, chat_router, normal_chat_router
+from services.chat.history_service import aclose_redis_clients
+from services.embedding.embedding_service import check_embedding_backend
+from services.llm.gemini_client import aclose_gemini_clients
+from services.ocr.cache_service import flush_result_cache
+from services.ocr.job_service import shutdown_jobs
+from services.warmup_service import get_preload_subsystems, get_readiness, warm_up
+# 라우터/서비스 import에 걸린 시간 (준비 상태 응답에 포함)
+_IMPORT_SECONDS = round(time.perf_counter() - _start_import, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 무거운 초기화(모델 로드, 외부 클라이언트 생성)는 백그라운드에서 진행
+    # - 그동안 /health/live 는 응답하고, /health/ready 는 준비가 끝나야 200
+    # 임베딩 백엔드에 필요한 패키지가 없으면 요청을 받기 전에 시작 실패
+    check_embedding_backend()
+    subsystems = get_preload_subsystems()
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, subsystems))
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    # 종료 시 OCR 작업/캐시 정리 및 Gemini/Redis 커넥션 풀 정리
+    shutdown_jobs()
+    flush_result_cache()
+    await aclose_gemini_clients()
+    await aclose_redis_clients()
 
 # FastAPI 앱 생성
-app = FastAPI(title="RAG System API")
+app = FastAPI(title="RAG System API", lifespan=lifespan)
 
 # 라우터 등록
 app.include_router(ocr_router.router, prefix="/rag", tags=["OCR"])
@@ -19,4 +50,16 @@ def root():
 
 @app.get("/health")
 def health():
-    return{"status": "ok"}
\ No newline at end of file
+    return{"status": "ok"}
+
+@app.get("/health/live")
+def liveness():
+    # 프로세스가 살아 있는지만 확인 (웜업 상태와 무관)
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness():
+    # 미리 로드하기로 한 서브시스템이 모두 준비되어야 트래픽을 받을 수 있음
+    readiness_info = {**get_readiness(), "import_seconds": _IMPORT_SECONDS}
+    status_code = 200 if readiness_info["ready"] else 503
+    return JSONResponse(status_code=status_code, content=readiness_info)
@@ -1,43 +1,37 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import Optional, List
-from services.chat.chat_service import chat_with_llm
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from typing import Dict, Optional, List, Tuple
+from services.chat.chat_service import chat_with_llm, stream_chat_with_llm, load_history, FALLBACK_ANSWER
+from services.chat.history_service import aappend_turn
+from services.chat import answer_cache
+from services.chat.context_cache_service import pick_deck
+from services.embedding.embedding_service import get_embedding_model
+from services.embedding.rerank_service import candidate_count, rerank
 from services.embedding.vector_db_service import search_documents
+from services.chat.attachment_service import check_file_count, read_images
+from utils.sse_utils import sse_event
+import asyncio
 import time
 
 router = APIRouter()
 
 INDEX_NAME = "rag-slides-index"
 
-@router.post("/chat")
-async def rag_chat_endpoint(
-    user_id: str = Form(...),
-    query: str = Form(...),
-    session_id: Optional[str] = Form(None),
-    n_turns: int = Form(6),
-    files: List[UploadFile] = File(default_factory=list) # 여러 이미지 파일(선택 사항)
-):
+def _retrieve_context(user_id: str, query: str) -> Tuple[List[Dict], str, Dict]:
     """
-    RAG + 최근 히스토리 기반 챗 (이미지 첨부 가능)
+    벡터 DB 검색 → 재순위화 후 (응답용 source_documents, LLM 컨텍스트 문자열, 단계별 시간) 반환
+    - 스레드에서 실행되므로 요청의 timing에 직접 쓰지 않고 따로 모아 반환 (이벤트 루프에서 합침)
     """
-    
-    # 첨부 이미지 개수 제한
-    if len(files) > 3:
-        raise HTTPException(
-            status_code=400,  # 400 Bad Request 에러
-            detail="이미지는 최대 3개까지만 업로드할 수 있습니다."
-        )
-    
-    timing = {}
-    start_total = time.perf_counter()
-    
-    # 1. 벡터 데이터베이스에서 관련 문서 검색 (함수 직접 호출)
+    timing: Dict = {}
+    # 1. 벡터 데이터베이스에서 관련 문서 후보 검색 (재순위화를 쓰면 넓게 뽑음)
     start = time.perf_counter()
     try:
         results = search_documents(
             index_name=INDEX_NAME,
             namespace=user_id,
             query=query,
-            k=3 # 검색할 문서의 수
+            k=candidate_count(3), # 검색할 문서의 수
+            timing=timing
         )
     except Exception as e:
         # 검색 실패 시, LLM에 컨텍스트 없이 질문
@@ -47,7 +41,18 @@ async def rag_chat_endpoint(
         end = time.perf_counter()
         timing['vector_db_search'] = round(end - start, 3)
 
-    # 2. 검색 결과를 바탕으로 LLM에 전달할 컨텍스트 생성
+    # 2. 재순위화 후 점수 임계값/개수로 자르기 (토큰 예산은 프롬프트 조립에서)
+    start = time.perf_counter()
+    try:
+        results = rerank(query, results, timing=timing, score_kind=timing.get('retrieval_score_kind', "cosine"))
+    except Exception as e:
+        # 재순위화 실패 시 검색 순서 그대로 상위 3개 사용
+        print(f"[WARN] 재순위화 실패: {e}")
+        results = results[:3]
+    finally:
+        timing['rerank'] = round(time.perf_counter() - start, 3)
+
+    # 3. 검색 결과를 바탕으로 LLM에 전달할 컨텍스트 생성
     source_documents = []
     context_chunks = []
     for doc, score in results:
@@ -58,39 +63,127 @@ async def rag_chat_endpoint(
         })
         context_chunks.append(doc.page_content)
 
-    context_text = "\n\n".join(context_chunks)
-    
-    # 이미지 데이터 처리
-    list_of_images = []
+    return source_documents, "\n\n".join(context_chunks), timing
+
+async def _prefetch(
+    user_id: str,
+    session_id: str,
+    query: str,
+    n_turns: int,
+    files: List[UploadFile],
+    timing: Dict,
+    history: Optional[Tuple[Optional[str], List[Tuple[str, str]]]] = None
+) -> Tuple[List[Dict], str, Tuple[Optional[str], List[Tuple[str, str]]], List[Dict]]:
+    """
+    벡터 검색(+재순위화), 히스토리 읽기, 첨부 이미지 읽기를 동시에 진행
+    - 검색은 동기 호출이라 스레드에서 실행, 히스토리는 비동기 Redis 클라이언트로 읽음 (이벤트 루프를 막지 않음)
+    - history: 이미 읽어 둔 (요약, 최근 턴)이 있으면 다시 읽지 않음
+    - 단계별 시간은 각 단계가 timing에 기록 (검색 단계는 스레드에서 모은 값을 끝나고 합침), prefetch는 전체 대기 시간
+    """
+    async def _history() -> Tuple[Optional[str], List[Tuple[str, str]]]:
+        if history is not None:
+            return history
+        return await load_history(user_id, session_id, n_turns, timing)
+
     start = time.perf_counter()
-    if files:
-        for file in files:
-            image_data = {
-                "mime_type": file.content_type,
-                "data": await file.read()
+    (source_documents, context_text, retrieval_timing), history, list_of_images = await asyncio.gather(
+        asyncio.to_thread(_retrieve_context, user_id, query),
+        _history(),
+        read_images(files, timing)
+    )
+    timing.update(retrieval_timing)
+    timing['prefetch'] = round(time.perf_counter() - start, 3)
+    return source_documents, context_text, history, list_of_images
+
+@router.post("/chat")
+async def rag_chat_endpoint(
+    user_id: str = Form(...),
+    query: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    n_turns: int = Form(6),
+    files: List[UploadFile] = File(default_factory=list) # 여러 이미지 파일(선택 사항)
+):
+    """
+    RAG + 최근 히스토리 기반 챗 (이미지 첨부 가능)
+    """
+    check_file_count(files)
+
+    timing = {}
+    start_total = time.perf_counter()
+
+    # session_id 없을때 테스트 용
+    effective_session_id = session_id or "local_test"
+
+    # 0. 시맨틱 캐시 조회 (이미지 첨부 질문은 캐시하지 않음)
+    # - 답변은 세션 히스토리에도 의존하므로 ("더 자세히 설명해줘" 같은 후속 질문) 히스토리가 없는 질문만 조회/저장
+    # - 문서 버전(Redis)을 같이 읽어 다른 워커에서 문서가 바뀐 뒤의 캐시는 쓰지 않음
+    query_embedding = None
+    cache_version = None
+    history = None
+    if answer_cache.SEMANTIC_CACHE_ENABLED and not files:
+        start = time.perf_counter()
+        embedding, history, version = await asyncio.gather(
+            get_embedding_model().aembed_query(query),
+            load_history(user_id, effective_session_id, n_turns, timing),
+            answer_cache.aget_version(user_id)
+        )
+        history_summary, recent_pairs = history
+        cached = None
+        if history_summary or recent_pairs:
+            timing['semantic_cache'] = "skipped_history"
+        elif version is None:
+            timing['semantic_cache'] = "unavailable"
+        else:
+            query_embedding, cache_version = embedding, version
+            cached = answer_cache.lookup(user_id, query_embedding, cache_version)
+            timing['semantic_cache'] = "miss"
+        timing['semantic_cache_lookup'] = round(time.perf_counter() - start, 3)
+        if cached is not None:
+            # 캐시 적중이어도 대화 흐름 유지를 위해 히스토리에는 저장
+            await aappend_turn(user_id, effective_session_id, query, cached["response"])
+            timing['semantic_cache'] = "hit"
+            timing['semantic_cache_similarity'] = cached["similarity"]
+            timing['total_endpoint'] = round(time.perf_counter() - start_total, 3)
+            return {
+                "status": "success",
+                "user_id": user_id,
+                "session_id": session_id,
+                "query": query,
+                "response": cached["response"],
+                "source_documents": cached["source_documents"],
+                "timing": timing
             }
-            list_of_images.append(image_data)
-    end = time.perf_counter()
-    timing['image_processing'] = round(end - start, 3)
+
+    # 1~2. 검색, 히스토리, 이미지 읽기를 동시에 (캐시 조회 때 읽은 히스토리는 재사용)
+    source_documents, context_text, (history_summary, recent_pairs), list_of_images = await _prefetch(
+        user_id, effective_session_id, query, n_turns, files, timing, history
+    )
 
     # 3. LLM 서비스 호출하여 RAG 응답 생성
     start = time.perf_counter()
     try:
-        # session_id 없을때 테스트 용
-        effective_session_id = session_id or "local_test"
-        
+
         llm_response = await chat_with_llm(
             user_id=user_id,
             session_id=effective_session_id,
             query=query,
             context=context_text,
             n_turns=n_turns,
-            images=list_of_images
+            images=list_of_images,
+            recent_pairs=recent_pairs,
+            history_summary=history_summary,
+            context_chunks=[(doc["page_content"], doc["score"]) for doc in source_documents],
+            deck=pick_deck(source_documents),
+            timing=timing
         )
     finally:
         end = time.perf_counter()
         timing['llm_response'] = round(end - start, 3)
-        
+
+    # 히스토리가 없는 질문의 답변만 저장 (query_embedding은 그때만 설정됨)
+    if query_embedding is not None and llm_response != FALLBACK_ANSWER:
+        answer_cache.store(user_id, query, query_embedding, llm_response, source_documents, cache_version)
+
     timing['total_endpoint'] = round(time.perf_counter() - start_total, 3)
     
     return {
@@ -103,3 +196,83 @@ async def rag_chat_endpoint(
         "timing": timing
     }
 
+@router.post("/chat/stream")
+async def rag_chat_stream_endpoint(
+    user_id: str = Form(...),
+    query: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    n_turns: int = Form(6),
+    files: List[UploadFile] = File(default_factory=list) # 여러 이미지 파일(선택 사항)
+):
+    """
+    RAG 챗 스트리밍 (SSE)
+    - sources: 검색된 슬라이드 (생성 시작 전에 먼저 전송)
+    - token: 생성되는 텍스트 조각
+    - error: 생성 실패 (partial=true면 앞서 보낸 조각은 잘린 답변)
+    - done: status(success/error)와 단계별 소요 시간 (time_to_first_token 포함)
+    """
+    check_file_count(files)
+
+    timing = {}
+    start_total = time.perf_counter()
+
+    # session_id 없을때 테스트 용
+    effective_session_id = session_id or "local_test"
+
+    source_documents, context_text, (history_summary, recent_pairs), list_of_images = await _prefetch(
+        user_id, effective_session_id, query, n_turns, files, timing
+    )
+
+    async def event_stream():
+        yield sse_event("sources", {
+            "user_id": user_id,
+            "session_id": session_id,
+            "query": query,
+            "source_documents": source_documents
+        })
+
+        start = time.perf_counter()
+        first_token = True
+        status = "success"
+        try:
+            async for chunk in stream_chat_with_llm(
+                user_id=user_id,
+                session_id=effective_session_id,
+                query=query,
+                context=context_text,
+                n_turns=n_turns,
+                images=list_of_images,
+                recent_pairs=recent_pairs,
+                history_summary=history_summary,
+                context_chunks=[(doc["page_content"], doc["score"]) for doc in source_documents],
+                deck=pick_deck(source_documents),
+                timing=timing
+            ):
+                if first_token:
+                    timing['time_to_first_token'] = round(time.perf_counter() - start, 3)
+                    first_token = False
+                yield sse_event("token", {"text": chunk})
+        except Exception:
+            # 실패한/잘린 답변을 정상 답변과 구분할 수 있도록 error 이벤트 전송 (partial: 이미 일부 조각을 보냈는지)
+            status = "error"
+            yield sse_event("error", {"message": FALLBACK_ANSWER, "partial": not first_token})
+
+        timing['llm_response'] = round(time.perf_counter() - start, 3)
+        timing['total_endpoint'] = round(time.perf_counter() - start_total, 3)
+        yield sse_event("done", {"status": status, "timing": timing})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chat/cache/metrics")
+async def semantic_cache_metrics():
+    """
+    시맨틱 캐시 지표 (프로세스 전체 누적 적중/미스 수, 적중률)
+    """
+    return {
+        "status": "success",
+        "metrics": answer_cache.get_stats()
+    }
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
-from services.chat.normal_chat_service import normal_chat_with_llm
+from services.chat.chat_service import FALLBACK_ANSWER
+from services.chat.normal_chat_service import normal_chat_with_llm, stream_normal_chat_with_llm
+from services.chat.attachment_service import check_file_count, read_images
+from utils.sse_utils import sse_event
 import time
 
 router = APIRouter()
@@ -16,29 +20,12 @@ async def normal_chat_endpoint(
     """
     VectorDB 미사용 일반 챗 + 최근 히스토리 기반 챗 (이미지 첨부 가능)
     """
-    
-    # 첨부 이미지 개수 제한
-    if len(files) > 3:
-        raise HTTPException(
-            status_code=400,  # 400 Bad Request 에러
-            detail="이미지는 최대 3개까지만 업로드할 수 있습니다."
-        )
-    
+    check_file_count(files)
+
     timing = {}
     start_total = time.perf_counter()
-    
-    # 이미지 데이터 처리
-    list_of_images = []
-    start = time.perf_counter()
-    if files:
-        for file in files:
-            image_data = {
-                "mime_type": file.content_type,
-                "data": await file.read()
-            }
-            list_of_images.append(image_data)
-    end = time.perf_counter()
-    timing['image_processing'] = round(end - start, 3)
+
+    list_of_images = await read_images(files, timing)
     
     start = time.perf_counter()
     try:
@@ -50,7 +37,8 @@ async def normal_chat_endpoint(
             session_id=effective_session_id,
             query=query,
             n_turns=n_turns,
-            images=list_of_images
+            images=list_of_images,
+            timing=timing
         )
     finally:
         end = time.perf_counter()
@@ -65,4 +53,63 @@ async def normal_chat_endpoint(
         "query": query,
         "response": llm_response,
         "timing": timing
-    }
\ No newline at end of file
+    }
+
+@router.post("/chat/stream")
+async def normal_chat_stream_endpoint(
+    user_id: str = Form(...),
+    query: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    n_turns: int = Form(6),
+    files: List[UploadFile] = File(default_factory=list) # 여러 이미지 파일(선택 사항)
+):
+    """
+    일반 챗 스트리밍 (SSE): token 이벤트로 텍스트 조각, 마지막 done 이벤트로 status/소요 시간 전송
+    - 생성이 실패하면 done 앞에 error 이벤트 (partial=true면 앞서 보낸 조각은 잘린 답변)
+    """
+    check_file_count(files)
+
+    timing = {}
+    start_total = time.perf_counter()
+
+    list_of_images = await read_images(files, timing)
+
+    # session_id 없을때 테스트 용
+    effective_session_id = session_id or "local_test"
+
+    async def event_stream():
+        start = time.perf_counter()
+        first_token = True
+        status = "success"
+        try:
+            async for chunk in stream_normal_chat_with_llm(
+                user_id=user_id,
+                session_id=effective_session_id,
+                query=query,
+                n_turns=n_turns,
+                images=list_of_images,
+                timing=timing
+            ):
+                if first_token:
+                    timing['time_to_first_token'] = round(time.perf_counter() - start, 3)
+                    first_token = False
+                yield sse_event("token", {"text": chunk})
+        except Exception:
+            # 실패한/잘린 답변을 정상 답변과 구분할 수 있도록 error 이벤트 전송 (partial: 이미 일부 조각을 보냈는지)
+            status = "error"
+            yield sse_event("error", {"message": FALLBACK_ANSWER, "partial": not first_token})
+
+        timing['llm_response'] = round(time.perf_counter() - start, 3)
+        timing['total_endpoint'] = round(time.perf_counter() - start_total, 3)
+        yield sse_event("done", {
+            "status": status,
+            "user_id": user_id,
+            "session_id": session_id,
+            "timing": timing
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
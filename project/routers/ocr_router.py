@@ -1,58 +1,108 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+import asyncio
 import os
-from services.ocr.pipeline_service import process_pdf_pipeline
+from services.ocr.job_service import (
+    submit_job,
+    get_job,
+    cancel_job,
+    JOB_SUCCEEDED
+)
 from utils.file_utils import create_session_dir
-from services.convert.ppt_to_pdf_service import ensure_pdf, PPT2PDFError
 import time
 
 router = APIRouter()
 
-@router.post("/ocr")
-async def process_pdf(
-    user_id: str = Form(...),
-    file: UploadFile = File(...)
-):
+def _write_upload(path: str, content: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(content)
+
+async def _save_upload(user_id: str, file: UploadFile):
     # 사용자별 세션 디렉토리 생성
     session_dir = create_session_dir("output", user_id)
 
     # pdf 파일 저장 경로: output/{user_id}/{timestamp}/{timestamp}_{filename}
     # basename는 경로의 가장 마지막 경로를 반환함
-    pdf_path = os.path.join(session_dir, f"{os.path.basename(session_dir)}_{file.filename}")
-    
+    upload_path = os.path.join(session_dir, f"{os.path.basename(session_dir)}_{file.filename}")
+
+    # 업로드 파일을 그대로 저장 (디스크 쓰기는 이벤트 루프 밖에서)
+    await asyncio.to_thread(_write_upload, upload_path, await file.read())
+    return session_dir, upload_path
+
+@router.post("/ocr")
+async def process_pdf(
+    user_id: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    업로드 후 파이프라인 완료까지 기다렸다가 결과 반환 (기존 동작 유지)
+    - 실제 처리는 작업 풀에서 실행되므로 이벤트 루프를 막지 않음
+    """
     start_total = time.perf_counter()
-    
-    # 1) 업로드 파일을 그대로 저장 
-    with open(pdf_path, "wb") as f:
-        f.write(await file.read())
-
-    # 2) PPT/PPTX이면 PDF로 변환 
-    #    - PDF면 그대로 경로 반환
-    #    - 변환 실패 시 명확한 에러 반환
-    start_conv = time.perf_counter()
+    session_dir, upload_path = await _save_upload(user_id, file)
+
+    job = submit_job(user_id, upload_path, session_dir)
     try:
-        pdf_path = ensure_pdf(pdf_path, session_dir)
-    except PPT2PDFError as e:
-        # 변환 실패 시 기존 파이프라인 진입 전 에러 응답
+        await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        # 작업이 DELETE로 취소된 경우 (요청 자체가 끊긴 경우는 그대로 전파)
+        if not job.cancel_event.is_set():
+            raise
+
+    if job.status != JOB_SUCCEEDED:
+        # PPT 변환 실패 등은 기존과 같이 에러 응답
         return {
             "status": "error",
             "user_id": user_id,
             "session_dir": session_dir,
-            "message": str(e)
+            "job_id": job.job_id,
+            "message": job.message or job.status
         }
-    end_conv = time.perf_counter()
 
-    # 3) 전체 파이프라인 실행 
-    results, timing_pipeline = process_pdf_pipeline(pdf_path, session_dir)
-    
-    end_total = time.perf_counter()
-    # 총 소요시간(업로드+변환+파이프라인) 기록 
-    timing_pipeline["ppt2pdf_time"] = round(end_conv - start_conv, 3)
-    timing_pipeline["total_time"] = round(end_total - start_total, 3)
+    # 총 소요시간(업로드+변환+파이프라인) 기록
+    timing_pipeline = dict(job.timing)
+    timing_pipeline["total_time"] = round(time.perf_counter() - start_total, 3)
 
     return {
         "status": "success",
         "user_id": user_id,
         "session_dir": session_dir,
-        "files": results,
+        "files": job.results,
         "timing": timing_pipeline
     }
+
+@router.post("/ocr/jobs")
+async def create_ocr_job(
+    user_id: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    OCR 작업을 백그라운드로 등록하고 job_id 즉시 반환
+    """
+    session_dir, upload_path = await _save_upload(user_id, file)
+    job = submit_job(user_id, upload_path, session_dir)
+    return {
+        "status": "accepted",
+        "user_id": user_id,
+        "job_id": job.job_id,
+        "session_dir": session_dir
+    }
+
+@router.get("/ocr/jobs/{job_id}")
+async def get_ocr_job(job_id: str):
+    """
+    작업 상태, 슬라이드 단위 진행률, 부분 결과 조회
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job.to_dict()
+
+@router.delete("/ocr/jobs/{job_id}")
+async def cancel_ocr_job(job_id: str):
+    """
+    작업 취소 (이미 처리된 슬라이드 결과는 유지)
+    """
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job.to_dict()
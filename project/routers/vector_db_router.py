@@ -1,43 +1,53 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List
+from typing import List, Optional
+import asyncio
 import os
 import time
 
-from services.embedding.document_loader import load_slide_documents_from_folder
-from services.embedding.vector_db_service import (
-    get_vector_store,
-    add_documents_to_vector_db,
-    search_documents
-)
+from services.chat.answer_cache import invalidate_namespace
+from services.chat.context_cache_service import invalidate_user
+from services.embedding.embedding_service import get_embedding_metrics
+from services.embedding.ingest_service import ingest_folder
+from services.embedding.vector_db_service import search_documents
+from utils.file_utils import SLIDES_BASE_DIR
 
 router = APIRouter()
 
 # 환경 설정
-BASE_DIR = "/app/output"
 INDEX_NAME = "rag-slides-index"
 
 @router.post("/vectordb/add")
 async def add_documents_endpoint(
     user_id: str = Query(..., description="사용자 ID (namespace로 사용)"),
-    date_folder: str = Query(..., description="슬라이드 JSON이 있는 날짜 폴더명")
+    date_folder: str = Query(..., description="슬라이드 JSON이 있는 날짜 폴더명"),
+    force: bool = Query(False, description="manifest를 무시하고 덱 전체를 다시 적재 (이전 방식으로 적재된 같은 덱 벡터도 삭제)")
 ):
     """
-    사용자별 namespace(user_id)에 문서 추가
+    사용자별 namespace(user_id)에 문서 추가 (새로/바뀐 슬라이드만 적재, 사라진 슬라이드는 삭제)
     """
     timing = {}
     start_total = time.perf_counter()
     try:
-        user_base_dir = os.path.join(BASE_DIR, user_id)
-        docs = load_slide_documents_from_folder(user_base_dir, date_folder)
-        if not docs:
+        user_base_dir = os.path.join(SLIDES_BASE_DIR, user_id)
+        result = await asyncio.to_thread(
+            ingest_folder, INDEX_NAME, user_id, user_base_dir, date_folder, force, timing
+        )
+        if not result["upserted_ids"] and not result["skipped"] and not result["deleted"]:
             raise HTTPException(status_code=404, detail="문서를 찾을 수 없습니다.")
-        
-        vector_store = get_vector_store(INDEX_NAME, namespace=user_id)
-        ids = add_documents_to_vector_db(vector_store, docs, namespace=user_id)
+
+        # 문서가 바뀌었으면 이 namespace의 캐시된 답변/컨텍스트 캐시는 폐기
+        if result["upserted_ids"] or result["deleted"] or result["legacy_deleted"]:
+            await invalidate_namespace(user_id)
+            await invalidate_user(user_id)
 
         return {
             "status": "success",
-            "added_count": len(ids),
+            "added_count": len(result["upserted_ids"]),
+            "added": result["added"],
+            "updated": result["updated"],
+            "skipped": result["skipped"],
+            "deleted": result["deleted"],
+            "legacy_deleted": result["legacy_deleted"],
             "namespace": user_id,
             "timing": timing
         }
@@ -51,7 +61,8 @@ async def add_documents_endpoint(
 async def search_in_vectordb(
     user_id: str = Query(..., description="검색할 사용자 ID (namespace)"),
     query: str = Query(..., description="검색할 질문"),
-    k: int = 3
+    k: int = 3,
+    mode: Optional[str] = Query(None, description="검색 모드 (dense | hybrid, 기본값은 RETRIEVAL_MODE)")
 ):
     """
     사용자별 namespace(user_id) 내에서만 검색
@@ -63,7 +74,8 @@ async def search_in_vectordb(
             index_name=INDEX_NAME,
             namespace=user_id,
             query=query,
-            k=k
+            k=k,
+            mode=mode
         )
 
         formatted_results = [
@@ -86,4 +98,15 @@ async def search_in_vectordb(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        timing['total_time'] = round(time.perf_counter() - start_total, 3)
\ No newline at end of file
+        timing['total_time'] = round(time.perf_counter() - start_total, 3)
+
+
+@router.get("/embedding/metrics")
+async def embedding_metrics():
+    """
+    임베딩 서비스 지표 (질문 캐시 적중률, 호출당 지연, 평균 배치 크기)
+    """
+    return {
+        "status": "success",
+        "metrics": get_embedding_metrics()
+    }
@@ -0,0 +1,98 @@
+"""
+컨텍스트 캐시 사용 여부에 따른 턴별 입력 토큰/지연 비교 (로컬 스텁 서버 대상)
+
+- plain: 매 턴 지시문 + 검색된 슬라이드 k개 + 질문을 전부 보냄
+- cached: 지시문 + 덱 슬라이드를 cachedContents로 한 번 올리고, 매 턴 질문 + 관련 슬라이드 제목만 보냄
+- 매 턴 usageMetadata 기준으로 캐시되지 않은 입력 토큰(promptTokenCount - cachedContentTokenCount)과 지연을 집계
+
+사용법 (project 디렉토리에서, 먼저 python -m scripts.gemini_stub_server 실행):
+    python -m scripts.benchmark_context_cache
+    python -m scripts.benchmark_context_cache --folder output/{user_id}/{date_folder} --turns 20 --k 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+
+def _synthetic_slides(count: int) -> List[str]:
+    return [
+        f"[슬라이드 {i}] 합성 슬라이드 {i}\n" + " ".join(f"개념{i}-{j} 설명 문장입니다." for j in range(40))
+        for i in range(1, count + 1)
+    ]
+
+def _summarize(name: str, samples: List[Dict]) -> None:
+    latencies = sorted(sample["latency"] * 1000 for sample in samples)
+    uncached = [sample["prompt_tokens"] - sample["cached_tokens"] for sample in samples]
+    cached = [sample["cached_tokens"] for sample in samples]
+    print(
+        f"{name}\t{len(samples)}\t{statistics.mean(uncached):.0f}\t{statistics.mean(cached):.0f}"
+        f"\t{statistics.median(latencies):.1f}\t{latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.1f}"
+    )
+
+async def _run(args) -> None:
+    from services.llm.gemini_client import (
+        aclose_gemini_clients, call_gemini_async, create_cached_content, delete_cached_content
+    )
+    from services.chat.chat_service import _CACHED_SYSTEM_INSTRUCTION
+
+    if args.folder:
+        from services.embedding.document_loader import iter_slide_documents_from_folder
+        base_dir, date_folder = os.path.split(os.path.normpath(args.folder))
+        slides = [doc.page_content for doc in iter_slide_documents_from_folder(base_dir, date_folder)]
+    else:
+        slides = _synthetic_slides(args.slides)
+
+    rng = random.Random(0)
+    turns = [(f"질문 {t}: 이 부분 다시 설명해줘", rng.sample(slides, min(args.k, len(slides)))) for t in range(args.turns)]
+
+    plain: List[Dict] = []
+    for query, retrieved in turns:
+        prompt = f"{_CACHED_SYSTEM_INSTRUCTION}\n\n[강의 자료 컨텍스트]\n" + "\n\n".join(retrieved) + f"\n\n[사용자 질문]\n{query}"
+        usage: Dict = {}
+        start = time.perf_counter()
+        await call_gemini_async(prompt, usage=usage)
+        plain.append({"latency": time.perf_counter() - start, "prompt_tokens": usage.get("promptTokenCount", 0), "cached_tokens": 0})
+
+    start = time.perf_counter()
+    cache = await create_cached_content(_CACHED_SYSTEM_INSTRUCTION, "[강의 자료]\n" + "\n\n".join(slides), 600)
+    create_latency = time.perf_counter() - start
+    cached: List[Dict] = []
+    try:
+        for query, retrieved in turns:
+            related = "\n".join(text.splitlines()[0] for text in retrieved)
+            prompt = f"[이번 질문과 관련된 슬라이드 (강의 자료에 있음)]\n{related}\n\n[사용자 질문]\n{query}"
+            usage = {}
+            start = time.perf_counter()
+            await call_gemini_async(prompt, cached_content=cache["name"], usage=usage)
+            cached.append({
+                "latency": time.perf_counter() - start,
+                "prompt_tokens": usage.get("promptTokenCount", 0),
+                "cached_tokens": usage.get("cachedContentTokenCount", 0)
+            })
+    finally:
+        await delete_cached_content(cache["name"])
+        await aclose_gemini_clients()
+
+    print(f"슬라이드 {len(slides)}개, 캐시 {cache.get('usageMetadata', {}).get('totalTokenCount', '?')}토큰, 생성 {create_latency * 1000:.1f}ms")
+    print("mode\tturns\tuncached_input_tokens\tcached_input_tokens\tlatency_p50_ms\tlatency_p95_ms")
+    _summarize("plain", plain)
+    _summarize("cached", cached)
+
+def main():
+    parser = argparse.ArgumentParser(description="컨텍스트 캐시 입력 토큰/지연 벤치마크")
+    parser.add_argument("--api-base", default="http://127.0.0.1:8089/v1beta", help="스텁 서버 주소")
+    parser.add_argument("--folder", default=None, help="*_gemini_reorder.json 이 있는 폴더 (없으면 합성 슬라이드)")
+    parser.add_argument("--slides", type=int, default=40, help="합성 슬라이드 수")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--k", type=int, default=3, help="턴마다 검색되는 슬라이드 수")
+    args = parser.parse_args()
+
+    # 엔드포인트는 gemini_client import 시점에 정해지므로 먼저 지정
+    os.environ["GEMINI_API_BASE"] = args.api_base
+    asyncio.run(_run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+임베딩 백엔드(torch / onnx / onnx-int8) 정합성 + 처리량 비교
+
+- 정합성: torch fp32 임베딩과의 코사인 유사도(평균/최소), 슬라이드 간 top-k 이웃 일치율
+- 처리량: 슬라이드 텍스트 초당 처리 수
+
+사용법 (project 디렉토리에서):
+    python -m scripts.benchmark_embedding_backends --folder output/{user_id}/{date_folder}
+    python -m scripts.benchmark_embedding_backends --backends torch onnx-int8 --batch-size 16
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List
+import numpy as np
+from services.embedding.embedding_service import build_base_embeddings, EMBEDDING_BACKENDS
+
+# 폴더를 주지 않았을 때 쓰는 고정 슬라이드 말뭉치
+SAMPLE_SLIDES = [
+    "[슬라이드 1] 운영체제 개요\n운영체제(Operating System)는 하드웨어 자원을 관리하고 응용 프로그램에 서비스를 제공한다.",
+    "[슬라이드 2] 프로세스와 스레드\n프로세스는 실행 중인 프로그램이며, 스레드(Thread)는 프로세스 내 실행 흐름의 단위이다.",
+    "[슬라이드 3] CPU 스케줄링\nFCFS, SJF, Round Robin 등 스케줄링 알고리즘은 대기 시간과 응답 시간에 영향을 준다.",
+    "[슬라이드 4] 교착 상태\n교착 상태(Deadlock)의 네 가지 필요 조건은 상호 배제, 점유 대기, 비선점, 순환 대기이다.",
+    "[슬라이드 5] 가상 메모리\n페이지 교체 알고리즘(LRU, FIFO, Optimal)은 페이지 부재(Page Fault) 횟수를 줄이는 것이 목표이다.",
+    "[슬라이드 6] 선형 회귀\n선형 회귀(Linear Regression)는 최소제곱법으로 오차 제곱합을 최소화하는 직선을 찾는다.",
+    "[슬라이드 7] 경사 하강법\n학습률(learning rate)이 너무 크면 발산하고, 너무 작으면 수렴이 느려진다.",
+    "[슬라이드 8] 과적합\n과적합(Overfitting)을 막기 위해 정규화(L1, L2), 드롭아웃, 조기 종료를 사용한다.",
+    "[슬라이드 9] 합성곱 신경망\nCNN은 합성곱(Convolution)과 풀링(Pooling) 계층으로 이미지의 지역적 특징을 추출한다.",
+    "[슬라이드 10] 트랜스포머\n셀프 어텐션(Self-Attention)은 문장 내 모든 토큰 쌍의 관련도를 계산한다.",
+    "[슬라이드 11] TCP와 UDP\nTCP는 연결 지향적이며 신뢰성을 보장하고, UDP는 비연결형으로 지연이 적다.",
+    "[슬라이드 12] 해시 테이블\n해시 충돌은 체이닝(Chaining)이나 개방 주소법(Open Addressing)으로 해결한다.",
+]
+
+def load_corpus(folder: str) -> List[str]:
+    if not folder:
+        return SAMPLE_SLIDES
+    texts = []
+    for path in sorted(glob.glob(os.path.join(folder, "*_gemini_reorder.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for slide in json.load(f):
+                texts.append(f"[슬라이드 {slide.get('slide_number')}] {slide.get('title', '')}\n{slide.get('text', '')}")
+    return texts or SAMPLE_SLIDES
+
+def _normalize(vectors: List[List[float]]) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    return arr / np.linalg.norm(arr, axis=1, keepdims=True)
+
+def _top_k_neighbors(vectors: np.ndarray, k: int) -> np.ndarray:
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1)[:, :k]
+
+def embed_with_throughput(model, texts: List[str], batch_size: int) -> Dict:
+    # 첫 호출의 그래프/세션 초기화 비용은 제외
+    model.embed_documents(texts[:1])
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(model.embed_documents(texts[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+    return {"vectors": _normalize(vectors), "texts_per_sec": len(texts) / elapsed if elapsed > 0 else 0.0}
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 백엔드 정합성/처리량 벤치마크")
+    parser.add_argument("--folder", default="", help="*_gemini_reorder.json 이 있는 폴더 (없으면 내장 샘플)")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.folder)
+    print(f"슬라이드 {len(texts)}개, 배치 크기 {args.batch_size}")
+
+    # 기준: torch fp32
+    reference = embed_with_throughput(build_base_embeddings("torch"), texts, args.batch_size)
+    ref_neighbors = _top_k_neighbors(reference["vectors"], args.top_k)
+
+    header = ["backend", "texts_per_sec", "speedup", "cos_mean", "cos_min", f"top{args.top_k}_agree"]
+    print("\t".join(header))
+    for backend in args.backends:
+        result = reference if backend == "torch" else embed_with_throughput(
+            build_base_embeddings(backend), texts, args.batch_size
+        )
+        cos = np.sum(result["vectors"] * reference["vectors"], axis=1)
+        neighbors = _top_k_neighbors(result["vectors"], args.top_k)
+        agree = np.mean([
+            len(set(a) & set(b)) / args.top_k for a, b in zip(neighbors, ref_neighbors)
+        ])
+        row = [
+            backend,
+            f"{result['texts_per_sec']:.2f}",
+            f"{result['texts_per_sec'] / reference['texts_per_sec']:.2f}x",
+            f"{cos.mean():.5f}",
+            f"{cos.min():.5f}",
+            f"{agree:.3f}",
+        ]
+        print("\t".join(row))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+세션 히스토리 읽기/쓰기 지연 측정 (저장된 턴 수에 따른 변화)
+
+- new: 턴 단위 Redis list (LRANGE 음수 인덱스로 마지막 N턴만 읽음)
+- legacy: 이전 RedisChatMessageHistory (전체 메시지를 읽은 뒤 자름)
+
+사용법 (project 디렉토리에서, REDIS_URL 필요):
+    python -m scripts.benchmark_history
+    python -m scripts.benchmark_history --sizes 10 1000 10000 --n-turns 6 --repeat 200 --legacy
+"""
+import argparse
+import statistics
+import time
+import uuid
+from typing import Callable, Dict, List
+from services.chat import history_service
+
+def _measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+def _fill_new(user_id: str, session_id: str, size: int) -> None:
+    # 벤치마크용 데이터는 최대 길이 제한 없이 한 번에 채움
+    client = history_service._get_redis_client()
+    key = history_service._turns_key(user_id, session_id)
+    turns = [history_service._encode_turn(f"질문 {i}", f"답변 {i} " * 20) for i in range(size)]
+    for i in range(0, size, 1000):
+        client.rpush(key, *turns[i:i + 1000])
+
+def _fill_legacy(user_id: str, session_id: str, size: int) -> None:
+    hist = history_service.get_history(user_id, session_id)
+    for i in range(size):
+        hist.add_user_message(f"질문 {i}")
+        hist.add_ai_message(f"답변 {i} " * 20)
+
+def main():
+    parser = argparse.ArgumentParser(description="세션 히스토리 읽기/쓰기 지연 벤치마크")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 10000])
+    parser.add_argument("--n-turns", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--legacy", action="store_true", help="이전 형식도 측정 (큰 크기는 채우는 데 오래 걸림)")
+    args = parser.parse_args()
+
+    user_id = f"bench_{uuid.uuid4().hex[:8]}"
+    print("store\tstored_turns\tread_p50_ms\tread_p95_ms\tappend_p50_ms\tappend_p95_ms")
+    for size in args.sizes:
+        session_id = f"new_{size}"
+        try:
+            _fill_new(user_id, session_id, size)
+            read = _measure(lambda: history_service.load_recent_turns(user_id, session_id, args.n_turns), args.repeat)
+            append = _measure(lambda: history_service.append_turn(user_id, session_id, "질문", "답변"), args.repeat)
+            print(f"new\t{size}\t{read['p50']:.2f}\t{read['p95']:.2f}\t{append['p50']:.2f}\t{append['p95']:.2f}")
+        finally:
+            history_service._get_redis_client().delete(history_service._turns_key(user_id, session_id))
+
+        if not args.legacy:
+            continue
+        session_id = f"legacy_{size}"
+        hist = history_service.get_history(user_id, session_id)
+        try:
+            _fill_legacy(user_id, session_id, size)
+            read = _measure(lambda: history_service._load_legacy_turns(user_id, session_id)[-args.n_turns:], args.repeat)
+            print(f"legacy\t{size}\t{read['p50']:.2f}\t{read['p95']:.2f}\t-\t-")
+        finally:
+            hist.clear()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+적재 파이프라인(임베딩 배치 + 동시 업서트) 처리량 비교
+
+- 배치 크기 / 동시 업서트 수 조합별로 초당 적재 슬라이드 수 측정
+- 기본은 임시 디렉토리의 로컬 벡터 스토어에 적재 (--backend pinecone 이면 실제 index에 별도 namespace로 적재 후 삭제)
+
+사용법 (project 디렉토리에서):
+    python -m scripts.benchmark_ingest --folder output/{user_id}/{date_folder}
+    python -m scripts.benchmark_ingest --batch-sizes 8 32 128 --inflight 1 4
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+def main():
+    parser = argparse.ArgumentParser(description="적재 파이프라인 처리량 벤치마크")
+    parser.add_argument("--folder", required=True, help="*_gemini_reorder.json 이 있는 폴더")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[8, 16, 32, 64])
+    parser.add_argument("--inflight", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--backend", choices=["local", "pinecone"], default="local")
+    parser.add_argument("--index", default="rag-slides-index")
+    parser.add_argument("--repeat", type=int, default=1, help="슬라이드를 반복해 말뭉치 크기를 늘림")
+    args = parser.parse_args()
+
+    # 백엔드 설정은 서비스 모듈 import 시점에 읽히므로 먼저 지정
+    os.environ["VECTOR_BACKEND"] = args.backend
+    tmp_dir = tempfile.mkdtemp(prefix="bench-ingest-")
+    os.environ.setdefault("VECTOR_LOCAL_DIR", tmp_dir)
+
+    from services.embedding.document_loader import load_slide_documents_from_folder
+    from services.embedding.embedding_service import get_embedding_model
+    from services.embedding.ingest_service import embed_and_upsert
+    from services.embedding.vector_db_service import get_vector_store
+
+    folder = os.path.abspath(args.folder)
+    base_docs = load_slide_documents_from_folder(os.path.dirname(folder), os.path.basename(folder))
+    if not base_docs:
+        print("슬라이드가 없습니다.")
+        return
+
+    # 모델 로드/첫 추론 비용은 제외
+    get_embedding_model().embed_documents([base_docs[0].page_content])
+
+    print("batch_size\tinflight\tslides\tseconds\tslides_per_sec\tembed_seconds")
+    for batch_size in args.batch_sizes:
+        for inflight in args.inflight:
+            namespace = f"bench-{uuid.uuid4().hex[:8]}"
+            docs = []
+            for r in range(args.repeat):
+                for i, doc in enumerate(base_docs):
+                    copy = doc.model_copy(deep=True)
+                    copy.id = f"{namespace}-{r}-{i}"
+                    docs.append(copy)
+
+            timing = {}
+            start = time.perf_counter()
+            ids = embed_and_upsert(args.index, namespace, iter(docs), batch_size, inflight, timing)
+            elapsed = time.perf_counter() - start
+            print(f"{batch_size}\t{inflight}\t{len(ids)}\t{elapsed:.2f}\t{len(ids) / elapsed:.2f}\t{timing['embed']:.2f}")
+
+            # 벤치마크용 namespace 정리
+            get_vector_store(args.index, namespace).delete(ids=ids, namespace=namespace)
+
+if __name__ == "__main__":
+    main()
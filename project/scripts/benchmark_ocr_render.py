@@ -0,0 +1,75 @@
+"""
+OCR 렌더링 설정(DPI/포맷)별 비용과 OCR 신뢰도 비교
+
+사용법 (project 디렉토리에서):
+    python -m scripts.benchmark_ocr_render sample.pdf --dpi 300 450 --format PNG JPEG --pages 5
+"""
+import argparse
+import time
+from typing import Dict, List
+from services.ocr.pdf_service import iter_pdf_page_bytes
+from services.ocr.ocr_service import detect_document_text
+
+def _mean_confidence(ocr_result: Dict) -> float:
+    blocks = ocr_result["full_text_blocks"]
+    if not blocks:
+        return 0.0
+    # 글자 수로 가중 평균 (짧은 잡음 블록의 영향 줄이기)
+    total_chars = sum(len(b["text"]) for b in blocks) or 1
+    return sum(b["confidence"] * len(b["text"]) for b in blocks) / total_chars
+
+def run_benchmark(pdf_path: str, dpis: List[int], formats: List[str], max_pages: int, adaptive: bool) -> List[Dict]:
+    settings = [(dpi, fmt, False) for dpi in dpis for fmt in formats]
+    if adaptive:
+        settings += [(None, fmt, True) for fmt in formats]
+
+    rows = []
+    for dpi, fmt, is_adaptive in settings:
+        render_time = ocr_time = 0.0
+        total_bytes = 0
+        confidences = []
+        pages = iter_pdf_page_bytes(pdf_path, dpi=dpi, fmt=fmt, adaptive=is_adaptive)
+        for _ in range(max_pages):
+            start = time.perf_counter()
+            page = next(pages, None)
+            render_time += time.perf_counter() - start
+            if page is None:
+                break
+            _, content = page
+            total_bytes += len(content)
+
+            start = time.perf_counter()
+            result = detect_document_text(content)
+            ocr_time += time.perf_counter() - start
+            confidences.append(_mean_confidence(result))
+        pages.close()
+
+        n = len(confidences) or 1
+        rows.append({
+            "dpi": "adaptive" if is_adaptive else dpi,
+            "format": fmt,
+            "pages": len(confidences),
+            "avg_kb": round(total_bytes / n / 1024, 1),
+            "render_s": round(render_time / n, 3),
+            "ocr_s": round(ocr_time / n, 3),
+            "confidence": round(sum(confidences) / n, 4)
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 렌더링 DPI/포맷 벤치마크")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--dpi", type=int, nargs="+", default=[300, 450])
+    parser.add_argument("--format", nargs="+", default=["PNG", "JPEG"])
+    parser.add_argument("--pages", type=int, default=5, help="측정할 최대 페이지 수")
+    parser.add_argument("--adaptive", action="store_true", help="적응형 DPI도 함께 측정")
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.pdf_path, args.dpi, [f.upper() for f in args.format], args.pages, args.adaptive)
+    header = ["dpi", "format", "pages", "avg_kb", "render_s", "ocr_s", "confidence"]
+    print("\t".join(header))
+    for row in rows:
+        print("\t".join(str(row[h]) for h in header))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+검색 모드(dense / hybrid)별 recall@k, MRR 비교 (오프라인 평가)
+
+질문 파일 (JSONL, 한 줄에 하나):
+    {"query": "LRU 페이지 교체 알고리즘이 뭐야?", "relevant": ["week5_gemini_reorder.json#12"]}
+    - relevant: 정답 슬라이드 목록, "{파일명}#{슬라이드 번호}" 형식
+
+사용법 (project 디렉토리에서, 해당 namespace에 이미 적재되어 있어야 함):
+    python -m scripts.eval_retrieval --user {user_id} --queries eval/questions.jsonl
+    VECTOR_BACKEND=local python -m scripts.eval_retrieval --user {user_id} --queries eval/questions.jsonl --k 1 3 5
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+from services.embedding.vector_db_service import search_documents, RETRIEVAL_MODES
+
+def load_queries(path: str) -> List[Dict]:
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                queries.append(json.loads(line))
+    return queries
+
+def slide_key(metadata: Dict) -> str:
+    return f"{metadata.get('file')}#{metadata.get('slide_number')}"
+
+def evaluate(index_name: str, namespace: str, queries: List[Dict], mode: str, ks: List[int]) -> Dict:
+    max_k = max(ks)
+    recall = {k: 0.0 for k in ks}
+    reciprocal_rank = 0.0
+    elapsed = 0.0
+    for item in queries:
+        relevant = set(item["relevant"])
+        start = time.perf_counter()
+        results = search_documents(index_name, namespace, item["query"], k=max_k, mode=mode)
+        elapsed += time.perf_counter() - start
+        ranked = [slide_key(doc.metadata) for doc, _ in results]
+
+        for k in ks:
+            recall[k] += len(relevant & set(ranked[:k])) / len(relevant)
+        for rank, key in enumerate(ranked, start=1):
+            if key in relevant:
+                reciprocal_rank += 1.0 / rank
+                break
+
+    n = len(queries)
+    return {
+        "recall": {k: recall[k] / n for k in ks},
+        "mrr": reciprocal_rank / n,
+        "avg_latency": elapsed / n
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 모드별 recall@k 평가")
+    parser.add_argument("--user", required=True, help="평가할 namespace (user_id)")
+    parser.add_argument("--queries", required=True, help="질문/정답 JSONL 파일")
+    parser.add_argument("--index", default="rag-slides-index")
+    parser.add_argument("--modes", nargs="+", default=list(RETRIEVAL_MODES))
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 3, 5, 10])
+    args = parser.parse_args()
+
+    queries = [q for q in load_queries(args.queries) if q.get("relevant")]
+    if not queries:
+        print("정답이 있는 질문이 없습니다.")
+        return
+    print(f"질문 {len(queries)}개, namespace={args.user}")
+
+    header = ["mode"] + [f"recall@{k}" for k in args.k] + ["mrr", "avg_latency"]
+    print("\t".join(header))
+    for mode in args.modes:
+        result = evaluate(args.index, args.user, queries, mode, args.k)
+        row = [mode] + [f"{result['recall'][k]:.3f}" for k in args.k] + [f"{result['mrr']:.3f}", f"{result['avg_latency']:.3f}s"]
+        print("\t".join(row))
+
+if __name__ == "__main__":
+    main()
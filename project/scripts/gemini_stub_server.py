@@ -0,0 +1,198 @@
+"""
+로컬 Gemini 스텁 서버 (컨텍스트 캐시의 입력 토큰 절감/지연 확인용)
+
+- models/{model}:generateContent, :streamGenerateContent(?alt=sse)
+- cachedContents 생성(POST) / 조회(GET) / 삭제(DELETE), TTL 만료 시 404
+- usageMetadata에 promptTokenCount(캐시 포함), cachedContentTokenCount, candidatesTokenCount를 채워 응답
+- 지연 = base + 캐시되지 않은 입력 1k토큰당 ms + 캐시된 입력 1k토큰당 ms (프리필 비용 흉내)
+
+사용법 (project 디렉토리에서):
+    python -m scripts.gemini_stub_server --port 8089
+    GEMINI_API_BASE=http://127.0.0.1:8089/v1beta CONTEXT_CACHE_ENABLED=true uvicorn main:app
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from utils.token_utils import estimate_tokens
+
+_caches: Dict[str, Dict] = {}
+_caches_lock = threading.Lock()
+_config: Dict = {}
+
+def _parts_text(contents) -> str:
+    texts = []
+    for content in contents or []:
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+def _get_cache(name: str) -> Optional[Dict]:
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is not None and cache["expires_at"] <= time.time():
+            del _caches[name]
+            cache = None
+        return cache
+
+def _simulate_latency(uncached_tokens: int, cached_tokens: int) -> None:
+    delay_ms = (
+        _config["base_latency_ms"]
+        + _config["ms_per_1k_input"] * uncached_tokens / 1000
+        + _config["ms_per_1k_cached"] * cached_tokens / 1000
+    )
+    time.sleep(delay_ms / 1000)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if _config.get("verbose"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": {"code": status, "message": message}})
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self) -> Tuple[str, Dict]:
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path.startswith("/v1beta/"):
+            path = path[len("/v1beta/"):]
+        return path.strip("/"), parse_qs(parsed.query)
+
+    def do_GET(self):
+        path, _ = self._route()
+        if not path.startswith("cachedContents/"):
+            return self._send_error(404, f"unknown path: {path}")
+        cache = _get_cache(path)
+        if cache is None:
+            return self._send_error(404, f"CachedContent not found: {path}")
+        self._send_json(200, cache["resource"])
+
+    def do_DELETE(self):
+        path, _ = self._route()
+        with _caches_lock:
+            existed = _caches.pop(path, None) is not None
+        if not existed:
+            return self._send_error(404, f"CachedContent not found: {path}")
+        self._send_json(200, {})
+
+    def do_POST(self):
+        path, query = self._route()
+        body = self._read_json()
+        if path == "cachedContents":
+            return self._create_cache(body)
+        if path.endswith(":generateContent"):
+            return self._generate(body, stream=False)
+        if path.endswith(":streamGenerateContent"):
+            return self._generate(body, stream=True, sse=query.get("alt") == ["sse"])
+        self._send_error(404, f"unknown path: {path}")
+
+    def _create_cache(self, body: Dict) -> None:
+        system_text = _parts_text([body.get("systemInstruction") or {}])
+        tokens = estimate_tokens(system_text) + estimate_tokens(_parts_text(body.get("contents")))
+        if tokens < _config["min_cache_tokens"]:
+            return self._send_error(
+                400, f"Cached content is too small. total_token_count={tokens}, min_total_token_count={_config['min_cache_tokens']}"
+            )
+        ttl = float(str(body.get("ttl", "3600s")).rstrip("s"))
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        expires_at = time.time() + ttl
+        resource = {
+            "name": name,
+            "model": body.get("model"),
+            "displayName": body.get("displayName", ""),
+            "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires_at)),
+            "usageMetadata": {"totalTokenCount": tokens}
+        }
+        with _caches_lock:
+            _caches[name] = {"resource": resource, "tokens": tokens, "expires_at": expires_at}
+        self._send_json(200, resource)
+
+    def _generate(self, body: Dict, stream: bool, sse: bool = False) -> None:
+        cached_tokens = 0
+        if body.get("cachedContent"):
+            cache = _get_cache(body["cachedContent"])
+            if cache is None:
+                return self._send_error(404, f"CachedContent not found: {body['cachedContent']}")
+            cached_tokens = cache["tokens"]
+        uncached_tokens = estimate_tokens(_parts_text(body.get("contents")))
+        _simulate_latency(uncached_tokens, cached_tokens)
+
+        answer_parts = [
+            "스텁 답변입니다. ",
+            f"입력 {uncached_tokens + cached_tokens}토큰 중 {cached_tokens}토큰은 캐시에서 읽었습니다. ",
+            "[슬라이드 1]"
+        ]
+        usage = {
+            "promptTokenCount": uncached_tokens + cached_tokens,
+            "cachedContentTokenCount": cached_tokens,
+            "candidatesTokenCount": estimate_tokens("".join(answer_parts))
+        }
+        usage["totalTokenCount"] = usage["promptTokenCount"] + usage["candidatesTokenCount"]
+
+        def chunk(text: str, final: bool) -> Dict:
+            result = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+            if final:
+                result["candidates"][0]["finishReason"] = "STOP"
+                result["usageMetadata"] = usage
+            return result
+
+        if not stream:
+            return self._send_json(200, chunk("".join(answer_parts), True))
+
+        chunks = [chunk(text, i == len(answer_parts) - 1) for i, text in enumerate(answer_parts)]
+        if not sse:
+            return self._send_json(200, chunks)
+        # SSE: 조각마다 잠깐씩 쉬며 전송 (Content-Length 없이 연결 종료로 끝을 알림)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for item in chunks:
+            self.wfile.write(f"data: {json.dumps(item, ensure_ascii=False)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(_config["ms_per_chunk"] / 1000)
+        self.close_connection = True
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 Gemini 스텁 서버 (컨텍스트 캐시 확인용)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--base-latency-ms", type=float, default=150.0)
+    parser.add_argument("--ms-per-1k-input", type=float, default=40.0, help="캐시되지 않은 입력 1k토큰당 지연")
+    parser.add_argument("--ms-per-1k-cached", type=float, default=5.0, help="캐시된 입력 1k토큰당 지연")
+    parser.add_argument("--ms-per-chunk", type=float, default=30.0, help="스트리밍 조각 사이 간격")
+    parser.add_argument("--min-cache-tokens", type=int, default=1024, help="이보다 작은 캐시는 400 (Gemini와 동일한 제약)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    _config.update(vars(args))
+
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    print(f"[STUB] Gemini 스텁 서버: http://{args.host}:{args.port}/v1beta")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
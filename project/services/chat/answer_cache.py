@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from services.chat.history_service import _get_async_redis_client
+from utils.env_utils import get_bool_env, get_float_env, get_int_env
+
+# RAG 답변 시맨틱 캐시 (기본 비활성화)
+# - 같은 namespace(사용자)에서 최근에 답한 질문과 임베딩 코사인 유사도가 임계값 이상이면 LLM 호출 생략
+# - 항목은 워커 메모리에 두고, namespace 버전은 Redis에 둠 → 문서가 바뀌면 어느 워커가 적재했든 모든 워커에서 무효화
+SEMANTIC_CACHE_ENABLED = get_bool_env("SEMANTIC_CACHE_ENABLED", False)
+SEMANTIC_CACHE_THRESHOLD = get_float_env("SEMANTIC_CACHE_THRESHOLD", 0.95)
+SEMANTIC_CACHE_TTL_SECONDS = get_int_env("SEMANTIC_CACHE_TTL_SECONDS", 1800)
+SEMANTIC_CACHE_MAX_ENTRIES = max(1, get_int_env("SEMANTIC_CACHE_MAX_ENTRIES", 200))
+SEMANTIC_CACHE_VERSION_PREFIX = os.getenv("SEMANTIC_CACHE_VERSION_PREFIX", "tuddy:semantic_cache:version:")
+
+class _Entry:
+    def __init__(self, query: str, embedding: np.ndarray, response: str, source_documents: List[Dict], version: int):
+        self.query = query
+        self.embedding = embedding
+        self.response = response
+        self.source_documents = source_documents
+        self.version = version
+        self.created_at = time.time()
+
+_entries: Dict[str, List[_Entry]] = {}
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    vec = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+def _alive(entries: List[_Entry], now: float, version: int) -> List[_Entry]:
+    return [e for e in entries if e.version == version and now - e.created_at <= SEMANTIC_CACHE_TTL_SECONDS]
+
+def _version_key(namespace: str) -> str:
+    return f"{SEMANTIC_CACHE_VERSION_PREFIX}{namespace}"
+
+async def aget_version(namespace: str) -> Optional[int]:
+    """
+    namespace의 현재 문서 버전 (Redis를 읽을 수 없으면 None → 이번 요청은 캐시를 쓰지 않음)
+    """
+    try:
+        raw = await _get_async_redis_client().get(_version_key(namespace))
+    except Exception as e:
+        print(f"[WARN] 시맨틱 캐시 버전 조회 실패: {e}")
+        return None
+    return int(raw or 0)
+
+def lookup(namespace: str, query_embedding: List[float], version: int) -> Optional[Dict]:
+    """
+    유사한 질문의 캐시된 답변 반환 (없으면 None)
+    - version: aget_version으로 읽은 현재 버전, 다른 버전에서 저장된 항목은 버림
+    """
+    global _hits, _misses
+    query_vec = _normalize(query_embedding)
+    now = time.time()
+    with _lock:
+        entries = _alive(_entries.get(namespace, []), now, version)
+        _entries[namespace] = entries
+
+        best, best_score = None, -1.0
+        if entries:
+            scores = np.stack([e.embedding for e in entries]) @ query_vec
+            idx = int(np.argmax(scores))
+            best, best_score = entries[idx], float(scores[idx])
+
+        if best is None or best_score < SEMANTIC_CACHE_THRESHOLD:
+            _misses += 1
+            return None
+        _hits += 1
+        return {
+            "query": best.query,
+            "response": best.response,
+            "source_documents": best.source_documents,
+            "similarity": round(best_score, 4)
+        }
+
+def store(
+    namespace: str,
+    query: str,
+    query_embedding: List[float],
+    response: str,
+    source_documents: List[Dict],
+    version: int
+) -> None:
+    """
+    - version: 검색 전에 읽은 버전 (답변을 만드는 동안 문서가 바뀌었으면 다음 조회 때 버려짐)
+    """
+    entry = _Entry(query, _normalize(query_embedding), response, source_documents, version)
+    with _lock:
+        entries = _alive(_entries.get(namespace, []), time.time(), version)
+        entries.append(entry)
+        # 상한을 넘으면 오래된 항목부터 제거
+        _entries[namespace] = entries[-SEMANTIC_CACHE_MAX_ENTRIES:]
+
+async def invalidate_namespace(namespace: str) -> None:
+    """
+    namespace의 문서가 바뀌면 (벡터 DB 추가 등) 캐시된 답변 폐기
+    - Redis 버전을 올려 다른 워커의 항목도 다음 조회 때 버려지게 함
+    """
+    try:
+        await _get_async_redis_client().incr(_version_key(namespace))
+    except Exception as e:
+        print(f"[WARN] 시맨틱 캐시 버전 갱신 실패: {e}")
+    with _lock:
+        removed = len(_entries.pop(namespace, []))
+    if removed:
+        print(f"[CACHE] 시맨틱 캐시 무효화: {namespace} ({removed}건)")
+
+def get_stats() -> Dict:
+    with _lock:
+        total = _hits + _misses
+        return {
+            "semantic_cache_hits": _hits,
+            "semantic_cache_misses": _misses,
+            "semantic_cache_hit_rate": round(_hits / total, 3) if total else 0.0
+        }
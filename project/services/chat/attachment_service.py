@@ -0,0 +1,125 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageOps
+from utils.env_utils import get_int_env
+
+# 챗 첨부 이미지 전처리
+# - 청크 단위로 읽으면서 ATTACHMENT_MAX_BYTES를 넘으면 즉시 중단
+# - EXIF 회전 반영 → 긴 변 ATTACHMENT_MAX_EDGE로 축소 → 메타데이터 없이 재인코딩
+ATTACHMENT_MAX_BYTES = max(1, get_int_env("ATTACHMENT_MAX_BYTES", 20 * 1024 * 1024))
+ATTACHMENT_MAX_EDGE = max(64, get_int_env("ATTACHMENT_MAX_EDGE", 1600))
+ATTACHMENT_FORMAT = os.getenv("ATTACHMENT_FORMAT", "JPEG").strip().upper()
+ATTACHMENT_QUALITY = max(1, min(100, get_int_env("ATTACHMENT_QUALITY", 85)))
+ATTACHMENT_WORKERS = max(1, get_int_env("ATTACHMENT_WORKERS", 4))
+# 질문 하나에 첨부할 수 있는 이미지 수
+ATTACHMENT_MAX_FILES = 3
+_READ_CHUNK_SIZE = 1024 * 1024
+
+_FORMAT_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+if ATTACHMENT_FORMAT not in _FORMAT_MIME:
+    raise ValueError(f"지원하지 않는 ATTACHMENT_FORMAT: {ATTACHMENT_FORMAT} (가능: {', '.join(_FORMAT_MIME)})")
+
+class AttachmentTooLarge(ValueError):
+    """첨부 파일이 크기 상한을 넘음 (라우터에서 413으로 변환)"""
+
+_executor = ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS, thread_name_prefix="attachment")
+
+async def read_upload_capped(file: UploadFile, max_bytes: int = ATTACHMENT_MAX_BYTES) -> bytes:
+    """
+    업로드 파일을 청크 단위로 읽다가 상한을 넘으면 AttachmentTooLarge
+    """
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise AttachmentTooLarge(
+                f"첨부 파일 '{file.filename}'이(가) 최대 크기 {max_bytes // (1024 * 1024)}MB를 넘습니다."
+            )
+    return bytes(buffer)
+
+def _encode(image: Image.Image) -> bytes:
+    if ATTACHMENT_FORMAT == "JPEG" and image.mode != "RGB":
+        # JPEG는 알파 채널이 없으므로 흰 배경에 합성
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+    out = io.BytesIO()
+    # exif/icc 등을 넘기지 않으므로 메타데이터는 저장되지 않음
+    if ATTACHMENT_FORMAT == "PNG":
+        image.save(out, format="PNG", optimize=True)
+    else:
+        image.save(out, format=ATTACHMENT_FORMAT, quality=ATTACHMENT_QUALITY, optimize=True)
+    return out.getvalue()
+
+def preprocess_image(data: bytes, mime_type: str) -> Dict:
+    """
+    이미지 하나를 축소/재인코딩 (이미지가 아니거나 디코딩에 실패하면 원본 그대로)
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEG는 디코딩 단계에서 축소 (큰 사진의 디코딩 비용 절감)
+            image.draft("RGB", (ATTACHMENT_MAX_EDGE, ATTACHMENT_MAX_EDGE))
+            image = ImageOps.exif_transpose(image)
+            resized = max(image.size) > ATTACHMENT_MAX_EDGE
+            if resized:
+                image.thumbnail((ATTACHMENT_MAX_EDGE, ATTACHMENT_MAX_EDGE), Image.LANCZOS)
+            encoded = _encode(image)
+    except Exception as e:
+        print(f"[WARN] 첨부 이미지 전처리 실패, 원본 사용: {e}")
+        return {"mime_type": mime_type, "data": data}
+
+    # 작은 이미지는 재인코딩이 오히려 커질 수 있음 → 그때는 원본 유지
+    if not resized and len(encoded) >= len(data):
+        return {"mime_type": mime_type, "data": data}
+    return {"mime_type": _FORMAT_MIME[ATTACHMENT_FORMAT], "data": encoded}
+
+async def prepare_attachments(files: List[UploadFile], timing: Dict) -> List[Dict]:
+    """
+    업로드 이미지들을 읽고 전처리해 Gemini 요청용 [{"mime_type", "data"}] 반환
+    - 디코딩/리사이즈는 전용 스레드 풀에서 병렬로
+    """
+    start = time.perf_counter()
+    raw_items = [(file.content_type, await read_upload_capped(file)) for file in files]
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(_executor, preprocess_image, data, mime_type)
+        for mime_type, data in raw_items
+    ])
+
+    bytes_in = sum(len(data) for _, data in raw_items)
+    bytes_out = sum(len(result["data"]) for result in results)
+    timing['image_processing'] = round(time.perf_counter() - start, 3)
+    if raw_items:
+        timing['attachment_bytes_in'] = bytes_in
+        timing['attachment_bytes_out'] = bytes_out
+        timing['attachment_bytes_saved'] = bytes_in - bytes_out
+    return results
+
+def check_file_count(files: List[UploadFile]) -> None:
+    # 첨부 이미지 개수 제한 (RAG 챗/일반 챗 공통)
+    if len(files) > ATTACHMENT_MAX_FILES:
+        raise HTTPException(
+            status_code=400,  # 400 Bad Request 에러
+            detail=f"이미지는 최대 {ATTACHMENT_MAX_FILES}개까지만 업로드할 수 있습니다."
+        )
+
+async def read_images(files: List[UploadFile], timing: Dict) -> List[Dict]:
+    # 이미지 데이터 처리 (크기 제한, 축소/재인코딩), 크기 초과는 413
+    try:
+        return await prepare_attachments(files, timing)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
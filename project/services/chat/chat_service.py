@@ -1,25 +1,30 @@
-import asyncio
-from typing import List, Tuple, Optional, Dict
-from services.ocr.gemini_service import call_gemini
-from services.chat.history_service import load_recent_turns, append_turn
+import httpx
+from typing import AsyncIterator, List, Tuple, Optional, Dict
+from services.llm.gemini_client import call_gemini_async, stream_gemini_async
+from services.chat.history_service import aappend_turn
+from services.chat.context_cache_service import (
+    CONTEXT_CACHE_ENABLED, drop_context_cache, get_context_cache, record_slide_usage, slide_key
+)
+from services.chat.prompt_service import assemble_prompt
+from services.chat.summary_service import load_history_context
 
-def _format_history_for_prompt(pairs: List[Tuple[str, str]]) -> str:
-    """
-    최근 대화 N턴을 프롬프트에 안전하게 삽입하기 위한 간단한 포맷터
-    """
-    if not pairs:
-        return "없음"
-    lines = []
-    for i, (u, a) in enumerate(pairs, start=1):
-        lines.append(f"[대화 {i}]")
-        lines.append(f"User: {u}")
-        lines.append(f"Assistant: {a}")
-    return "\n".join(lines)
+# Gemini 호출 실패 시 사용자에게 돌려주는 답변
+FALLBACK_ANSWER = "미안해. 답변을 만드는 데 문제가 생겼어."
+
+# 텍스트 프롬프트의 역할/지시사항 (일반 호출과 컨텍스트 캐시 지시문이 같은 문장을 쓰도록 한 곳에 둠)
+_TEXT_PERSONA = "너는 나의 스터디 파트너야. 우리는 시험을 준비하기 위해 강의 자료를 같이 보면서 공부하고 있어."
+_TEXT_INSTRUCTIONS = """
+[지시사항]
+1. 제공된 강의 자료를 최우선으로 참고해서 대화하듯 답하기(참고한 강의 자료의 출처 명시 ex) [슬라이드 6])
+2. 강의 자료에 없으면 일반 지식으로 보강하되, 그 부분은 [일반 지식]이라고 표시하기
+3. 단정 짓지 말고, 불확실하면 '추측입니다' 또는 '확실하지 않음'이라고 알려주기
+4. 말투는 스터디 파트너랑 같이 공부하는 느낌 (편안하지만 정확하게)
+""".strip()
 
 def _build_text_prompt(history_block: str, context_text: str, query: str, effective_n: int) -> str:
     """텍스트 전용 요청을 위한 프롬프트"""
     return f"""
-너는 나의 스터디 파트너야. 우리는 시험을 준비하기 위해 강의 자료를 같이 보면서 공부하고 있어.
+{_TEXT_PERSONA}
 
 [대화 히스토리 (최근 {effective_n}턴)]
 {history_block}
@@ -27,11 +32,7 @@ def _build_text_prompt(history_block: str, context_text: str, query: str, effect
 [강의 자료 컨텍스트]
 {context_text}
 
-[지시사항]
-1. 제공된 강의 자료를 최우선으로 참고해서 대화하듯 답하기(참고한 강의 자료의 출처 명시 ex) [슬라이드 6])
-2. 강의 자료에 없으면 일반 지식으로 보강하되, 그 부분은 [일반 지식]이라고 표시하기
-3. 단정 짓지 말고, 불확실하면 '추측입니다' 또는 '확실하지 않음'이라고 알려주기
-4. 말투는 스터디 파트너랑 같이 공부하는 느낌 (편안하지만 정확하게)
+{_TEXT_INSTRUCTIONS}
 
 [사용자 질문]
 {query}
@@ -57,43 +58,240 @@ def _build_multimodal_prompt(history_block: str, context_text: str, query: str,
 {query}
 """.strip()
 
+# 컨텍스트 캐시를 쓸 때 캐시에 함께 올리는 고정 지시문 (_build_text_prompt와 같은 역할/지시사항)
+_CACHED_SYSTEM_INSTRUCTION = f"""
+{_TEXT_PERSONA}
+함께 제공된 [강의 자료]와 매 질문에 붙는 [추가 강의 자료 컨텍스트]를 참고해서 답해줘.
+
+{_TEXT_INSTRUCTIONS}
+""".strip()
+
+def _build_cached_prompt(
+    history_block: str,
+    context_text: str,
+    query: str,
+    effective_n: int,
+    related_slides: List[str]
+) -> str:
+    """컨텍스트 캐시 뒤에 이어 붙는 턴별 프롬프트 (지시문/덱 슬라이드는 캐시에 있음)"""
+    related = "\n".join(related_slides) or "없음"
+    return f"""
+[대화 히스토리 (최근 {effective_n}턴)]
+{history_block}
+
+[이번 질문과 관련된 슬라이드 (강의 자료에 있음)]
+{related}
+
+[추가 강의 자료 컨텍스트]
+{context_text}
+
+[사용자 질문]
+{query}
+""".strip()
+
+def _effective_turns(n_turns: int) -> int:
+    # n_turns 가드 (0이면 히스토리 주입 끔, 상한 50)
+    return max(0, min(n_turns, 50))
+
+async def load_history(
+    user_id: str,
+    session_id: str,
+    n_turns: int,
+    timing: Optional[Dict] = None
+) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+    """
+    (이전 대화 요약, 최근 턴들)을 비동기로 미리 읽음 (검색/이미지 읽기와 동시에 진행하기 위함)
+    """
+    effective_n = _effective_turns(n_turns)
+    if effective_n == 0:
+        return None, []
+    return await load_history_context(user_id, session_id, effective_n, timing)
+
+async def _prepare_prompt(
+    user_id: str,
+    session_id: str,
+    query: str,
+    context: str,
+    n_turns: int,
+    images: Optional[List[Dict]] = None,
+    recent_pairs: Optional[List[Tuple[str, str]]] = None,
+    history_summary: Optional[str] = None,
+    timing: Optional[Dict] = None,
+    context_chunks: Optional[List[Tuple[str, float]]] = None,
+    deck: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
+    """
+    (프롬프트, 사용할 컨텍스트 캐시 이름) 반환
+    - deck이 있고 컨텍스트 캐시를 쓰면 캐시에 없는 슬라이드만 프롬프트에 넣음 (이미지 첨부 질문은 일반 프롬프트)
+    """
+    effective_n = _effective_turns(n_turns)
+    if effective_n == 0:
+        recent_pairs, history_summary = [], None
+    elif recent_pairs is None:
+        history_summary, recent_pairs = await load_history(user_id, session_id, effective_n, timing)
+
+    # 점수가 있는 청크를 주지 않으면 컨텍스트 문자열 전체를 청크 하나로
+    if context_chunks is None:
+        context_chunks = [(context, 1.0)] if context else []
+
+    if CONTEXT_CACHE_ENABLED and deck and not images:
+        record_slide_usage(user_id, deck, [text for text, _ in context_chunks])
+        handle = await get_context_cache(user_id, deck, _CACHED_SYSTEM_INSTRUCTION, timing)
+        if handle is not None:
+            cached = [text for text, _ in context_chunks if slide_key(text) in handle["slide_keys"]]
+            uncached = [(text, score) for text, score in context_chunks if slide_key(text) not in handle["slide_keys"]]
+            # 캐시에 있는 슬라이드는 첫 줄([슬라이드 N] 제목)만 알려줌
+            related_slides = [text.splitlines()[0] for text in cached if text.strip()]
+            prompt = assemble_prompt(
+                lambda history_block, context_text, query_text: _build_cached_prompt(
+                    history_block, context_text, query_text, effective_n, related_slides
+                ),
+                query,
+                history_pairs=recent_pairs,
+                history_summary=history_summary,
+                context_chunks=uncached,
+                timing=timing
+            )
+            return prompt, handle["name"]
+
+    # 이미지 유무에 따라 적절한 프롬프트 빌더 함수 사용
+    builder = _build_multimodal_prompt if images else _build_text_prompt
+    prompt = assemble_prompt(
+        lambda history_block, context_text, query_text: builder(history_block, context_text, query_text, effective_n),
+        query,
+        history_pairs=recent_pairs,
+        history_summary=history_summary,
+        context_chunks=context_chunks,
+        timing=timing
+    )
+    return prompt, None
+
+def _is_stale_cache_error(error: Exception) -> bool:
+    """
+    캐시가 서버에서 만료/삭제되어 실패했는지 (404, 또는 cachedContent를 언급하는 400)
+    - 그 밖의 오류(429/5xx/타임아웃 등)는 캐시와 무관하므로 일반 호출로 다시 보내지 않음
+    """
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    status = error.response.status_code
+    if status == 404:
+        return True
+    if status != 400:
+        return False
+    try:
+        body = error.response.text
+    except httpx.ResponseNotRead:
+        return False
+    return "cachedcontent" in body.lower()
+
+def _record_usage(timing: Optional[Dict], usage: Dict) -> None:
+    # Gemini가 센 실제 토큰 수 (cached_tokens는 캐시에서 읽은 입력 토큰, prompt_tokens에 포함됨)
+    if timing is None or not usage:
+        return
+    timing['gemini_usage'] = {
+        "prompt_tokens": usage.get("promptTokenCount", 0),
+        "cached_tokens": usage.get("cachedContentTokenCount", 0),
+        "output_tokens": usage.get("candidatesTokenCount", 0)
+    }
+
 async def chat_with_llm(
     user_id: str,
     session_id: str,
     query: str,
     context: str,
     n_turns: int,
-    images: Optional[List[Dict]] = None
+    images: Optional[List[Dict]] = None,
+    recent_pairs: Optional[List[Tuple[str, str]]] = None,
+    history_summary: Optional[str] = None,
+    timing: Optional[Dict] = None,
+    context_chunks: Optional[List[Tuple[str, float]]] = None,
+    deck: Optional[str] = None
 ) -> str:
     """
     RAG 컨텍스트 + 최근 N턴 히스토리를 반영하여 Gemini 호출
+    - recent_pairs/history_summary: 미리 읽어 둔 히스토리 (없으면 여기서 읽음)
+    - context_chunks: (슬라이드 본문, 점수) 목록, 주면 context 대신 사용 (예산 초과 시 점수 낮은 것부터 제외)
+    - deck: 검색된 슬라이드의 덱 (컨텍스트 캐시 사용 시 이 덱의 캐시를 참조)
     """
-    
-    # n_turns 가드 (0이면 히스토리 주입 끔, 상한 50)
-    effective_n = max(0, min(n_turns, 50))
-    if effective_n == 0:
-        recent_pairs = []
-    else:
-        recent_pairs = load_recent_turns(user_id, session_id, effective_n)
-
-    history_block = _format_history_for_prompt(recent_pairs)
-    context_text = context or "없음"
-    
-    # 이미지 유무에 따라 적절한 프롬프트 빌더 함수 호출
-    if images:
-        prompt = _build_multimodal_prompt(history_block, context_text, query, effective_n)
-    else:
-        prompt = _build_text_prompt(history_block, context_text, query, effective_n)
+    prompt, cached_content = await _prepare_prompt(
+        user_id, session_id, query, context, n_turns, images, recent_pairs, history_summary, timing, context_chunks, deck
+    )
 
+    usage: Dict = {}
     try:
-        # 동기 함수인 call_gemini를 비동기적으로 실행
-        response = await asyncio.to_thread(
-            call_gemini, prompt, images=images
-        )
+        # 공용 커넥션 풀을 쓰는 비동기 클라이언트로 호출 (재시도/타임아웃 포함)
+        try:
+            response = await call_gemini_async(prompt, images=images, cached_content=cached_content, usage=usage)
+        except Exception as e:
+            if not cached_content or not _is_stale_cache_error(e):
+                raise
+            # 캐시가 서버에서 만료/삭제된 경우 → 핸들을 버리고 일반 프롬프트로 다시 호출
+            print(f"[WARN] 컨텍스트 캐시 사용 실패, 일반 호출로 재시도: {e}")
+            await drop_context_cache(user_id, deck)
+            if timing is not None:
+                timing['context_cache'] = "fallback"
+            prompt, _ = await _prepare_prompt(
+                user_id, session_id, query, context, n_turns, images, recent_pairs, history_summary, timing, context_chunks
+            )
+            response = await call_gemini_async(prompt, images=images, usage=usage)
+        _record_usage(timing, usage)
         answer = response.strip()
         # 히스토리에 이번 턴 저장
-        append_turn(user_id, session_id, query, answer)
+        await aappend_turn(user_id, session_id, query, answer)
         return answer
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
-        return "미안해. 답변을 만드는 데 문제가 생겼어."
\ No newline at end of file
+        return FALLBACK_ANSWER
+
+async def stream_chat_with_llm(
+    user_id: str,
+    session_id: str,
+    query: str,
+    context: str,
+    n_turns: int,
+    images: Optional[List[Dict]] = None,
+    recent_pairs: Optional[List[Tuple[str, str]]] = None,
+    history_summary: Optional[str] = None,
+    timing: Optional[Dict] = None,
+    context_chunks: Optional[List[Tuple[str, float]]] = None,
+    deck: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    chat_with_llm의 스트리밍 버전: 생성되는 텍스트 조각을 바로 반환하고, 끝나면 전체 턴을 히스토리에 저장
+    - Gemini 호출이 실패하면 (첫 조각 전이든 도중이든) 예외를 그대로 올림 → 라우터가 error 이벤트로 알림
+    """
+    prompt, cached_content = await _prepare_prompt(
+        user_id, session_id, query, context, n_turns, images, recent_pairs, history_summary, timing, context_chunks, deck
+    )
+
+    chunks: List[str] = []
+    usage: Dict = {}
+    try:
+        try:
+            async for chunk in stream_gemini_async(prompt, images=images, cached_content=cached_content, usage=usage):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            # 캐시 만료/삭제로 실패했고 아직 아무것도 내보내지 않았을 때만 일반 프롬프트로 다시 시도
+            if not cached_content or chunks or not _is_stale_cache_error(e):
+                raise
+            print(f"[WARN] 컨텍스트 캐시 사용 실패, 일반 호출로 재시도: {e}")
+            await drop_context_cache(user_id, deck)
+            if timing is not None:
+                timing['context_cache'] = "fallback"
+            prompt, _ = await _prepare_prompt(
+                user_id, session_id, query, context, n_turns, images, recent_pairs, history_summary, timing, context_chunks
+            )
+            async for chunk in stream_gemini_async(prompt, images=images, usage=usage):
+                chunks.append(chunk)
+                yield chunk
+    except Exception as e:
+        print(f"Error streaming Gemini API: {e}")
+        raise
+
+    _record_usage(timing, usage)
+
+    answer = "".join(chunks).strip()
+    if answer:
+        # 히스토리에 이번 턴 저장 (스트림이 끝까지 성공한 경우만)
+        await aappend_turn(user_id, session_id, query, answer)
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from cachetools import LRUCache
+from services.embedding.document_loader import iter_slide_documents_from_folder
+from services.llm.gemini_client import create_cached_content, delete_cached_content
+from utils.env_utils import get_bool_env, get_int_env
+from utils.file_utils import SLIDES_BASE_DIR
+from utils.token_utils import estimate_tokens
+
+# 덱 단위 Gemini 컨텍스트 캐시 (cachedContents)
+# - 같은 덱으로 여러 턴 대화할 때 고정 앞부분(시스템 지시문 + 덱 슬라이드)을 한 번만 올리고 이후 턴은 이름으로 참조
+# - 슬라이드는 이 덱에서 자주 검색된 순으로 CONTEXT_CACHE_MAX_TOKENS까지 담음 (처음엔 슬라이드 순서)
+# - Gemini는 최소 토큰 수 미만의 캐시를 만들 수 없으므로, 작은 덱은 캐시하지 않고 일반 호출 사용
+# - 사용자/덱별 핸들을 메모리에 두고 TTL이 지나면 다시 만듦, 문서가 바뀌면 invalidate_user로 폐기
+CONTEXT_CACHE_ENABLED = get_bool_env("CONTEXT_CACHE_ENABLED", False)
+CONTEXT_CACHE_TTL_SECONDS = max(60, get_int_env("CONTEXT_CACHE_TTL_SECONDS", 3600))
+CONTEXT_CACHE_MIN_TOKENS = max(0, get_int_env("CONTEXT_CACHE_MIN_TOKENS", 1024))
+CONTEXT_CACHE_MAX_TOKENS = max(1, get_int_env("CONTEXT_CACHE_MAX_TOKENS", 32000))
+# 메모리에 둘 (user_id, deck) 수 상한 (핸들/락/슬라이드 사용 빈도, 오래 안 쓰인 덱부터 버림)
+CONTEXT_CACHE_MAX_DECKS = max(1, get_int_env("CONTEXT_CACHE_MAX_DECKS", 1024))
+# 만료 직전 핸들은 요청 도중 만료될 수 있으므로 여유를 두고 새로 만듦
+_EXPIRY_MARGIN_SECONDS = 30
+# 생성에 실패한 덱은 잠시 일반 호출만 사용 (매 요청마다 생성 요청을 보내지 않도록)
+_RETRY_AFTER_SECONDS = 120
+
+# (user_id, deck) → {"name", "expires_at", "slide_keys", "tokens"} (name이 None이면 캐시하지 않기로 한 덱)
+# - 밀려난 핸들의 서버 캐시는 TTL이 지나면 사라짐
+_handles: LRUCache = LRUCache(maxsize=CONTEXT_CACHE_MAX_DECKS)
+_locks: LRUCache = LRUCache(maxsize=CONTEXT_CACHE_MAX_DECKS)
+# (user_id, deck) → 슬라이드별 검색된 횟수
+_usage: LRUCache = LRUCache(maxsize=CONTEXT_CACHE_MAX_DECKS)
+# user_id → 폐기 세대 (invalidate_user마다 증가, 생성 도중 폐기된 핸들은 저장하지 않음)
+_generations: Dict[str, int] = {}
+
+def slide_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def pick_deck(source_documents: List[Dict]) -> Optional[str]:
+    """
+    검색된 슬라이드가 가장 많이 속한 덱 (없으면 None)
+    """
+    decks = Counter(doc["metadata"].get("deck") for doc in source_documents if doc.get("metadata"))
+    decks.pop(None, None)
+    return decks.most_common(1)[0][0] if decks else None
+
+def record_slide_usage(user_id: str, deck: str, texts: Iterable[str]) -> None:
+    counter = _usage.get((user_id, deck))
+    if counter is None:
+        counter = _usage[(user_id, deck)] = Counter()
+    counter.update(slide_key(text) for text in texts)
+
+def _select_slides(user_id: str, deck: str) -> List[str]:
+    """
+    덱 슬라이드를 검색 빈도 순(같으면 슬라이드 순서)으로 토큰 상한까지 선택
+    """
+    documents = list(iter_slide_documents_from_folder(os.path.join(SLIDES_BASE_DIR, user_id), deck))
+    counter = _usage.get((user_id, deck), Counter())
+    ranked = sorted(enumerate(documents), key=lambda item: (-counter[slide_key(item[1].page_content)], item[0]))
+
+    selected: List[str] = []
+    used = 0
+    for _, doc in ranked:
+        tokens = estimate_tokens(doc.page_content)
+        if used + tokens > CONTEXT_CACHE_MAX_TOKENS:
+            continue
+        selected.append(doc.page_content)
+        used += tokens
+    return selected
+
+async def _create(user_id: str, deck: str, system_instruction: str) -> Dict:
+    slides = await asyncio.to_thread(_select_slides, user_id, deck)
+    contents_text = f"[강의 자료 ({deck})]\n" + "\n\n".join(slides)
+    tokens = estimate_tokens(system_instruction) + estimate_tokens(contents_text)
+    if not slides or tokens < CONTEXT_CACHE_MIN_TOKENS:
+        # 다음 TTL까지는 다시 확인하지 않음
+        return {"name": None, "expires_at": time.time() + CONTEXT_CACHE_TTL_SECONDS, "slide_keys": set(), "tokens": tokens}
+
+    response = await create_cached_content(
+        system_instruction, contents_text, CONTEXT_CACHE_TTL_SECONDS, display_name=f"{user_id}:{deck}"[:128]
+    )
+    tokens = (response.get("usageMetadata") or {}).get("totalTokenCount", tokens)
+    print(f"[CACHE] 컨텍스트 캐시 생성: {user_id}/{deck} ({len(slides)}개 슬라이드, {tokens}토큰)")
+    return {
+        "name": response["name"],
+        "expires_at": time.time() + CONTEXT_CACHE_TTL_SECONDS,
+        "slide_keys": {slide_key(text) for text in slides},
+        "tokens": tokens
+    }
+
+async def get_context_cache(
+    user_id: str,
+    deck: str,
+    system_instruction: str,
+    timing: Optional[Dict] = None
+) -> Optional[Dict]:
+    """
+    (user_id, deck)의 유효한 캐시 핸들 반환, 없으면 만듦 (캐시하지 않는 덱이거나 생성 실패면 None)
+    - timing['context_cache']: hit / created / skipped / error / invalidated
+    """
+    key = (user_id, deck)
+    # 모두 이벤트 루프에서 실행되므로 조회와 생성 사이에 다른 요청이 끼어들지 않음
+    lock = _locks.get(key)
+    if lock is None:
+        lock = _locks[key] = asyncio.Lock()
+    status = "hit"
+    async with lock:
+        handle = _handles.get(key)
+        if handle is None or handle["expires_at"] - _EXPIRY_MARGIN_SECONDS <= time.time():
+            start = time.perf_counter()
+            generation = _generations.get(user_id, 0)
+            try:
+                handle = await _create(user_id, deck, system_instruction)
+            except Exception as e:
+                # 생성 실패는 일반 호출로 대체 (_RETRY_AFTER_SECONDS 뒤 다시 시도)
+                print(f"[WARN] 컨텍스트 캐시 생성 실패: {e}")
+                if _generations.get(user_id, 0) == generation:
+                    _handles[key] = {
+                        "name": None,
+                        "expires_at": time.time() + _EXPIRY_MARGIN_SECONDS + _RETRY_AFTER_SECONDS,
+                        "slide_keys": set(),
+                        "tokens": 0
+                    }
+                if timing is not None:
+                    timing['context_cache'] = "error"
+                return None
+            if _generations.get(user_id, 0) != generation:
+                # 만드는 도중 문서가 바뀜 → 이전 슬라이드로 만든 캐시는 버리고 이번 요청은 일반 호출
+                if handle["name"]:
+                    await _delete_remote(handle["name"])
+                if timing is not None:
+                    timing['context_cache'] = "invalidated"
+                return None
+            _handles[key] = handle
+            status = "created"
+            if timing is not None:
+                timing['context_cache_create'] = round(time.perf_counter() - start, 3)
+
+    if handle["name"] is None:
+        status = "skipped"
+    if timing is not None:
+        timing['context_cache'] = status
+    return handle if handle["name"] else None
+
+async def drop_context_cache(user_id: str, deck: str) -> None:
+    """
+    핸들 하나를 버림 (서버에서 만료/삭제된 캐시를 참조해 호출이 실패했을 때)
+    """
+    handle = _handles.pop((user_id, deck), None)
+    if handle and handle["name"]:
+        await _delete_remote(handle["name"])
+
+async def invalidate_user(user_id: str) -> int:
+    """
+    사용자의 모든 덱 캐시를 폐기 (문서가 바뀌었을 때), 폐기한 핸들 수 반환
+    - 세대를 올려 지금 생성 중인 핸들이 폐기 뒤에 다시 저장되지 않게 함
+    """
+    _generations[user_id] = _generations.get(user_id, 0) + 1
+    # 사용 빈도는 바뀐 문서 기준으로 다시 셈, 락은 지금 잡혀 있지 않은 것만 버림
+    for key in [key for key in list(_usage.keys()) if key[0] == user_id]:
+        _usage.pop(key, None)
+    for key in [key for key in list(_locks.keys()) if key[0] == user_id]:
+        if not _locks[key].locked():
+            _locks.pop(key, None)
+    keys = [key for key in list(_handles.keys()) if key[0] == user_id]
+    names = [_handles.pop(key)["name"] for key in keys]
+    await asyncio.gather(*[_delete_remote(name) for name in names if name])
+    if keys:
+        print(f"[CACHE] 컨텍스트 캐시 폐기: {user_id} ({len(keys)}개 덱)")
+    return len(keys)
+
+async def _delete_remote(name: str) -> None:
+    # 삭제 실패해도 TTL이 지나면 서버에서 사라지므로 경고만
+    try:
+        await delete_cached_content(name)
+    except Exception as e:
+        print(f"[WARN] 컨텍스트 캐시 삭제 실패 ({name}): {e}")
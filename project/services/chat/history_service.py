@@ -1,14 +1,18 @@
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+import asyncio
+import json
 import os
+import threading
+import time
 from functools import lru_cache
 from redis import Redis as RedisClient
+from redis.asyncio import Redis as AsyncRedisClient
 from langchain_redis.chat_message_history import RedisChatMessageHistory
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage
 import re
+from utils.env_utils import get_bool_env, get_int_env
 
 REDIS_URL = os.getenv("REDIS_URL")
-if not REDIS_URL:
-    raise ValueError("환경변수 REDIS_URL이 필요합니다.")
 
 # prefix/ttl은 기본값 허용이 더 안전
 KEY_PREFIX = os.getenv("CHAT_HISTORY_KEY_PREFIX", "tuddy:chat:")
@@ -24,6 +28,15 @@ else:
     except ValueError:
         TTL = None
         
+# 세션 히스토리 저장 방식
+# - 세션마다 Redis list 하나, 원소 하나 = 한 턴({"u": 질문, "a": 답변, "t": 시각} JSON)
+# - 읽기는 LRANGE 음수 인덱스로 마지막 N턴만, 쓰기는 RPUSH+LTRIM+EXPIRE를 MULTI 한 번으로
+HISTORY_MAX_TURNS = max(1, get_int_env("HISTORY_MAX_TURNS", 200))
+REDIS_MAX_CONNECTIONS = max(1, get_int_env("REDIS_MAX_CONNECTIONS", 50))
+# 이전 형식(RedisChatMessageHistory)에만 기록이 있는 세션은 처음 읽을 때 새 형식으로 옮김
+# - 세션마다 :migrated 표시로 한 번만 확인, 이전 형식 세션이 모두 만료된 뒤에는 꺼도 됨
+HISTORY_LEGACY_FALLBACK = get_bool_env("HISTORY_LEGACY_FALLBACK", True)
+
 SAFE_RE = re.compile(r'[^0-9A-Za-z_]')
 
 def _sanitize(s: str) -> str:
@@ -35,6 +48,9 @@ def _session_key(user_id: str, session_id: str) -> str:
 
 @lru_cache(maxsize=1)
 def _get_redis_client() -> RedisClient:
+    # import 시점이 아니라 실제 연결 시점에 검사 (Redis를 안 쓰는 워커도 뜰 수 있도록)
+    if not REDIS_URL:
+        raise ValueError("환경변수 REDIS_URL이 필요합니다.")
     return RedisClient.from_url(
         REDIS_URL,
         socket_timeout=5,           # 개별 커맨드 최대 대기
@@ -42,10 +58,74 @@ def _get_redis_client() -> RedisClient:
         health_check_interval=30,   # 커넥션 keepalive/헬스체크
         retry_on_timeout=True,      # 타임아웃 시 재시도
         # decode_responses=False,   # 필요 시 텍스트 디코딩
-        # max_connections=100,      # QPS 높으면 풀 상한 지정
+        max_connections=REDIS_MAX_CONNECTIONS,
     )
 
+_async_client: Optional[AsyncRedisClient] = None
+_async_client_lock = threading.Lock()
+
+def _get_async_redis_client() -> AsyncRedisClient:
+    # 동기 클라이언트(lru_cache)와 달리 전역 변수라 생성은 락으로 한 번만
+    # - 비동기 클라이언트의 커넥션은 처음 쓴 이벤트 루프에 묶이므로 앱의 이벤트 루프에서만 사용
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            if not REDIS_URL:
+                raise ValueError("환경변수 REDIS_URL이 필요합니다.")
+            _async_client = AsyncRedisClient.from_url(
+                REDIS_URL,
+                socket_timeout=5,
+                socket_connect_timeout=5,
+                health_check_interval=30,
+                retry_on_timeout=True,
+                max_connections=REDIS_MAX_CONNECTIONS,
+            )
+        return _async_client
+
+async def aclose_redis_clients() -> None:
+    """
+    앱 종료 시 비동기 커넥션 풀 정리
+    """
+    global _async_client
+    with _async_client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
+
+def _turns_key(user_id: str, session_id: str) -> str:
+    return f"{_session_key(user_id, session_id)}:turns"
+
+def _count_key(user_id: str, session_id: str) -> str:
+    # 지금까지 추가된 턴 수 (LTRIM으로 잘려도 줄지 않음 → 턴의 절대 번호 계산용)
+    return f"{_session_key(user_id, session_id)}:count"
+
+def _summary_key(user_id: str, session_id: str) -> str:
+    # 롤링 요약 {"text": 요약, "covered": 요약에 포함된 턴 수(절대 번호 기준)}
+    return f"{_session_key(user_id, session_id)}:summary"
+
+def _migrated_key(user_id: str, session_id: str) -> str:
+    # 이전 형식 기록을 확인(및 이전)했다는 표시 (기록이 없었던 경우도 포함)
+    return f"{_session_key(user_id, session_id)}:migrated"
+
+def _summarizing_key(user_id: str, session_id: str) -> str:
+    # 요약 작업을 맡은 워커 표시 (여러 워커가 같은 세션을 동시에 요약하지 않도록)
+    return f"{_session_key(user_id, session_id)}:summarizing"
+
+def _encode_turn(user_text: str, ai_text: str) -> str:
+    return json.dumps({"u": user_text, "a": ai_text, "t": int(time.time())}, ensure_ascii=False)
+
+def _decode_turns(raw_items: List) -> List[Tuple[str, str]]:
+    pairs = []
+    for raw in raw_items:
+        try:
+            item = json.loads(raw)
+            pairs.append((item["u"], item["a"]))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return pairs
+
 def get_history(user_id: str, session_id: str) -> RedisChatMessageHistory:
+    # 이전 형식 히스토리 (읽기 호환/이전용)
     client = _get_redis_client()
     return RedisChatMessageHistory(
         session_id=_session_key(user_id, session_id),
@@ -53,9 +133,10 @@ def get_history(user_id: str, session_id: str) -> RedisChatMessageHistory:
         ttl=TTL
     )
 
-def load_recent_turns(
-    user_id: str, session_id: str, n_turns: int
-) -> List[Tuple[str, str]]:
+def _load_legacy_turns(user_id: str, session_id: str) -> List[Tuple[str, str]]:
+    """
+    이전 형식(RedisChatMessageHistory) 기록을 (질문, 답변) 쌍으로 읽음
+    """
     hist = get_history(user_id, session_id)
     messages: List[BaseMessage] = hist.messages # 삽입순으로 정렬된걸 반환
 
@@ -68,17 +149,166 @@ def load_recent_turns(
             if pending_human is not None:
                 pairs.append((pending_human, m.content))
                 pending_human = None
+    return pairs
 
-    if n_turns > 0 and len(pairs) > n_turns:
-        # 슬라이싱으로 n_turns > 실제 pair 여도 문제 없음
-        pairs = pairs[-n_turns:]
+def _migrate_legacy(user_id: str, session_id: str) -> List[Tuple[str, str]]:
+    """
+    이전 형식 기록을 새 형식으로 옮김 (세션당 한 번)
+    - SET NX로 표시를 잡은 요청만 옮김 → 같은 세션의 첫 요청이 동시에 여럿 와도 중복으로 RPUSH하지 않음
+    - 기록이 없었다는 결과도 표시로 남아 이후 요청은 이전 형식을 다시 읽지 않음
+    """
+    client = _get_redis_client()
+    marker = _migrated_key(user_id, session_id)
+    if not client.set(marker, 1, nx=True, ex=TTL):
+        return []
+    try:
+        pairs = _load_legacy_turns(user_id, session_id)[-HISTORY_MAX_TURNS:]
+    except Exception as e:
+        # 다음 요청에서 다시 시도할 수 있도록 표시 해제
+        print(f"[WARN] 이전 형식 히스토리 읽기 실패: {e}")
+        client.delete(marker)
+        return []
+    if pairs:
+        key = _turns_key(user_id, session_id)
+        pipe = client.pipeline(transaction=True)
+        count_key = _count_key(user_id, session_id)
+        pipe.rpush(key, *[_encode_turn(u, a) for u, a in pairs])
+        pipe.incrby(count_key, len(pairs))
+        if TTL:
+            pipe.expire(key, TTL)
+            pipe.expire(count_key, TTL)
+        pipe.execute()
+        print(f"[HISTORY] 이전 형식 히스토리 이전: {key} ({len(pairs)}턴)")
+    return pairs
+
+def load_recent_turns(
+    user_id: str, session_id: str, n_turns: int
+) -> List[Tuple[str, str]]:
+    """
+    마지막 n_turns 턴만 읽음 (저장된 전체 길이와 무관하게 O(n_turns))
+    """
+    if n_turns <= 0:
+        return []
+    client = _get_redis_client()
+    key = _turns_key(user_id, session_id)
+    pairs = _decode_turns(client.lrange(key, -n_turns, -1))
+    if not pairs and HISTORY_LEGACY_FALLBACK and not client.exists(key, _migrated_key(user_id, session_id)):
+        pairs = _migrate_legacy(user_id, session_id)[-n_turns:]
+    return pairs
+
+async def aload_recent_turns(
+    user_id: str, session_id: str, n_turns: int
+) -> List[Tuple[str, str]]:
+    """
+    load_recent_turns의 비동기 버전 (공용 커넥션 풀 사용)
+    """
+    if n_turns <= 0:
+        return []
+    client = _get_async_redis_client()
+    key = _turns_key(user_id, session_id)
+    pairs = _decode_turns(await client.lrange(key, -n_turns, -1))
+    if not pairs and HISTORY_LEGACY_FALLBACK and not await client.exists(key, _migrated_key(user_id, session_id)):
+        pairs = (await asyncio.to_thread(_migrate_legacy, user_id, session_id))[-n_turns:]
     return pairs
 
 def append_turn(user_id: str, session_id: str, user_text: str, ai_text: str) -> None:
-    hist = get_history(user_id, session_id)
-    hist.add_user_message(user_text)
-    hist.add_ai_message(ai_text)
+    """
+    한 턴을 추가하면서 최대 길이로 자르고 TTL 갱신 (MULTI 한 번)
+    """
+    key = _turns_key(user_id, session_id)
+    count_key = _count_key(user_id, session_id)
+    pipe = _get_redis_client().pipeline(transaction=True)
+    pipe.rpush(key, _encode_turn(user_text, ai_text))
+    pipe.ltrim(key, -HISTORY_MAX_TURNS, -1)
+    pipe.incr(count_key)
+    if TTL:
+        pipe.expire(key, TTL)
+        pipe.expire(count_key, TTL)
+        pipe.expire(_summary_key(user_id, session_id), TTL)
+    pipe.execute()
+
+async def aappend_turn(user_id: str, session_id: str, user_text: str, ai_text: str) -> None:
+    key = _turns_key(user_id, session_id)
+    count_key = _count_key(user_id, session_id)
+    async with _get_async_redis_client().pipeline(transaction=True) as pipe:
+        pipe.rpush(key, _encode_turn(user_text, ai_text))
+        pipe.ltrim(key, -HISTORY_MAX_TURNS, -1)
+        pipe.incr(count_key)
+        if TTL:
+            pipe.expire(key, TTL)
+            pipe.expire(count_key, TTL)
+            pipe.expire(_summary_key(user_id, session_id), TTL)
+        await pipe.execute()
+
+async def aload_history_window(user_id: str, session_id: str, n_turns: int) -> Dict:
+    """
+    프롬프트 구성용으로 요약 + 마지막 n_turns 턴을 한 번의 왕복으로 읽음
+    - turns: [(절대 번호, 질문, 답변)], covered 이전 번호의 턴은 이미 요약에 포함됨
+    """
+    client = _get_async_redis_client()
+    key = _turns_key(user_id, session_id)
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.hmget(_summary_key(user_id, session_id), "text", "covered")
+        pipe.get(_count_key(user_id, session_id))
+        pipe.llen(key)
+        pipe.lrange(key, -max(n_turns, 1), -1)
+        pipe.exists(_migrated_key(user_id, session_id))
+        (summary_text, covered), count, length, raw_items, migrated = await pipe.execute()
+
+    if n_turns <= 0:
+        raw_items = []
+    if length == 0 and HISTORY_LEGACY_FALLBACK and n_turns > 0 and not migrated:
+        migrated = await asyncio.to_thread(_migrate_legacy, user_id, session_id)
+        count, length = len(migrated), len(migrated)
+        raw_items = [_encode_turn(u, a) for u, a in migrated[-n_turns:]]
+
+    # count 키가 없던 시기에 쌓인 세션은 list 길이로 대신
+    total = max(int(count or 0), length)
+    pairs = _decode_turns(raw_items)
+    first = total - len(pairs)
+    return {
+        "summary": summary_text.decode("utf-8") if isinstance(summary_text, bytes) else summary_text,
+        "covered": int(covered or 0),
+        "total": total,
+        "turns": [(first + i, u, a) for i, (u, a) in enumerate(pairs)]
+    }
+
+async def aload_turn_range(user_id: str, session_id: str, start: int, end: int) -> List[Tuple[int, str, str]]:
+    """
+    절대 번호 [start, end) 구간의 턴 (이미 잘려 나간 턴은 제외)
+    """
+    client = _get_async_redis_client()
+    key = _turns_key(user_id, session_id)
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.get(_count_key(user_id, session_id))
+        pipe.lrange(key, 0, -1)
+        count, raw_items = await pipe.execute()
+    pairs = _decode_turns(raw_items)
+    first = max(int(count or 0), len(pairs)) - len(pairs)
+    return [(first + i, u, a) for i, (u, a) in enumerate(pairs) if start <= first + i < end]
+
+async def asave_summary(user_id: str, session_id: str, text: str, covered: int) -> None:
+    key = _summary_key(user_id, session_id)
+    async with _get_async_redis_client().pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={"text": text, "covered": covered})
+        if TTL:
+            pipe.expire(key, TTL)
+        await pipe.execute()
+
+async def aclaim_summary(user_id: str, session_id: str, ttl_seconds: int) -> bool:
+    """
+    세션 요약 작업을 SET NX로 맡음 (다른 워커가 이미 맡았으면 False)
+    - 워커가 도중에 죽어도 ttl_seconds 뒤에는 다시 맡을 수 있음
+    """
+    return bool(await _get_async_redis_client().set(_summarizing_key(user_id, session_id), 1, nx=True, ex=ttl_seconds))
+
+async def arelease_summary(user_id: str, session_id: str) -> None:
+    await _get_async_redis_client().delete(_summarizing_key(user_id, session_id))
 
 def clear_session(user_id: str, session_id: str) -> None:
-    hist = get_history(user_id, session_id)
-    hist.clear()
+    _get_redis_client().delete(
+        _turns_key(user_id, session_id), _count_key(user_id, session_id), _summary_key(user_id, session_id),
+        _migrated_key(user_id, session_id)
+    )
+    # 이전 형식 기록도 항상 삭제 (폴백을 꺼 둔 뒤에 다시 켜도 지운 대화가 되살아나지 않도록)
+    get_history(user_id, session_id).clear()
@@ -1,17 +1,9 @@
-import asyncio
-from typing import List, Tuple, Optional, Dict
-from services.ocr.gemini_service import call_gemini
-from services.chat.history_service import load_recent_turns, append_turn
-
-def _format_history_for_prompt(pairs: List[Tuple[str, str]]) -> str:
-    if not pairs:
-        return "없음"
-    lines = []
-    for i, (u, a) in enumerate(pairs, start=1):
-        lines.append(f"[대화 {i}]")
-        lines.append(f"User: {u}")
-        lines.append(f"Assistant: {a}")
-    return "\n".join(lines)
+from typing import AsyncIterator, List, Optional, Dict
+from services.llm.gemini_client import call_gemini_async, stream_gemini_async
+from services.chat.chat_service import FALLBACK_ANSWER
+from services.chat.history_service import aappend_turn
+from services.chat.prompt_service import assemble_prompt
+from services.chat.summary_service import load_history_context
 
 def _build_text_prompt(history_block: str, query: str, effective_n: int) -> str:
     """텍스트 전용 요청을 위한 프롬프트"""
@@ -47,36 +39,74 @@ def _build_multimodal_prompt(history_block: str, query: str, effective_n: int) -
 {query}
 """.strip()
 
-async def normal_chat_with_llm(
+async def _prepare_prompt(
     user_id: str,
     session_id: str,
     query: str,
     n_turns: int,
-    images: Optional[List[Dict]] = None
+    images: Optional[List[Dict]] = None,
+    timing: Optional[Dict] = None
 ) -> str:
-    
     # n_turns 가드 (0이면 히스토리 주입 끔, 상한 50)
     effective_n = max(0, min(n_turns, 50))
     if effective_n == 0:
-        recent_pairs = []
+        history_summary, recent_pairs = None, []
     else:
-        recent_pairs = load_recent_turns(user_id, session_id, effective_n)
+        # 긴 세션은 이전 대화 요약 + 요약되지 않은 최근 턴만 사용
+        history_summary, recent_pairs = await load_history_context(user_id, session_id, effective_n, timing)
+
+    # 이미지 유무에 따라 적절한 프롬프트 빌더 함수 사용 (강의 자료 섹션 없음)
+    builder = _build_multimodal_prompt if images else _build_text_prompt
+    return assemble_prompt(
+        lambda history_block, _, query_text: builder(history_block, query_text, effective_n),
+        query,
+        history_pairs=recent_pairs,
+        history_summary=history_summary,
+        timing=timing
+    )
+
+async def normal_chat_with_llm(
+    user_id: str,
+    session_id: str,
+    query: str,
+    n_turns: int,
+    images: Optional[List[Dict]] = None,
+    timing: Optional[Dict] = None
+) -> str:
+    prompt = await _prepare_prompt(user_id, session_id, query, n_turns, images, timing)
 
-    history_block = _format_history_for_prompt(recent_pairs)
-    
-    # 이미지 유무에 따라 적절한 프롬프트 빌더 함수 호출
-    if images:
-        prompt = _build_multimodal_prompt(history_block, query, effective_n)
-    else:
-        prompt = _build_text_prompt(history_block, query, effective_n)
-        
     try:
-        response = await asyncio.to_thread(
-            call_gemini, prompt, images=images
-        )
+        response = await call_gemini_async(prompt, images=images)
         answer = response.strip()
-        append_turn(user_id, session_id, query, answer)
+        await aappend_turn(user_id, session_id, query, answer)
         return answer
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
-        return "미안해. 답변을 만드는 데 문제가 생겼어."
\ No newline at end of file
+        return FALLBACK_ANSWER
+
+async def stream_normal_chat_with_llm(
+    user_id: str,
+    session_id: str,
+    query: str,
+    n_turns: int,
+    images: Optional[List[Dict]] = None,
+    timing: Optional[Dict] = None
+) -> AsyncIterator[str]:
+    """
+    normal_chat_with_llm의 스트리밍 버전 (끝까지 받은 답변만 히스토리에 저장)
+    - Gemini 호출이 실패하면 (첫 조각 전이든 도중이든) 예외를 그대로 올림 → 라우터가 error 이벤트로 알림
+    """
+    prompt = await _prepare_prompt(user_id, session_id, query, n_turns, images, timing)
+
+    chunks: List[str] = []
+    try:
+        async for chunk in stream_gemini_async(prompt, images=images):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        print(f"Error streaming Gemini API: {e}")
+        raise
+
+    answer = "".join(chunks).strip()
+    if answer:
+        await aappend_turn(user_id, session_id, query, answer)
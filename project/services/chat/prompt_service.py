@@ -0,0 +1,136 @@
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from services.chat.summary_service import format_history_for_prompt
+from utils.env_utils import get_float_env, get_int_env
+from utils.token_utils import estimate_tokens, truncate_to_tokens
+
+# 프롬프트 조립 (섹션별 토큰 예산)
+# - 히스토리: 요약은 유지하고 오래된 턴부터 버림, 한 턴이 너무 길면 답변을 자름
+# - 강의 자료: 거의 같은 슬라이드는 하나만 남기고, 점수 낮은 것부터 버림 (최상위 하나는 잘라서라도 유지)
+# - 질문: 상한을 넘으면 자름 / 지시문(템플릿)은 고정이라 측정만
+PROMPT_HISTORY_BUDGET = max(1, get_int_env("PROMPT_HISTORY_BUDGET", 2500))
+PROMPT_CONTEXT_BUDGET = max(1, get_int_env("PROMPT_CONTEXT_BUDGET", 2000))
+PROMPT_QUERY_BUDGET = max(1, get_int_env("PROMPT_QUERY_BUDGET", 1000))
+# 글자 3-gram 자카드 유사도가 이 값 이상이면 같은 슬라이드로 보고 중복 제거
+PROMPT_DEDUP_THRESHOLD = get_float_env("PROMPT_DEDUP_THRESHOLD", 0.9)
+
+_WS_RE = re.compile(r"\s+")
+
+# (history_block, context_text, query) → 완성된 프롬프트
+PromptRenderer = Callable[[str, str, str], str]
+
+def _shingles(text: str, n: int = 3) -> Set[str]:
+    text = _WS_RE.sub(" ", text).strip().lower()
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def select_context_chunks(
+    chunks: List[Tuple[str, float]],
+    budget: int,
+    stats: Optional[Dict] = None
+) -> List[str]:
+    """
+    점수 높은 순으로 중복을 건너뛰며 예산 안에 들어가는 청크만 선택
+    """
+    kept: List[Tuple[str, Set[str]]] = []
+    used = 0
+    deduped = dropped = 0
+    for text, _ in sorted(chunks, key=lambda item: item[1], reverse=True):
+        shingles = _shingles(text)
+        if any(_jaccard(shingles, other) >= PROMPT_DEDUP_THRESHOLD for _, other in kept):
+            deduped += 1
+            continue
+        tokens = estimate_tokens(text)
+        if used + tokens > budget:
+            if kept:
+                dropped += 1
+                continue
+            # 가장 관련도 높은 청크가 혼자 예산을 넘으면 잘라서 넣음
+            text = truncate_to_tokens(text, budget)
+            tokens = estimate_tokens(text)
+        kept.append((text, shingles))
+        used += tokens
+    if stats is not None:
+        stats['context_chunks_deduped'] = deduped
+        stats['context_chunks_dropped'] = dropped
+    return [text for text, _ in kept]
+
+def select_history(
+    pairs: List[Tuple[str, str]],
+    summary: Optional[str],
+    budget: int,
+    stats: Optional[Dict] = None
+) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+    """
+    최근 턴부터 거꾸로 채우고 남는 예산이 없으면 오래된 턴을 버림
+    """
+    if summary:
+        # 요약은 예산의 절반까지만
+        summary = truncate_to_tokens(summary, budget // 2)
+    # 요약/턴 머리말([이전 대화 요약], User: 등)까지 예산에 포함
+    remaining = budget - (estimate_tokens(format_history_for_prompt([], summary)) if summary else 0)
+
+    kept: List[Tuple[str, str]] = []
+    for u, a in reversed(pairs):
+        tokens = estimate_tokens(format_history_for_prompt([(u, a)]))
+        if tokens > remaining:
+            if kept:
+                break
+            # 가장 최근 턴은 답변을 잘라서라도 유지 (바로 이어지는 질문이 많음)
+            # 질문이 너무 길면 질문도 남은 예산의 절반까지 자름, 머리말조차 안 들어가면 버림
+            available = remaining - estimate_tokens(format_history_for_prompt([("", "")]))
+            if available <= 0:
+                break
+            u = truncate_to_tokens(u, available // 2)
+            a = truncate_to_tokens(a, available - estimate_tokens(u))
+            tokens = estimate_tokens(format_history_for_prompt([(u, a)]))
+        kept.append((u, a))
+        remaining -= tokens
+    kept.reverse()
+    if stats is not None:
+        stats['history_turns_dropped'] = len(pairs) - len(kept)
+    return kept, summary
+
+def assemble_prompt(
+    render: PromptRenderer,
+    query: str,
+    history_pairs: Optional[List[Tuple[str, str]]] = None,
+    history_summary: Optional[str] = None,
+    context_chunks: Optional[List[Tuple[str, float]]] = None,
+    timing: Optional[Dict] = None
+) -> str:
+    """
+    섹션별 예산을 적용해 프롬프트를 만들고, 섹션별/전체 토큰 수를 timing에 기록
+    - context_chunks가 None이면 강의 자료 섹션이 없는 프롬프트 (일반 챗)
+    """
+    stats: Dict = {}
+    pairs, summary = select_history(history_pairs or [], history_summary, PROMPT_HISTORY_BUDGET, stats)
+    history_block = format_history_for_prompt(pairs, summary)
+
+    context_text = ""
+    if context_chunks is not None:
+        context_text = "\n\n".join(select_context_chunks(context_chunks, PROMPT_CONTEXT_BUDGET, stats)) or "없음"
+
+    query_text = truncate_to_tokens(query, PROMPT_QUERY_BUDGET)
+    prompt = render(history_block, context_text, query_text)
+
+    if timing is not None:
+        history_tokens = estimate_tokens(history_block)
+        context_tokens = estimate_tokens(context_text)
+        query_tokens = estimate_tokens(query_text)
+        prompt_tokens = estimate_tokens(prompt)
+        timing['prompt_tokens'] = prompt_tokens
+        timing['prompt_tokens_by_section'] = {
+            "instructions": max(0, prompt_tokens - history_tokens - context_tokens - query_tokens),
+            "history": history_tokens,
+            "context": context_tokens,
+            "query": query_tokens
+        }
+        timing.update(stats)
+    return prompt
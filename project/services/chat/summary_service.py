@@ -0,0 +1,132 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from services.chat.history_service import (
+    aclaim_summary, aload_history_window, aload_turn_range, arelease_summary, asave_summary
+)
+from services.llm.gemini_client import call_gemini_async
+from utils.env_utils import get_bool_env, get_int_env
+from utils.token_utils import estimate_tokens
+
+# 긴 세션 히스토리 압축 (롤링 요약)
+# - 요약되지 않은 턴의 토큰 수가 HISTORY_TOKEN_BUDGET을 넘으면, 마지막 HISTORY_RAW_TURNS턴을 뺀 나머지를
+#   기존 요약과 합쳐 백그라운드에서 다시 요약 (요청 경로에서는 기다리지 않음)
+# - 프롬프트에는 요약 + 요약되지 않은 최근 턴만 넣음
+# - 요약은 Gemini 호출이 추가되고 프롬프트 내용도 바뀌므로 기본 비활성화 (HISTORY_SUMMARY_ENABLED=true로 사용)
+HISTORY_SUMMARY_ENABLED = get_bool_env("HISTORY_SUMMARY_ENABLED", False)
+HISTORY_TOKEN_BUDGET = max(1, get_int_env("HISTORY_TOKEN_BUDGET", 3000))
+HISTORY_RAW_TURNS = max(1, get_int_env("HISTORY_RAW_TURNS", 4))
+HISTORY_SUMMARY_MAX_CHARS = max(100, get_int_env("HISTORY_SUMMARY_MAX_CHARS", 1200))
+# 요약 작업 표시(SET NX) 유지 시간, 요약 호출이 이보다 오래 걸리지 않도록 넉넉히
+HISTORY_SUMMARY_LOCK_SECONDS = max(10, get_int_env("HISTORY_SUMMARY_LOCK_SECONDS", 180))
+
+# 이 워커에서 진행 중인 요약 작업 (Redis에 묻기 전에 거르는 용도, 워커 간 중복은 aclaim_summary로 막음) / 태스크 참조 유지
+_in_progress: Set[Tuple[str, str]] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+def format_history_for_prompt(pairs: List[Tuple[str, str]], summary: Optional[str] = None) -> str:
+    """
+    최근 대화 N턴(+ 이전 대화 요약)을 프롬프트에 안전하게 삽입하기 위한 간단한 포맷터
+    """
+    if not pairs and not summary:
+        return "없음"
+    lines = []
+    if summary:
+        lines.append("[이전 대화 요약]")
+        lines.append(summary)
+    for i, (u, a) in enumerate(pairs, start=1):
+        lines.append(f"[대화 {i}]")
+        lines.append(f"User: {u}")
+        lines.append(f"Assistant: {a}")
+    return "\n".join(lines)
+
+def _build_summary_prompt(previous_summary: Optional[str], pairs: List[Tuple[str, str]]) -> str:
+    return f"""
+너는 대화 기록을 정리하는 도우미야. 아래는 학생과 스터디 파트너(AI)가 강의 자료로 공부하며 나눈 대화야.
+[기존 요약]과 [새 대화]를 합쳐서, 이후 대화를 이어가는 데 필요한 내용만 하나의 요약으로 다시 써줘.
+
+[요약 규칙]
+1. 학생이 물어본 개념/질문, 답변의 핵심 결론, 학생이 헷갈려한 부분, 앞으로 하기로 한 것을 남기기
+2. 인용된 슬라이드 번호(ex) [슬라이드 6])는 유지하기
+3. 인사말/잡담/반복 설명은 빼기
+4. 한국어, {HISTORY_SUMMARY_MAX_CHARS}자 이내, 요약 본문만 출력
+
+[기존 요약]
+{previous_summary or "없음"}
+
+[새 대화]
+{format_history_for_prompt(pairs)}
+""".strip()
+
+async def _compact(user_id: str, session_id: str, previous_summary: Optional[str], covered: int, until: int) -> None:
+    """
+    절대 번호 [covered, until) 턴을 기존 요약에 합쳐 새 요약으로 저장
+    """
+    start = time.perf_counter()
+    claimed = False
+    try:
+        # 다른 워커가 이미 요약 중이면 맡지 않음
+        claimed = await aclaim_summary(user_id, session_id, HISTORY_SUMMARY_LOCK_SECONDS)
+        if not claimed:
+            return
+        turns = await aload_turn_range(user_id, session_id, covered, until)
+        if not turns:
+            return
+        prompt = _build_summary_prompt(previous_summary, [(u, a) for _, u, a in turns])
+        summary = (await call_gemini_async(prompt)).strip()
+        if summary:
+            await asave_summary(user_id, session_id, summary, until)
+            print(f"[HISTORY] 요약 갱신: {user_id}/{session_id} ({len(turns)}턴 → {estimate_tokens(summary)}토큰, {time.perf_counter() - start:.2f}s)")
+    except Exception as e:
+        # 요약 실패는 다음 요청에서 다시 시도 (그동안은 원문 턴 사용)
+        print(f"[WARN] 히스토리 요약 실패: {e}")
+    finally:
+        _in_progress.discard((user_id, session_id))
+        if claimed:
+            try:
+                await arelease_summary(user_id, session_id)
+            except Exception as e:
+                # 해제하지 못해도 HISTORY_SUMMARY_LOCK_SECONDS 뒤에 풀림
+                print(f"[WARN] 히스토리 요약 표시 해제 실패: {e}")
+
+def _schedule_compaction(user_id: str, session_id: str, previous_summary: Optional[str], covered: int, until: int) -> bool:
+    key = (user_id, session_id)
+    if key in _in_progress:
+        return False
+    _in_progress.add(key)
+    task = asyncio.create_task(_compact(user_id, session_id, previous_summary, covered, until))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return True
+
+async def load_history_context(
+    user_id: str,
+    session_id: str,
+    n_turns: int,
+    timing: Optional[Dict] = None
+) -> Tuple[Optional[str], List[Tuple[str, str]]]:
+    """
+    (요약, 요약되지 않은 최근 턴들) 반환, 필요하면 백그라운드 요약 예약
+    - timing: history_tokens_raw(요약 없이 원문 N턴), history_tokens_prompt(실제 프롬프트에 들어가는 양)
+    """
+    start = time.perf_counter()
+    window = await aload_history_window(user_id, session_id, n_turns)
+    turns = window["turns"]
+    all_pairs = [(u, a) for _, u, a in turns]
+
+    summary = None
+    pairs = all_pairs
+    if HISTORY_SUMMARY_ENABLED:
+        summary = window["summary"] if window["covered"] > 0 else None
+        pairs = [(u, a) for idx, u, a in turns if idx >= window["covered"]]
+        pending_tokens = estimate_tokens(format_history_for_prompt(pairs))
+        until = window["total"] - HISTORY_RAW_TURNS
+        if pending_tokens > HISTORY_TOKEN_BUDGET and until > window["covered"]:
+            if _schedule_compaction(user_id, session_id, summary, window["covered"], until) and timing is not None:
+                timing['history_compaction'] = "scheduled"
+
+    if timing is not None:
+        timing['history_load'] = round(time.perf_counter() - start, 3)
+        timing['history_tokens_raw'] = estimate_tokens(format_history_for_prompt(all_pairs)) if all_pairs else 0
+        timing['history_tokens_prompt'] = estimate_tokens(format_history_for_prompt(pairs, summary)) if (pairs or summary) else 0
+    return summary, pairs
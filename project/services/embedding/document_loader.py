@@ -1,15 +1,17 @@
 import os
 import json
-from typing import List
+from typing import Iterator, List
 from langchain_core.documents import Document
 
-def load_slide_documents_from_folder(base_dir: str, date_folder: str) -> List[Document]:
+def iter_slide_documents_from_folder(base_dir: str, date_folder: str) -> Iterator[Document]:
+    """
+    슬라이드 JSON을 파일 하나씩 읽으며 문서를 하나씩 반환 (폴더 전체를 메모리에 올리지 않음)
+    """
     target_dir = os.path.join(base_dir, date_folder)
     if not os.path.isdir(target_dir):
         raise FileNotFoundError(f"지정된 폴더가 존재하지 않습니다: {target_dir}")
 
-    documents = []
-    json_files = [f for f in os.listdir(target_dir) if f.endswith("_gemini_reorder.json")]
+    json_files = sorted(f for f in os.listdir(target_dir) if f.endswith("_gemini_reorder.json"))
 
     for fname in json_files:
         full_path = os.path.join(target_dir, fname)
@@ -22,13 +24,16 @@ def load_slide_documents_from_folder(base_dir: str, date_folder: str) -> List[Do
                 text_single_line = " ".join(line.strip() for line in text.splitlines())
                 content = f"[슬라이드 {slide_number}] {title}\n{text_single_line}"
 
-                documents.append(Document(
+                yield Document(
                     page_content=content,
                     metadata={
                         "slide_number": slide_number,
-                        "file": fname
+                        "file": fname,
+                        "deck": date_folder
                     }
-                ))
+                )
 
+def load_slide_documents_from_folder(base_dir: str, date_folder: str) -> List[Document]:
+    documents = list(iter_slide_documents_from_folder(base_dir, date_folder))
     print(f"총 {len(documents)}개의 슬라이드 문서 로드 완료")
     return documents
\ No newline at end of file
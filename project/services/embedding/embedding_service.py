@@ -1,10 +1,199 @@
-from langchain_huggingface import HuggingFaceEmbeddings
+import asyncio
+import importlib.util
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+from utils.batching import MicroBatcher
+from utils.env_utils import get_int_env
 
-# 애플리케이션 시작 시 한 번만 로드 (전역변수)
-embedding_model = HuggingFaceEmbeddings(
-    model_name="BAAI/bge-m3",
-    model_kwargs={"device": "cpu"}
-)
+# 임베딩 모델/추론 백엔드
+# - torch: 기존 PyTorch fp32
+# - onnx: ONNX Runtime (fp32)
+# - onnx-int8: ONNX Runtime + 동적 int8 양자화 (처음 한 번 변환 후 EMBEDDING_ONNX_DIR에 저장)
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-m3")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join("output", ".cache", "onnx"))
+# 양자화 대상 CPU 명령어셋 (arm64 | avx2 | avx512 | avx512_vnni)
+EMBEDDING_QUANT_CONFIG = os.getenv("EMBEDDING_QUANT_CONFIG", "avx2").strip().lower()
 
-def get_embedding_model():
-    return embedding_model
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+# torch 외 백엔드가 추가로 필요로 하는 패키지 (requirements-onnx.txt)
+_ONNX_PACKAGES = ("onnx", "onnxruntime", "optimum")
+
+# 질문 임베딩 LRU 캐시 크기와 마이크로 배치 설정
+EMBEDDING_QUERY_CACHE_SIZE = max(1, get_int_env("EMBEDDING_QUERY_CACHE_SIZE", 2048))
+EMBEDDING_BATCH_SIZE = max(1, get_int_env("EMBEDDING_BATCH_SIZE", 16))
+EMBEDDING_BATCH_WAIT_MS = max(0, get_int_env("EMBEDDING_BATCH_WAIT_MS", 10))
+
+_WS_RE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """
+    캐시 키: 유니코드 NFC 정규화 + 공백 정리
+    - 키로만 사용, 모델에는 원문을 넣음 (문서 적재 때와 같은 입력 → 임베딩 결과가 캐시 도입 전과 같음)
+    """
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+class EmbeddingService(Embeddings):
+    """
+    bge-m3 임베딩 모델 래퍼
+    - 질문 임베딩은 정규화된 텍스트를 키로 LRU 캐시 (임베딩 입력은 원문)
+    - 동시에 들어온 질문들은 짧은 시간 모아서 한 번의 forward로 처리
+    - 모델 호출은 락으로 직렬화 (여러 스레드에서 안전하게 사용)
+    """
+    def __init__(self, base: Embeddings):
+        self.base = base
+        self._cache: LRUCache = LRUCache(maxsize=EMBEDDING_QUERY_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "query_calls": 0,
+            "query_cache_hits": 0,
+            "forward_passes": 0,
+            "forward_texts": 0,
+            "forward_seconds": 0.0,
+            "query_seconds": 0.0,
+        }
+        self._batcher = MicroBatcher(
+            self._embed_query_batch,
+            max_batch_size=EMBEDDING_BATCH_SIZE,
+            max_wait=EMBEDDING_BATCH_WAIT_MS / 1000,
+            name="embedding-batcher"
+        )
+
+    def _record(self, **values) -> None:
+        with self._metrics_lock:
+            for key, value in values.items():
+                self._metrics[key] += value
+
+    def _forward(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        with self._model_lock:
+            vectors = self.base.embed_documents(texts)
+        self._record(forward_passes=1, forward_texts=len(texts), forward_seconds=time.perf_counter() - start)
+        return vectors
+
+    def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        return self._forward(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._forward(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        key = normalize_query(text)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            self._record(query_calls=1, query_cache_hits=1, query_seconds=time.perf_counter() - start)
+            return list(cached)
+
+        vector = self._batcher(text)
+        with self._cache_lock:
+            self._cache[key] = tuple(vector)
+        self._record(query_calls=1, query_seconds=time.perf_counter() - start)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # 모델 연산은 이벤트 루프 밖에서
+        return await asyncio.to_thread(self.embed_query, text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    def get_metrics(self) -> Dict:
+        with self._metrics_lock:
+            m = dict(self._metrics)
+        with self._cache_lock:
+            cache_size = len(self._cache)
+        return {
+            "query_calls": m["query_calls"],
+            "query_cache_hits": m["query_cache_hits"],
+            "query_cache_hit_rate": round(m["query_cache_hits"] / m["query_calls"], 3) if m["query_calls"] else 0.0,
+            "query_cache_size": cache_size,
+            "avg_query_latency": round(m["query_seconds"] / m["query_calls"], 4) if m["query_calls"] else 0.0,
+            "forward_passes": m["forward_passes"],
+            "avg_batch_size": round(m["forward_texts"] / m["forward_passes"], 2) if m["forward_passes"] else 0.0,
+            "avg_forward_latency": round(m["forward_seconds"] / m["forward_passes"], 4) if m["forward_passes"] else 0.0,
+        }
+
+def _export_quantized_onnx(model_name: str, quant_config: str) -> str:
+    """
+    int8 동적 양자화 ONNX 모델을 만들어 저장하고 (이미 있으면 재사용) 모델 디렉토리 반환
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    save_dir = os.path.join(EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+    file_name = f"model_qint8_{quant_config}.onnx"
+    if not os.path.exists(os.path.join(save_dir, "onnx", file_name)):
+        print(f"[EMB] int8 ONNX 모델 생성: {save_dir} ({quant_config})")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save(save_dir)
+        export_dynamic_quantized_onnx_model(model, quant_config, save_dir)
+    return save_dir
+
+def check_embedding_backend(backend: str = None) -> None:
+    """
+    앱 시작 시 백엔드 설정과 필요한 패키지를 확인 (첫 질문에서 ImportError가 나지 않도록 미리 실패)
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"지원하지 않는 EMBEDDING_BACKEND: {backend} (가능: {', '.join(EMBEDDING_BACKENDS)})")
+    if backend == "torch":
+        return
+    missing = [name for name in _ONNX_PACKAGES if importlib.util.find_spec(name) is None]
+    if missing:
+        raise RuntimeError(
+            f"EMBEDDING_BACKEND={backend} 에 필요한 패키지가 없습니다: {', '.join(missing)} "
+            f"(pip install -r requirements-onnx.txt, Docker는 --build-arg INSTALL_ONNX=true)"
+        )
+
+def build_base_embeddings(backend: str = None, model_name: str = None) -> Embeddings:
+    """
+    설정된 백엔드로 HuggingFaceEmbeddings 생성 (벤치마크에서 백엔드별로 직접 호출하기도 함)
+    """
+    # torch/transformers import 자체가 수 초 걸리므로 실제로 모델을 만들 때 import
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    check_embedding_backend(backend)
+
+    if backend == "torch":
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": "cpu"})
+    if backend == "onnx":
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": "cpu", "backend": "onnx"})
+
+    save_dir = _export_quantized_onnx(model_name, EMBEDDING_QUANT_CONFIG)
+    return HuggingFaceEmbeddings(
+        model_name=save_dir,
+        model_kwargs={
+            "device": "cpu",
+            "backend": "onnx",
+            "model_kwargs": {"file_name": f"onnx/model_qint8_{EMBEDDING_QUANT_CONFIG}.onnx"}
+        }
+    )
+
+# 처음 사용할 때 한 번만 로드 (웜업 단계에서 미리 로드 가능)
+_embedding_model: Optional[EmbeddingService] = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model() -> EmbeddingService:
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                _embedding_model = EmbeddingService(build_base_embeddings())
+    return _embedding_model
+
+def get_embedding_metrics() -> Dict:
+    # 지표 조회 때문에 모델을 로드하지 않도록, 아직 로드 전이면 빈 지표 반환
+    if _embedding_model is None:
+        return {"loaded": False}
+    return {"loaded": True, **_embedding_model.get_metrics()}
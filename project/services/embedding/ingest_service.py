@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from langchain_core.documents import Document
+from services.embedding.document_loader import iter_slide_documents_from_folder
+from services.embedding.embedding_service import get_embedding_model
+from services.embedding.lexical_index import LexicalIndex, get_lexical_index
+from services.embedding.vector_db_service import (
+    delete_legacy_slides, get_vector_store, persist_vector_store, upsert_embedded_batch
+)
+from utils.env_utils import get_int_env
+
+# 증분 적재
+# - 슬라이드 ID = sha256(user/덱/파일/슬라이드)[:16] + "-" + sha256(내용)[:16] → 다시 적재해도 같은 ID
+# - 사용자 폴더의 manifest에 이미 적재한 슬라이드를 기록해, 새로/바뀐 슬라이드만 임베딩·업서트하고 사라진 슬라이드는 삭제
+# - manifest에 없는 덱을 처음 적재할 때(또는 force) 이전 방식(랜덤 UUID)으로 적재된 같은 덱의 벡터를 삭제 (중복 검색 방지)
+MANIFEST_FILE_NAME = ".vector_manifest.json"
+
+# 스트리밍 적재 파이프라인
+# - 문서를 고정 크기 배치로 임베딩하고, 업서트는 별도 스레드에서 동시에 (최대 INGEST_MAX_INFLIGHT 배치)
+# - 업서트가 밀리면 다음 배치 임베딩이 대기 (backpressure)
+INGEST_BATCH_SIZE = max(1, get_int_env("INGEST_BATCH_SIZE", 32))
+INGEST_MAX_INFLIGHT = max(1, get_int_env("INGEST_MAX_INFLIGHT", 4))
+
+_user_locks: Dict[str, threading.Lock] = {}
+_user_locks_guard = threading.Lock()
+
+def _user_lock(user_base_dir: str) -> threading.Lock:
+    # 같은 사용자의 적재가 동시에 돌면 manifest가 꼬이므로 사용자별로 직렬화
+    with _user_locks_guard:
+        return _user_locks.setdefault(user_base_dir, threading.Lock())
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def slot_key(date_folder: str, doc: Document) -> str:
+    return f"{date_folder}/{doc.metadata.get('file')}/{doc.metadata.get('slide_number')}"
+
+def document_content_hash(doc: Document) -> str:
+    # 본문과 메타데이터 중 하나라도 바뀌면 다시 적재
+    return _sha256(doc.page_content + "\n" + json.dumps(doc.metadata, ensure_ascii=False, sort_keys=True))
+
+def make_document_id(user_id: str, key: str, content_hash: str) -> str:
+    return f"{_sha256(f'{user_id}/{key}')[:16]}-{content_hash[:16]}"
+
+def load_manifest(user_base_dir: str, index_name: str) -> Dict[str, Dict]:
+    """
+    {슬롯 키: {"id", "hash"}} (다른 index로 만든 manifest면 빈 값)
+    """
+    path = os.path.join(user_base_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] manifest를 읽을 수 없어 전체 재적재: {path} ({e})")
+        return {}
+    if data.get("index") != index_name:
+        return {}
+    return data.get("slides", {})
+
+def save_manifest(user_base_dir: str, index_name: str, slides: Dict[str, Dict]) -> None:
+    os.makedirs(user_base_dir, exist_ok=True)
+    path = os.path.join(user_base_dir, MANIFEST_FILE_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"index": index_name, "slides": slides}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _batched(docs: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_and_upsert(
+    index_name: str,
+    namespace: str,
+    docs: Iterable[Document],
+    batch_size: Optional[int] = None,
+    max_inflight: Optional[int] = None,
+    timing: Optional[Dict] = None,
+    on_batch_upserted: Optional[Callable[[List[Document]], None]] = None
+) -> List[str]:
+    """
+    문서 스트림을 배치 단위로 임베딩 → 업서트 (doc.id가 채워져 있어야 함)
+    - on_batch_upserted: 배치 업서트가 끝날 때마다 호출 (lexical 색인 갱신 등)
+    - 업서트 배치가 하나라도 실패하면 나머지를 기다린 뒤 예외 (ID가 고정이므로 다시 돌려도 안전)
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    max_inflight = max_inflight or INGEST_MAX_INFLIGHT
+    timing = timing if timing is not None else {}
+    embedding_model = get_embedding_model()
+    slots = threading.BoundedSemaphore(max_inflight)
+    futures: List[Future] = []
+    embed_seconds = 0.0
+
+    def _upsert(batch: List[Document], vectors: List[List[float]]) -> List[str]:
+        try:
+            ids = upsert_embedded_batch(index_name, namespace, batch, vectors)
+            if on_batch_upserted is not None:
+                on_batch_upserted(batch)
+            return ids
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="ingest-upsert") as pool:
+        for batch in _batched(docs, batch_size):
+            embed_start = time.perf_counter()
+            vectors = embedding_model.embed_documents([doc.page_content for doc in batch])
+            embed_seconds += time.perf_counter() - embed_start
+            # 업서트 슬롯이 빌 때까지 대기
+            slots.acquire()
+            futures.append(pool.submit(_upsert, batch, vectors))
+
+    ids: List[str] = []
+    errors = []
+    for future in futures:
+        try:
+            ids.extend(future.result())
+        except Exception as e:
+            errors.append(e)
+    timing['embed'] = round(embed_seconds, 3)
+    timing['embed_upsert_wall_clock'] = round(time.perf_counter() - start, 3)
+    timing['batches'] = len(futures)
+    if errors:
+        raise RuntimeError(f"업서트 배치 {len(errors)}/{len(futures)}개 실패: {errors[0]}") from errors[0]
+    return ids
+
+def ingest_folder(
+    index_name: str,
+    user_id: str,
+    user_base_dir: str,
+    date_folder: str,
+    force: bool = False,
+    timing: Optional[Dict] = None
+) -> Dict:
+    """
+    덱(date_folder) 하나를 namespace(user_id)에 증분 적재하고 added/updated/skipped/deleted 개수 반환
+    - force=True 이면 manifest를 무시하고 덱 전체를 다시 임베딩·업서트
+    """
+    timing = timing if timing is not None else {}
+    with _user_lock(user_base_dir):
+        lexical_index = get_lexical_index(index_name, user_id)
+        try:
+            return _ingest_folder_locked(
+                index_name, user_id, user_base_dir, date_folder, force, timing, lexical_index
+            )
+        except Exception:
+            # 실패한 적재의 lexical 변경분은 버림 (manifest와 마찬가지로 다음 적재 때 다시 반영)
+            lexical_index.reload()
+            raise
+
+def _ingest_folder_locked(
+    index_name: str,
+    user_id: str,
+    user_base_dir: str,
+    date_folder: str,
+    force: bool,
+    timing: Dict,
+    lexical_index: LexicalIndex
+) -> Dict:
+    manifest = load_manifest(user_base_dir, index_name)
+    stale_ids: List[str] = []
+    current_keys = set()
+    deck_files = set()
+    counts = {"added": 0, "updated": 0, "skipped": 0}
+    prefix = f"{date_folder}/"
+    # manifest에 이 덱이 없으면 처음 적재하는 덱 → 이전 방식으로 적재된 벡터가 남아 있을 수 있음
+    purge_legacy = force or not any(key.startswith(prefix) for key in manifest)
+
+    def _changed_docs() -> Iterator[Document]:
+        # 파일을 읽으면서 바로 manifest와 비교해 임베딩이 필요한 슬라이드만 흘려보냄
+        for doc in iter_slide_documents_from_folder(user_base_dir, date_folder):
+            key = slot_key(date_folder, doc)
+            current_keys.add(key)
+            deck_files.add(doc.metadata.get("file"))
+            content_hash = document_content_hash(doc)
+            doc.id = make_document_id(user_id, key, content_hash)
+            previous = manifest.get(key)
+            if previous is None:
+                counts["added"] += 1
+            elif previous["id"] == doc.id and not force:
+                counts["skipped"] += 1
+                # lexical 색인 도입 이전에 적재된 슬라이드는 임베딩 없이 색인만 채움
+                if doc.id not in lexical_index:
+                    lexical_index.upsert([doc])
+                continue
+            else:
+                counts["updated"] += 1
+                if previous["id"] != doc.id:
+                    stale_ids.append(previous["id"])
+            manifest[key] = {"id": doc.id, "hash": content_hash}
+            yield doc
+
+    upserted_ids = embed_and_upsert(
+        index_name, user_id, _changed_docs(), timing=timing, on_batch_upserted=lexical_index.upsert
+    )
+    added, updated, skipped = counts["added"], counts["updated"], counts["skipped"]
+
+    # 이 덱에서 사라진 슬라이드
+    removed_keys = [key for key in manifest if key.startswith(prefix) and key not in current_keys]
+    stale_ids.extend(manifest[key]["id"] for key in removed_keys)
+
+    vector_store = get_vector_store(index_name, namespace=user_id)
+
+    start = time.perf_counter()
+    if stale_ids:
+        vector_store.delete(ids=stale_ids, namespace=user_id)
+        lexical_index.delete(stale_ids)
+    timing['delete'] = round(time.perf_counter() - start, 3)
+
+    # 새 슬라이드는 metadata에 deck이 있으므로 업서트 뒤에 지워도 걸리지 않음
+    legacy_deleted = 0
+    if purge_legacy:
+        start = time.perf_counter()
+        legacy_deleted = delete_legacy_slides(index_name, user_id, sorted(deck_files))
+        timing['legacy_purge'] = round(time.perf_counter() - start, 3)
+        if legacy_deleted:
+            print(f"[INGEST] 이전 방식으로 적재된 벡터 삭제: {user_id}/{date_folder} ({legacy_deleted}개)")
+
+    # local 백엔드는 배치마다 디스크에 쓰지 않고 적재 끝에 한 번만 저장
+    start = time.perf_counter()
+    persist_vector_store(index_name, user_id)
+    timing['persist'] = round(time.perf_counter() - start, 3)
+
+    # 벡터 DB 반영이 끝난 뒤에만 manifest/lexical 색인 저장 (중간에 실패하면 다음 적재 때 다시 시도)
+    for key in removed_keys:
+        manifest.pop(key, None)
+    lexical_index.save()
+    save_manifest(user_base_dir, index_name, manifest)
+
+    print(f"[INGEST] {user_id}/{date_folder}: added={added}, updated={updated}, skipped={skipped}, deleted={len(removed_keys)}")
+    return {
+        "added": added,
+        "updated": updated,
+        "skipped": skipped,
+        "deleted": len(removed_keys),
+        "legacy_deleted": legacy_deleted,
+        "upserted_ids": upserted_ids
+    }
@@ -0,0 +1,130 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from services.embedding.local_vector_store import _safe_name
+from utils.env_utils import get_float_env
+
+# namespace별 BM25 역색인 (하이브리드 검색의 lexical 쪽)
+# - 영문/숫자는 단어 단위, 한글은 글자 bigram (조사가 붙어도 매칭되도록)
+# - 적재 시 갱신하고 {LEXICAL_INDEX_DIR}/{index}/{namespace}.json 에 저장
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join("output", ".lexical_index"))
+BM25_K1 = get_float_env("BM25_K1", 1.2)
+BM25_B = get_float_env("BM25_B", 0.75)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._+-][a-z0-9]+)*|[가-힣]+")
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in _TOKEN_RE.findall(unicodedata.normalize("NFC", text).lower()):
+        if "가" <= word[0] <= "힣":
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+class LexicalIndex:
+    """
+    namespace 하나의 BM25 색인
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict] = {}
+        self._postings: Optional[Dict[str, Dict[str, int]]] = None
+        self._avg_len = 0.0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def reload(self) -> None:
+        """
+        디스크 상태로 되돌림 (적재가 중간에 실패했을 때도 사용)
+        """
+        with self._lock:
+            self._docs = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._docs = json.load(f)
+            self._postings = None
+
+    def save(self) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._docs, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def upsert(self, docs: List[Document]) -> None:
+        with self._lock:
+            for doc in docs:
+                tf = Counter(tokenize(doc.page_content))
+                self._docs[doc.id] = {
+                    "text": doc.page_content,
+                    "metadata": doc.metadata,
+                    "tf": dict(tf),
+                    "len": sum(tf.values())
+                }
+            self._postings = None
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                self._docs.pop(doc_id, None)
+            self._postings = None
+
+    def _build_postings(self) -> Dict[str, Dict[str, int]]:
+        if self._postings is None:
+            postings: Dict[str, Dict[str, int]] = {}
+            for doc_id, doc in self._docs.items():
+                for term, count in doc["tf"].items():
+                    postings.setdefault(term, {})[doc_id] = count
+            self._postings = postings
+            self._avg_len = (sum(doc["len"] for doc in self._docs.values()) / len(self._docs)) if self._docs else 0.0
+        return self._postings
+
+    def search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        with self._lock:
+            postings = self._build_postings()
+            n = len(self._docs)
+            if n == 0:
+                return []
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                matches = postings.get(term)
+                if not matches:
+                    continue
+                idf = math.log(1 + (n - len(matches) + 0.5) / (len(matches) + 0.5))
+                for doc_id, tf in matches.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._docs[doc_id]["len"] / (self._avg_len or 1.0))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                (Document(id=doc_id, page_content=self._docs[doc_id]["text"], metadata=dict(self._docs[doc_id]["metadata"])), score)
+                for doc_id, score in top
+            ]
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_lexical_index(index_name: str, namespace: Optional[str]) -> LexicalIndex:
+    path = os.path.join(LEXICAL_INDEX_DIR, _safe_name(index_name), f"{_safe_name(namespace or '')}.json")
+    with _indexes_lock:
+        lexical_index = _indexes.get(path)
+        if lexical_index is None:
+            lexical_index = LexicalIndex(path)
+            _indexes[path] = lexical_index
+        return lexical_index
@@ -0,0 +1,385 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from utils.env_utils import get_int_env
+
+# 로컬 벡터 인덱스 (VECTOR_BACKEND=local)
+# - namespace마다 디렉토리 하나: vectors.npy (정규화된 float32, mmap으로 읽음) + docs.json
+# - 문서 수가 VECTOR_HNSW_MIN_SIZE 이상이고 hnswlib가 설치되어 있으면 HNSW 근사 검색, 아니면 NumPy 전수 검색
+VECTOR_LOCAL_DIR = os.getenv("VECTOR_LOCAL_DIR", os.path.join("output", ".vector_store"))
+VECTOR_HNSW_MIN_SIZE = get_int_env("VECTOR_HNSW_MIN_SIZE", 5000)
+VECTOR_HNSW_M = get_int_env("VECTOR_HNSW_M", 16)
+VECTOR_HNSW_EF_CONSTRUCTION = get_int_env("VECTOR_HNSW_EF_CONSTRUCTION", 200)
+VECTOR_HNSW_EF_SEARCH = get_int_env("VECTOR_HNSW_EF_SEARCH", 64)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+def _safe_name(name: str) -> str:
+    # namespace(user_id)를 디렉토리명으로 쓰므로 경로 구분자 제거
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "_default"
+
+def _normalize_rows(vectors: List[List[float]]) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return arr / norms
+
+def _match_filter(metadata: Dict, filter: Optional[Dict]) -> bool:
+    # 메타데이터 동등 비교만 지원 ({"file": "...", "slide_number": 3})
+    if not filter:
+        return True
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+class _NamespaceIndex:
+    """
+    namespace 하나의 벡터/문서 저장소 (디스크 영속화 + 검색)
+    - 쓰기는 메모리의 여유 있는 버퍼에 덧붙이고 (용량이 차면 두 배로), 디스크에는 flush()에서 한 번에 저장
+    - HNSW 인덱스가 만들어져 있으면 새/바뀐 행만 add_items로 반영 (삭제 때만 다시 생성)
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._position: Dict[str, int] = {}
+        # 디스크에서 읽은 mmap (읽기 전용) / 첫 쓰기 때 만드는 메모리 버퍼 (앞 len(ids)행만 유효)
+        self._mmap: Optional[np.ndarray] = None
+        self._buffer: Optional[np.ndarray] = None
+        self.dirty = False
+        self._hnsw = None
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+
+    @property
+    def _docs_path(self) -> str:
+        return os.path.join(self.path, "docs.json")
+
+    @property
+    def _hnsw_path(self) -> str:
+        return os.path.join(self.path, "hnsw.bin")
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        if self._buffer is not None:
+            return self._buffer[:len(self.ids)]
+        return self._mmap
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _load(self) -> None:
+        if not os.path.exists(self._docs_path) or not os.path.exists(self._vectors_path):
+            return
+        with open(self._docs_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.texts = data["texts"]
+        self.metadatas = data["metadatas"]
+        self._position = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        # 디스크에 있는 벡터는 필요한 페이지만 메모리에 올라오도록 mmap
+        self._mmap = np.load(self._vectors_path, mmap_mode="r")
+        self._buffer = None
+
+    def _writable(self, extra_rows: int, dim: int) -> np.ndarray:
+        """
+        extra_rows행을 더 쓸 수 있는 메모리 버퍼 (mmap에서 처음 쓸 때와 용량이 찰 때만 복사)
+        """
+        n = len(self.ids)
+        if self._buffer is not None and n + extra_rows <= self._buffer.shape[0]:
+            return self._buffer
+        capacity = max(64, n + extra_rows, (self._buffer.shape[0] if self._buffer is not None else n) * 2)
+        buffer = np.empty((capacity, dim), dtype=np.float32)
+        current = self.vectors
+        if n and current is not None:
+            buffer[:n] = current
+        self._buffer = buffer
+        self._mmap = None
+        return buffer
+
+    def flush(self) -> None:
+        """
+        바뀐 내용을 디스크에 저장 (적재 한 번에 한 번)
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            vectors = self.vectors
+            if vectors is None:
+                vectors = np.empty((0, 0), np.float32)
+            # 임시 파일에 쓰고 교체 (쓰는 도중 죽어도 기존 파일은 유지)
+            tmp_vectors = self._vectors_path + ".tmp.npy"
+            np.save(tmp_vectors, vectors)
+            tmp_docs = self._docs_path + ".tmp"
+            with open(tmp_docs, "w", encoding="utf-8") as f:
+                json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f, ensure_ascii=False)
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_docs, self._docs_path)
+            # HNSW 인덱스는 메모리에서 갱신되어 있으면 같이 저장, 아니면 다음 검색 때 다시 생성
+            if self._hnsw is not None:
+                self._hnsw.save_index(self._hnsw_path)
+            elif os.path.exists(self._hnsw_path):
+                os.remove(self._hnsw_path)
+            self.dirty = False
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray, persist: bool = True) -> None:
+        with self.lock:
+            new_count = len({doc_id for doc_id in ids if doc_id not in self._position})
+            buffer = self._writable(new_count, vectors.shape[1])
+            changed_rows: List[int] = []
+            for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                i = self._position.get(doc_id)
+                if i is not None:
+                    # 같은 ID는 덮어쓰기 (Pinecone upsert와 동일)
+                    self.texts[i] = text
+                    self.metadatas[i] = metadata
+                else:
+                    i = len(self.ids)
+                    self._position[doc_id] = i
+                    self.ids.append(doc_id)
+                    self.texts.append(text)
+                    self.metadatas.append(metadata)
+                buffer[i] = vector
+                changed_rows.append(i)
+            self.dirty = True
+
+            if self._hnsw is not None and changed_rows:
+                # 같은 label로 add_items하면 hnswlib가 벡터를 교체함
+                if len(self.ids) > self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(max(len(self.ids), self._hnsw.get_max_elements() * 2))
+                rows = np.asarray(sorted(set(changed_rows)))
+                self._hnsw.add_items(buffer[rows], rows)
+            if persist:
+                self.flush()
+
+    def delete(self, ids: List[str], persist: bool = True) -> int:
+        with self.lock:
+            remove = set(ids)
+            keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in remove]
+            removed = len(self.ids) - len(keep)
+            if not removed:
+                return 0
+            vectors = np.array(self.vectors[keep]) if keep else np.empty((0, self.vectors.shape[1]), np.float32)
+            self.ids = [self.ids[i] for i in keep]
+            self.texts = [self.texts[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._position = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            self._buffer = vectors
+            self._mmap = None
+            # 행 번호(HNSW label)가 당겨지므로 인덱스는 다음 검색 때 다시 생성
+            self._hnsw = None
+            self.dirty = True
+            if persist:
+                self.flush()
+            return removed
+
+    def _get_hnsw(self):
+        if self._hnsw is not None:
+            return self._hnsw
+        dim = self.vectors.shape[1]
+        index = hnswlib.Index(space="ip", dim=dim)
+        if os.path.exists(self._hnsw_path) and not self.dirty:
+            index.load_index(self._hnsw_path, max_elements=len(self.ids))
+        if index.get_current_count() != len(self.ids):
+            index = hnswlib.Index(space="ip", dim=dim)
+            index.init_index(max_elements=len(self.ids), ef_construction=VECTOR_HNSW_EF_CONSTRUCTION, M=VECTOR_HNSW_M)
+            index.add_items(np.asarray(self.vectors), np.arange(len(self.ids)))
+            # 저장 안 된 변경분이 있으면 flush() 때 문서/벡터와 함께 저장
+            if not self.dirty:
+                index.save_index(self._hnsw_path)
+            print(f"[VECTOR] HNSW 인덱스 생성: {self.path} ({len(self.ids)}개)")
+        index.set_ef(max(VECTOR_HNSW_EF_SEARCH, 1))
+        self._hnsw = index
+        return index
+
+    def search(self, query: np.ndarray, k: int, filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """
+        (행 번호, 코사인 유사도) 목록을 유사도 내림차순으로 반환
+        """
+        with self.lock:
+            n = len(self.ids)
+            if n == 0 or k <= 0:
+                return []
+            if filter:
+                rows = [i for i in range(n) if _match_filter(self.metadatas[i], filter)]
+                if not rows:
+                    return []
+                scores = np.asarray(self.vectors[rows]) @ query
+                order = np.argsort(-scores)[:k]
+                return [(rows[i], float(scores[i])) for i in order]
+
+            if hnswlib is not None and n >= VECTOR_HNSW_MIN_SIZE:
+                labels, distances = self._get_hnsw().knn_query(query, k=min(k, n))
+                # ip 공간의 거리는 1 - 내적
+                return [(int(label), float(1.0 - dist)) for label, dist in zip(labels[0], distances[0])]
+
+            scores = np.asarray(self.vectors) @ query
+            if k < n:
+                top = np.argpartition(-scores, k)[:k]
+                order = top[np.argsort(-scores[top])]
+            else:
+                order = np.argsort(-scores)
+            return [(int(i), float(scores[i])) for i in order]
+
+_namespaces: Dict[str, _NamespaceIndex] = {}
+_namespaces_lock = threading.Lock()
+
+def _get_namespace_index(root: str, index_name: str, namespace: Optional[str]) -> _NamespaceIndex:
+    path = os.path.join(root, _safe_name(index_name), _safe_name(namespace or ""))
+    with _namespaces_lock:
+        ns_index = _namespaces.get(path)
+        if ns_index is None:
+            ns_index = _NamespaceIndex(path)
+            _namespaces[path] = ns_index
+        return ns_index
+
+class LocalVectorStore(VectorStore):
+    """
+    프로세스 내 벡터 스토어 (PineconeVectorStore 대체)
+    - 검색 점수는 코사인 유사도 (Pinecone cosine 인덱스와 같은 의미)
+    """
+    def __init__(self, embedding: Embeddings, index_name: str, namespace: Optional[str] = None, root: Optional[str] = None):
+        self._embedding = embedding
+        self.index_name = index_name
+        self.namespace = namespace
+        self.root = root or VECTOR_LOCAL_DIR
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _index(self, namespace: Optional[str] = None) -> _NamespaceIndex:
+        return _get_namespace_index(self.root, self.index_name, namespace or self.namespace)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize_rows(self._embedding.embed_documents(texts))
+        return self.add_embeddings(texts, vectors, metadatas, ids, namespace=namespace)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        vectors: Any,
+        metadatas: List[Dict],
+        ids: List[str],
+        namespace: Optional[str] = None,
+        persist: bool = True
+    ) -> List[str]:
+        """
+        이미 계산된 임베딩으로 추가/덮어쓰기
+        - persist=False 이면 메모리에만 반영 (적재가 끝나고 persist()로 한 번에 저장)
+        """
+        self._index(namespace).upsert(list(ids), list(texts), list(metadatas), _normalize_rows(vectors), persist=persist)
+        return list(ids)
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+        persist: bool = True,
+        **kwargs: Any
+    ) -> Optional[bool]:
+        if not ids:
+            return False
+        return self._index(namespace).delete(ids, persist=persist) > 0
+
+    def ids_matching(self, match: Callable[[Dict], bool], namespace: Optional[str] = None) -> List[str]:
+        """
+        metadata가 조건에 맞는 문서 ID 목록
+        """
+        ns_index = self._index(namespace)
+        with ns_index.lock:
+            return [doc_id for doc_id, metadata in zip(ns_index.ids, ns_index.metadatas) if match(metadata)]
+
+    def persist(self, namespace: Optional[str] = None) -> None:
+        """
+        메모리에만 반영된 변경분을 디스크에 저장
+        """
+        self._index(namespace).flush()
+
+    def get_by_ids(self, ids: List[str], namespace: Optional[str] = None) -> List[Document]:
+        ns_index = self._index(namespace)
+        wanted = set(ids)
+        with ns_index.lock:
+            return [
+                Document(id=doc_id, page_content=text, metadata=dict(metadata))
+                for doc_id, text, metadata in zip(ns_index.ids, ns_index.texts, ns_index.metadatas)
+                if doc_id in wanted
+            ]
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        namespace: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        ns_index = self._index(namespace)
+        query = _normalize_rows(embedding)[0]
+        hits = ns_index.search(query, k, filter)
+        with ns_index.lock:
+            return [
+                (Document(id=ns_index.ids[i], page_content=ns_index.texts[i], metadata=dict(ns_index.metadatas[i])), score)
+                for i, score in hits
+            ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # 코사인 유사도를 0~1 관련도로
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        index_name: str = "default",
+        namespace: Optional[str] = None,
+        **kwargs: Any
+    ) -> "LocalVectorStore":
+        store = cls(embedding, index_name, namespace)
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from cachetools import LRUCache
+from langchain_core.documents import Document
+from services.embedding.embedding_service import get_embedding_model
+from utils.env_utils import get_float_env, get_int_env
+
+# 검색 후 재순위화 (retrieve → rerank → 점수 임계값/개수로 자르기)
+# - 토큰 예산은 프롬프트 조립(prompt_service의 PROMPT_CONTEXT_BUDGET)에서 한 번만 적용
+# - RERANKER: none (기본) | embedding (bge-m3 코사인 유사도, 추가 모델 없음) | cross-encoder (RERANK_MODEL_NAME)
+# - embedding은 검색 점수가 이미 같은 모델의 코사인 유사도(dense)면 다시 임베딩하지 않고 그 점수를 그대로 사용
+#   → 다시 계산하는 건 hybrid(RRF 점수)일 때만
+RERANKER = os.getenv("RERANKER", "none").strip().lower()
+RERANKERS = ("none", "embedding", "cross-encoder")
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "BAAI/bge-reranker-v2-m3")
+RERANK_BATCH_SIZE = max(1, get_int_env("RERANK_BATCH_SIZE", 16))
+# 넓게 뽑을 후보 수 / 최종으로 남길 최대 개수 / 점수가 낮아도 남길 최소 개수
+RERANK_CANDIDATES = max(1, get_int_env("RERANK_CANDIDATES", 10))
+RERANK_MAX_K = max(1, get_int_env("RERANK_MAX_K", 5))
+RERANK_MIN_KEEP = max(0, get_int_env("RERANK_MIN_KEEP", 1))
+# 점수 종류별 임계값 (코사인 유사도 / cross-encoder 0~1 관련도), RRF 점수는 순위만 의미가 있어 임계값 없음
+RERANK_MIN_COSINE = get_float_env("RERANK_MIN_COSINE", 0.4)
+RERANK_MIN_CROSS_SCORE = get_float_env("RERANK_MIN_CROSS_SCORE", 0.1)
+# 슬라이드 임베딩 캐시 (같은 슬라이드가 여러 질문에서 반복해서 후보로 나옴)
+RERANK_DOC_CACHE_SIZE = max(1, get_int_env("RERANK_DOC_CACHE_SIZE", 4096))
+
+if RERANKER not in RERANKERS:
+    raise ValueError(f"지원하지 않는 RERANKER: {RERANKER} (가능: {', '.join(RERANKERS)})")
+
+_doc_vectors: LRUCache = LRUCache(maxsize=RERANK_DOC_CACHE_SIZE)
+_doc_vectors_lock = threading.Lock()
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+
+def rerank_enabled() -> bool:
+    return RERANKER != "none"
+
+def candidate_count(k: int) -> int:
+    """
+    재순위화를 쓰면 최종 k보다 넓게 후보를 뽑음
+    """
+    return max(k, RERANK_CANDIDATES) if rerank_enabled() else k
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _embedding_scores(query: str, texts: List[str]) -> List[float]:
+    model = get_embedding_model()
+    query_vec = np.asarray(model.embed_query(query), dtype=np.float32)
+
+    keys = [_text_key(text) for text in texts]
+    with _doc_vectors_lock:
+        vectors = [_doc_vectors.get(key) for key in keys]
+    missing = [i for i, vec in enumerate(vectors) if vec is None]
+    if missing:
+        # 캐시에 없는 슬라이드만 한 번의 배치로 임베딩
+        new_vectors = model.embed_documents([texts[i] for i in missing])
+        with _doc_vectors_lock:
+            for i, vec in zip(missing, new_vectors):
+                vectors[i] = np.asarray(vec, dtype=np.float32)
+                _doc_vectors[keys[i]] = vectors[i]
+
+    matrix = np.stack(vectors)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vec) or 1.0)
+    norms[norms == 0] = 1.0
+    return (matrix @ query_vec / norms).tolist()
+
+def _get_cross_encoder():
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+                print(f"[RERANK] cross-encoder 로드: {RERANK_MODEL_NAME}")
+                _cross_encoder = CrossEncoder(RERANK_MODEL_NAME, device="cpu")
+    return _cross_encoder
+
+def _cross_encoder_scores(query: str, texts: List[str]) -> List[float]:
+    model = _get_cross_encoder()
+    # 단일 레이블 모델은 sigmoid가 적용된 0~1 점수
+    scores = model.predict([(query, text) for text in texts], batch_size=RERANK_BATCH_SIZE, show_progress_bar=False)
+    return [float(score) for score in scores]
+
+def rerank(
+    query: str,
+    results: List[Tuple[Document, float]],
+    max_k: Optional[int] = None,
+    timing: Optional[Dict] = None,
+    score_kind: str = "cosine"
+) -> List[Tuple[Document, float]]:
+    """
+    후보를 다시 점수 매겨 정렬하고, 임계값/개수 안에서 앞에서부터 남김
+    - score_kind: 검색 점수 종류 (cosine: dense 검색, rrf: hybrid 검색)
+    - 반환 점수는 재순위화 점수 (RERANKER=none 이면 원래 검색 점수)
+    """
+    max_k = max_k or RERANK_MAX_K
+    if not results or not rerank_enabled():
+        return results[:max_k]
+
+    texts = [doc.page_content for doc, _ in results]
+    if RERANKER == "cross-encoder":
+        scores = _cross_encoder_scores(query, texts)
+        min_score = RERANK_MIN_CROSS_SCORE
+    elif score_kind == "cosine":
+        # 같은 임베딩 모델의 코사인 유사도이므로 다시 계산하지 않음
+        scores = [float(score) for _, score in results]
+        min_score = RERANK_MIN_COSINE
+    else:
+        scores = _embedding_scores(query, texts)
+        min_score = RERANK_MIN_COSINE
+    ranked = sorted(zip((doc for doc, _ in results), scores), key=lambda item: item[1], reverse=True)
+
+    kept: List[Tuple[Document, float]] = []
+    for doc, score in ranked:
+        if len(kept) >= max_k:
+            break
+        # 점수순이므로 임계값 아래부터는 볼 필요 없음 (최소 개수는 채움)
+        if score < min_score and len(kept) >= RERANK_MIN_KEEP:
+            break
+        kept.append((doc, score))
+
+    if timing is not None:
+        timing['rerank_candidates'] = len(results)
+        timing['rerank_kept'] = len(kept)
+    return kept
@@ -1,33 +1,120 @@
 import os
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+from cachetools import TTLCache
 from pinecone import Pinecone
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError, TimeoutError as Urllib3TimeoutError
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 from langchain_pinecone import PineconeVectorStore
 from services.embedding.embedding_service import get_embedding_model 
+from services.embedding.lexical_index import get_lexical_index
+from services.embedding.local_vector_store import LocalVectorStore
+from utils.env_utils import get_int_env
 
 load_dotenv()
 
-# Pinecone 클라이언트도 애플리케이션 시작 시 한 번만 초기화
-api_key = os.getenv("PINECONE_API_KEY")
-if not api_key:
-    raise ValueError("환경변수 PINECONE_API_KEY가 필요합니다.")
-pc = Pinecone(api_key=api_key)
+# 벡터 스토어 백엔드: pinecone (기본) | local (프로세스 내 인덱스, 오프라인 실행/벤치마크용)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+VECTOR_BACKENDS = ("pinecone", "local")
 
-def get_vector_store(index_name: str, namespace: Optional[str] = None):
+if VECTOR_BACKEND not in VECTOR_BACKENDS:
+    raise ValueError(f"지원하지 않는 VECTOR_BACKEND: {VECTOR_BACKEND} (가능: {', '.join(VECTOR_BACKENDS)})")
+
+# 검색 모드: dense (벡터만) | hybrid (벡터 + BM25, reciprocal-rank fusion)
+# - hybrid는 양쪽에서 HYBRID_CANDIDATES개씩 후보를 뽑아 순위로 합침
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense").strip().lower()
+RETRIEVAL_MODES = ("dense", "hybrid")
+HYBRID_CANDIDATES = max(1, get_int_env("HYBRID_CANDIDATES", 20))
+RRF_K = max(1, get_int_env("RRF_K", 60))
+
+# Index / VectorStore 핸들 캐시
+# - index별 host는 한 번만 조회하고, 커넥션 풀은 핸들마다 재사용
+# - TTL이 지나면 다음 요청에서 새로 만들고, 검색이 연결/타임아웃 오류로 실패하면 즉시 버리고 한 번 재시도
+PINECONE_POOL_THREADS = max(1, get_int_env("PINECONE_POOL_THREADS", 4))
+PINECONE_CONNECTION_POOL_MAXSIZE = max(1, get_int_env("PINECONE_CONNECTION_POOL_MAXSIZE", 16))
+VECTOR_HANDLE_TTL_SECONDS = max(1, get_int_env("VECTOR_HANDLE_TTL_SECONDS", 3600))
+VECTOR_HANDLE_MAX_ENTRIES = max(1, get_int_env("VECTOR_HANDLE_MAX_ENTRIES", 256))
+
+_index_handles: TTLCache = TTLCache(maxsize=64, ttl=VECTOR_HANDLE_TTL_SECONDS)
+_store_handles: TTLCache = TTLCache(maxsize=VECTOR_HANDLE_MAX_ENTRIES, ttl=VECTOR_HANDLE_TTL_SECONDS)
+_handles_lock = threading.Lock()
+
+# 핸들을 새로 만들어 재시도할 만한 오류 (끊어진 커넥션, 타임아웃) - 잘못된 요청/인증 오류는 재시도하지 않음
+_TRANSIENT_ERRORS = (
+    ConnectionError, TimeoutError, MaxRetryError, NewConnectionError, ProtocolError, Urllib3TimeoutError
+)
+
+# Pinecone 클라이언트는 처음 사용할 때 한 번만 초기화
+@lru_cache(maxsize=1)
+def get_pinecone_client() -> Pinecone:
+    api_key = os.getenv("PINECONE_API_KEY")
+    if not api_key:
+        raise ValueError("환경변수 PINECONE_API_KEY가 필요합니다.")
+    return Pinecone(api_key=api_key)
+
+def get_index(index_name: str):
     """
-    미리 생성된 Pinecone 클라이언트를 사용하여 VectorStore 객체를 반환
+    Pinecone Index 핸들 (host 조회 결과와 커넥션 풀을 index별로 재사용)
     """
+    with _handles_lock:
+        index = _index_handles.get(index_name)
+    if index is not None:
+        return index
+
+    # host 조회는 네트워크 왕복이므로 락 밖에서 (다른 index/namespace의 핸들 조회를 막지 않도록)
+    pc = get_pinecone_client()
+    host = pc.describe_index(index_name).host
+    index = pc.Index(
+        host=host,
+        pool_threads=PINECONE_POOL_THREADS,
+        connection_pool_maxsize=PINECONE_CONNECTION_POOL_MAXSIZE
+    )
+    with _handles_lock:
+        # 동시에 만든 경우 먼저 들어간 핸들을 사용
+        index = _index_handles.setdefault(index_name, index)
+    return index
+
+def _build_vector_store(index_name: str, namespace: Optional[str]) -> VectorStore:
     embedding_model = get_embedding_model()
-    index = pc.Index(index_name)
-    vector_store = PineconeVectorStore(
+    if VECTOR_BACKEND == "local":
+        return LocalVectorStore(embedding=embedding_model, index_name=index_name, namespace=namespace)
+
+    return PineconeVectorStore(
         embedding=embedding_model,
-        index=index,
+        index=get_index(index_name),
         namespace=namespace
     )
+
+def get_vector_store(index_name: str, namespace: Optional[str] = None) -> VectorStore:
+    """
+    설정된 백엔드(VECTOR_BACKEND)의 VectorStore 객체를 반환 ((index, namespace)별로 캐시)
+    """
+    key = (index_name, namespace)
+    with _handles_lock:
+        vector_store = _store_handles.get(key)
+    if vector_store is not None:
+        return vector_store
+
+    vector_store = _build_vector_store(index_name, namespace)
+    with _handles_lock:
+        # 동시에 만든 경우 먼저 들어간 핸들을 사용
+        vector_store = _store_handles.setdefault(key, vector_store)
     return vector_store
 
-def add_documents_to_vector_db(vector_store: PineconeVectorStore, docs: List[Document], namespace: str):
+def invalidate_vector_store(index_name: str, namespace: Optional[str] = None) -> None:
+    """
+    핸들 캐시에서 제거 (namespace를 주지 않으면 index 전체)
+    """
+    with _handles_lock:
+        _index_handles.pop(index_name, None)
+        for key in list(_store_handles.keys()):
+            if key[0] == index_name and (namespace is None or key[1] == namespace):
+                _store_handles.pop(key, None)
+
+def add_documents_to_vector_db(vector_store: VectorStore, docs: List[Document], namespace: str):
     """
     문서 리스트를 벡터 DB에 추가
     """
@@ -39,15 +126,136 @@ def add_documents_to_vector_db(vector_store: PineconeVectorStore, docs: List[Doc
     print(f"{len(ids)}개의 문서가 벡터 DB에 추가되었습니다.")
     return ids
 
+def upsert_embedded_batch(
+    index_name: str,
+    namespace: str,
+    docs: List[Document],
+    vectors: List[List[float]]
+) -> List[str]:
+    """
+    이미 임베딩한 문서 배치를 그대로 업서트 (ID는 doc.id 사용)
+    - local 백엔드는 메모리에만 반영하므로 적재가 끝나면 persist_vector_store 호출
+    """
+    ids = [doc.id for doc in docs]
+    if VECTOR_BACKEND == "local":
+        vector_store = get_vector_store(index_name, namespace)
+        return vector_store.add_embeddings(
+            [doc.page_content for doc in docs], vectors, [doc.metadata for doc in docs], ids,
+            namespace=namespace, persist=False
+        )
+
+    # PineconeVectorStore와 같은 형식 (본문은 metadata의 "text" 키)
+    records = [
+        {"id": doc_id, "values": list(vector), "metadata": {**doc.metadata, "text": doc.page_content}}
+        for doc_id, doc, vector in zip(ids, docs, vectors)
+    ]
+    get_index(index_name).upsert(vectors=records, namespace=namespace)
+    return ids
+
+def delete_legacy_slides(index_name: str, namespace: str, files: List[str]) -> int:
+    """
+    결정적 ID 도입 이전(랜덤 UUID)에 적재된 슬라이드 벡터를 삭제하고 삭제 수 반환
+    - 이전 적재분은 metadata에 deck이 없으므로 "이 덱의 파일이면서 deck이 없는 벡터"로 찾음
+    - Pinecone serverless는 필터 삭제를 지원하지 않으므로 필터 검색으로 ID를 모은 뒤 ID로 삭제
+    """
+    if not files:
+        return 0
+    if VECTOR_BACKEND == "local":
+        vector_store = get_vector_store(index_name, namespace)
+        wanted = set(files)
+        legacy_ids = vector_store.ids_matching(
+            lambda metadata: "deck" not in metadata and metadata.get("file") in wanted, namespace=namespace
+        )
+        if legacy_ids:
+            vector_store.delete(ids=legacy_ids, namespace=namespace, persist=False)
+        return len(legacy_ids)
+
+    index = get_index(index_name)
+    # 필터만 중요하므로 검색 벡터는 아무 값이나 (파일 이름 임베딩)
+    probe = get_embedding_model().embed_query(" ".join(files))
+    metadata_filter = {"file": {"$in": list(files)}, "deck": {"$exists": False}}
+    seen = set()
+    while True:
+        response = index.query(
+            vector=probe, top_k=1000, namespace=namespace, filter=metadata_filter,
+            include_values=False, include_metadata=False
+        )
+        # 삭제는 바로 반영되지 않을 수 있으므로 이미 지운 ID가 다시 나오면 중단
+        legacy_ids = [match.id for match in response.matches if match.id not in seen]
+        if not legacy_ids:
+            return len(seen)
+        index.delete(ids=legacy_ids, namespace=namespace)
+        seen.update(legacy_ids)
+
+def persist_vector_store(index_name: str, namespace: str) -> None:
+    """
+    적재 중 메모리에만 반영한 변경분을 저장 (Pinecone은 업서트 즉시 반영되므로 할 일 없음)
+    """
+    if VECTOR_BACKEND == "local":
+        get_vector_store(index_name, namespace).persist(namespace=namespace)
+
+def _dense_search(index_name: str, namespace: str, query: str, k: int) -> List[Tuple[Document, float]]:
+    vector_store = get_vector_store(index_name, namespace)
+    try:
+        return vector_store.similarity_search_with_score(query, k=k, namespace=namespace)
+    except _TRANSIENT_ERRORS as e:
+        # 끊어진 커넥션/바뀐 host 등으로 핸들이 상했을 수 있으므로 새로 만들어 한 번만 재시도
+        print(f"[WARN] 벡터 검색 실패, 핸들 재생성 후 재시도: {e}")
+        invalidate_vector_store(index_name)
+        vector_store = get_vector_store(index_name, namespace)
+        return vector_store.similarity_search_with_score(query, k=k, namespace=namespace)
+
+def _doc_key(doc: Document):
+    # 벡터 검색 결과는 백엔드에 따라 id가 비어 있을 수 있으므로 양쪽 결과에 항상 있는 슬라이드 위치로 식별
+    # (한쪽만 id로 식별하면 같은 슬라이드가 합쳐지지 않고 두 번 들어감)
+    if doc.metadata.get("file") is not None:
+        return (doc.metadata.get("file"), doc.metadata.get("slide_number"))
+    return doc.id or doc.page_content
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Tuple[Document, float]]],
+    k: int,
+    rrf_k: int = RRF_K
+) -> List[Tuple[Document, float]]:
+    """
+    여러 검색 결과를 순위만으로 합침: score = sum(1 / (rrf_k + rank))
+    """
+    fused: Dict = {}
+    for results in result_lists:
+        for rank, (doc, _) in enumerate(results, start=1):
+            key = _doc_key(doc)
+            doc_score = fused.setdefault(key, [doc, 0.0])
+            doc_score[1] += 1.0 / (rrf_k + rank)
+    ranked = sorted(fused.values(), key=lambda item: item[1], reverse=True)[:k]
+    return [(doc, score) for doc, score in ranked]
+
 def search_documents(
     index_name: str,
     namespace: str,
     query: str,
-    k: int = 3
+    k: int = 3,
+    mode: Optional[str] = None,
+    timing: Optional[Dict] = None
 ) -> List[Tuple[Document, float]]:
     """
     특정 namespace 내에서 유사 문서 검색
+    - dense: 벡터 유사도 (점수 = 코사인 유사도)
+    - hybrid: 벡터 + BM25 결과를 RRF로 결합 (점수 = RRF 점수)
+    - timing['retrieval_score_kind']: 실제로 반환한 점수 종류 (cosine | rrf, 재순위화 임계값 선택용)
     """
-    vector_store = get_vector_store(index_name, namespace)
-    results = vector_store.similarity_search_with_score(query, k=k, namespace=namespace)
-    return results
\ No newline at end of file
+    mode = (mode or RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"지원하지 않는 검색 모드: {mode} (가능: {', '.join(RETRIEVAL_MODES)})")
+    timing = timing if timing is not None else {}
+    timing['retrieval_score_kind'] = "cosine"
+    if mode == "dense":
+        return _dense_search(index_name, namespace, query, k)
+
+    candidates = max(k, HYBRID_CANDIDATES)
+    dense_results = _dense_search(index_name, namespace, query, candidates)
+    lexical_results = get_lexical_index(index_name, namespace).search(query, candidates)
+    if not lexical_results:
+        # 아직 lexical 색인이 없는 namespace (이 기능 이전에 적재된 덱)
+        return dense_results[:k]
+    timing['retrieval_score_kind'] = "rrf"
+    return reciprocal_rank_fusion([dense_results, lexical_results], k)
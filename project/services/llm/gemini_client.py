@@ -0,0 +1,320 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from utils.env_utils import GEMINI_KEY, get_float_env, get_int_env
+
+# 모델/엔드포인트 (로컬 스텁 서버로 바꿔 끼울 수 있도록 base URL 분리)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+API_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent"
+STREAM_API_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent"
+CACHED_CONTENTS_URL = f"{GEMINI_API_BASE}/cachedContents"
+
+# 타임아웃 (생성은 오래 걸릴 수 있으므로 read만 길게)
+GEMINI_CONNECT_TIMEOUT = get_float_env("GEMINI_CONNECT_TIMEOUT", 5.0)
+GEMINI_READ_TIMEOUT = get_float_env("GEMINI_READ_TIMEOUT", 120.0)
+# 재시도 (429/5xx, 네트워크 오류) - 지수 백오프 + full jitter
+GEMINI_MAX_RETRIES = max(0, get_int_env("GEMINI_MAX_RETRIES", 3))
+GEMINI_BACKOFF_BASE = get_float_env("GEMINI_BACKOFF_BASE", 0.5)
+GEMINI_BACKOFF_MAX = get_float_env("GEMINI_BACKOFF_MAX", 8.0)
+# 커넥션 풀 / 클라이언트 측 동시 요청 수, 초당 요청 수 제한 (0이면 제한 없음)
+GEMINI_MAX_CONNECTIONS = max(1, get_int_env("GEMINI_MAX_CONNECTIONS", 32))
+GEMINI_MAX_CONCURRENCY = max(1, get_int_env("GEMINI_MAX_CONCURRENCY", 16))
+GEMINI_RPS = get_float_env("GEMINI_RPS", 0.0)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class _RateLimiter:
+    """
+    초당 요청 수 제한 (동기/비동기 호출이 같은 슬롯을 공유)
+    """
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """다음 요청 슬롯을 예약하고 기다려야 할 시간(초) 반환"""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            return slot - now
+
+_rate_limiter = _RateLimiter(GEMINI_RPS)
+_sync_slots = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_async_slots: Optional[asyncio.Semaphore] = None
+_client_lock = threading.Lock()
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(GEMINI_READ_TIMEOUT, connect=GEMINI_CONNECT_TIMEOUT)
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=GEMINI_MAX_CONNECTIONS, max_keepalive_connections=GEMINI_MAX_CONNECTIONS)
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(timeout=_timeout(), limits=_limits())
+        return _sync_client
+
+def _get_async_client() -> httpx.AsyncClient:
+    # 비동기 클라이언트는 앱의 이벤트 루프에서만 사용, 생성은 동기 클라이언트와 같은 락으로 한 번만
+    global _async_client, _async_slots
+    with _client_lock:
+        if _async_client is None:
+            _async_client = httpx.AsyncClient(timeout=_timeout(), limits=_limits())
+            _async_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return _async_client
+
+async def aclose_gemini_clients() -> None:
+    """
+    앱 종료 시 커넥션 풀 정리
+    """
+    global _sync_client, _async_client, _async_slots
+    with _client_lock:
+        client, _async_client, _async_slots = _async_client, None, None
+    if client is not None:
+        await client.aclose()
+    with _client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+def build_payload(
+    prompt: str,
+    images: Optional[List[Dict]] = None,
+    generation_config: Optional[Dict] = None,
+    cached_content: Optional[str] = None
+) -> Dict:
+    parts = [{"text": prompt}]
+    if images:
+        for image_data in images:
+            image_bytes = image_data.get("data")
+            mime_type = image_data.get("mime_type")
+
+            if image_bytes and mime_type:
+                encoded_image = base64.b64encode(image_bytes).decode('utf-8')
+                parts.append({
+                    "inline_data": {
+                        "mime_type": mime_type,
+                        "data": encoded_image
+                    }
+                })
+
+    data = {"contents": [{"parts": parts}]}
+    if generation_config:
+        data["generationConfig"] = generation_config
+    if cached_content:
+        # 캐시된 앞부분(시스템 지시문 + 강의 자료)을 이어서 사용
+        data["cachedContent"] = cached_content
+    return data
+
+def extract_text(response_json: Dict) -> str:
+    return response_json["candidates"][0]["content"]["parts"][0]["text"]
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    # 서버가 Retry-After를 주면 우선 사용
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), GEMINI_BACKOFF_MAX)
+            except ValueError:
+                pass
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+def _should_retry(
+    attempt: int,
+    response: Optional[httpx.Response],
+    error: Optional[Exception] = None,
+    idempotent: bool = True
+) -> bool:
+    if attempt >= GEMINI_MAX_RETRIES:
+        return False
+    if not idempotent:
+        # 서버가 요청을 처리하지 않은 게 확실한 경우만 (연결 실패, 429)
+        if response is None:
+            return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+        return response.status_code == 429
+    return response is None or response.status_code in RETRYABLE_STATUS
+
+def post_gemini(url: str, data: Dict) -> Dict:
+    """
+    공용 풀 클라이언트로 POST (동시 요청 수/초당 요청 수 제한, 재시도 포함)
+    """
+    client = _get_sync_client()
+    params = {"key": GEMINI_KEY}
+    attempt = 0
+    while True:
+        response = None
+        try:
+            with _sync_slots:
+                time.sleep(_rate_limiter.reserve())
+                response = client.post(url, params=params, json=data)
+            if response.status_code not in RETRYABLE_STATUS:
+                response.raise_for_status()
+                return response.json()
+            error: Exception = httpx.HTTPStatusError(
+                f"Gemini 응답 {response.status_code}", request=response.request, response=response
+            )
+        except httpx.TransportError as e:
+            error = e
+        if not _should_retry(attempt, response):
+            raise error
+        delay = _backoff_delay(attempt, response)
+        print(f"[GEMINI] 재시도 {attempt + 1}/{GEMINI_MAX_RETRIES} ({delay:.2f}s 후): {error}")
+        time.sleep(delay)
+        attempt += 1
+
+async def post_gemini_async(url: str, data: Dict, idempotent: bool = True) -> Dict:
+    """
+    post_gemini의 비동기 버전 (이벤트 루프를 막지 않음)
+    - idempotent=False: 다시 보내면 자원이 또 생기는 요청 → 처리되지 않은 게 확실할 때만 재시도
+    """
+    client = _get_async_client()
+    params = {"key": GEMINI_KEY}
+    attempt = 0
+    while True:
+        response = None
+        try:
+            async with _async_slots:
+                await asyncio.sleep(_rate_limiter.reserve())
+                response = await client.post(url, params=params, json=data)
+            if response.status_code not in RETRYABLE_STATUS:
+                response.raise_for_status()
+                return response.json()
+            error: Exception = httpx.HTTPStatusError(
+                f"Gemini 응답 {response.status_code}", request=response.request, response=response
+            )
+        except httpx.TransportError as e:
+            error = e
+        if not _should_retry(attempt, response, error, idempotent):
+            raise error
+        delay = _backoff_delay(attempt, response)
+        print(f"[GEMINI] 재시도 {attempt + 1}/{GEMINI_MAX_RETRIES} ({delay:.2f}s 후): {error}")
+        await asyncio.sleep(delay)
+        attempt += 1
+
+def call_gemini(prompt: str, images: Optional[List[Dict]] = None, generation_config: Optional[Dict] = None) -> str:
+    data = build_payload(prompt, images, generation_config)
+    return extract_text(post_gemini(API_URL, data))
+
+async def call_gemini_async(
+    prompt: str,
+    images: Optional[List[Dict]] = None,
+    generation_config: Optional[Dict] = None,
+    cached_content: Optional[str] = None,
+    usage: Optional[Dict] = None
+) -> str:
+    """
+    - cached_content: cachedContents 이름 (있으면 그 내용 뒤에 prompt가 이어짐)
+    - usage: 주면 응답의 usageMetadata(입력/캐시/출력 토큰 수)를 채움
+    """
+    data = build_payload(prompt, images, generation_config, cached_content)
+    response_json = await post_gemini_async(API_URL, data)
+    if usage is not None:
+        usage.update(response_json.get("usageMetadata") or {})
+    return extract_text(response_json)
+
+async def create_cached_content(
+    system_instruction: str,
+    contents_text: str,
+    ttl_seconds: int,
+    display_name: Optional[str] = None
+) -> Dict:
+    """
+    시스템 지시문 + 고정 컨텍스트를 cachedContents로 만들고 응답(name, expireTime, usageMetadata) 반환
+    """
+    data = {
+        "model": f"models/{GEMINI_MODEL}",
+        "systemInstruction": {"parts": [{"text": system_instruction}]},
+        "contents": [{"role": "user", "parts": [{"text": contents_text}]}],
+        "ttl": f"{ttl_seconds}s"
+    }
+    if display_name:
+        data["displayName"] = display_name
+    # 생성은 멱등이 아니므로 (타임아웃 후 재시도하면 캐시가 두 개 생겨 TTL까지 과금) 처리 안 된 게 확실할 때만 재시도
+    return await post_gemini_async(CACHED_CONTENTS_URL, data, idempotent=False)
+
+async def delete_cached_content(name: str) -> None:
+    """
+    cachedContents 삭제 (이미 없으면 무시), 다른 호출과 같은 동시 요청 수/초당 요청 수 제한을 따름
+    """
+    client = _get_async_client()
+    async with _async_slots:
+        await asyncio.sleep(_rate_limiter.reserve())
+        response = await client.delete(f"{GEMINI_API_BASE}/{name}", params={"key": GEMINI_KEY})
+    if response.status_code not in (200, 404):
+        response.raise_for_status()
+
+def _extract_stream_text(chunk_json: Dict) -> str:
+    # 스트림 청크는 텍스트가 없을 수도 있음 (안전 필터/종료 청크 등)
+    candidates = chunk_json.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+async def stream_gemini_async(
+    prompt: str,
+    images: Optional[List[Dict]] = None,
+    generation_config: Optional[Dict] = None,
+    cached_content: Optional[str] = None,
+    usage: Optional[Dict] = None
+) -> AsyncIterator[str]:
+    """
+    streamGenerateContent(SSE)로 생성되는 텍스트 조각을 도착하는 대로 반환
+    - 첫 조각을 받기 전까지만 재시도 (이미 내보낸 토큰은 되돌릴 수 없으므로)
+    - usage: 주면 마지막 청크의 usageMetadata를 채움
+    """
+    client = _get_async_client()
+    params = {"key": GEMINI_KEY, "alt": "sse"}
+    data = build_payload(prompt, images, generation_config, cached_content)
+    attempt = 0
+    yielded = False
+    while True:
+        response = None
+        try:
+            async with _async_slots:
+                await asyncio.sleep(_rate_limiter.reserve())
+                async with client.stream("POST", STREAM_API_URL, params=params, json=data) as response:
+                    if response.status_code not in RETRYABLE_STATUS:
+                        if response.status_code >= 400:
+                            await response.aread()
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            chunk_json = json.loads(line[len("data:"):].strip())
+                            if usage is not None and chunk_json.get("usageMetadata"):
+                                usage.update(chunk_json["usageMetadata"])
+                            text = _extract_stream_text(chunk_json)
+                            if text:
+                                yielded = True
+                                yield text
+                        return
+            error: Exception = httpx.HTTPStatusError(
+                f"Gemini 응답 {response.status_code}", request=response.request, response=response
+            )
+        except httpx.TransportError as e:
+            if yielded:
+                raise
+            error = e
+        if not _should_retry(attempt, response):
+            raise error
+        delay = _backoff_delay(attempt, response)
+        print(f"[GEMINI] 스트림 재시도 {attempt + 1}/{GEMINI_MAX_RETRIES} ({delay:.2f}s 후): {error}")
+        await asyncio.sleep(delay)
+        attempt += 1
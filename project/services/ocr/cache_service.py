@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Union
+from utils.env_utils import get_bool_env, get_int_env
+
+# OCR/Gemini 결과 캐시 (페이지 이미지/정리된 텍스트 내용 해시 기준)
+OCR_CACHE_ENABLED = get_bool_env("OCR_CACHE_ENABLED", True)
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join("output", ".cache", "ocr_cache.sqlite3"))
+OCR_CACHE_MAX_BYTES = get_int_env("OCR_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+# 적중 시 접근 시각은 메모리에 모았다가 put/정리 때 또는 이만큼 쌓이면 한 번에 기록 (읽기마다 커밋하지 않음)
+_ACCESS_FLUSH_SIZE = 256
+
+def content_hash(*parts: Union[str, bytes]) -> str:
+    """
+    여러 조각(이미지 bytes, 텍스트, 버전 문자열)을 합친 sha256
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        # 조각 경계를 길이로 구분해 서로 다른 조합이 같은 해시가 되지 않도록 함
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+class CacheStats:
+    """
+    요청(파이프라인 1회) 단위 캐시 적중/미스 카운터
+    """
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, namespace: str, hit: bool) -> None:
+        key = f"{namespace}_cache_{'hits' if hit else 'misses'}"
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+class ResultCache:
+    """
+    SQLite 기반 내용 주소(content-addressed) 캐시
+    - 값 크기 합이 max_bytes를 넘으면 가장 오래 안 쓰인 항목부터 삭제 (LRU)
+    - get의 접근 시각 갱신은 모아서 기록하므로 LRU 순서는 다음 쓰기 전까지 조금 늦게 반영됨
+    """
+    def __init__(self, path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pending_access: Dict[tuple, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+        self._conn.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._pending_access[(namespace, key)] = time.time()
+            if len(self._pending_access) >= _ACCESS_FLUSH_SIZE:
+                self._flush_access()
+                self._conn.commit()
+            return row[0]
+
+    def put(self, namespace: str, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, size, time.time())
+            )
+            self._pending_access.pop((namespace, key), None)
+            self._flush_access()
+            self._evict()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """
+        모아 둔 접근 시각을 기록 (종료 전 등)
+        """
+        with self._lock:
+            if self._pending_access:
+                self._flush_access()
+                self._conn.commit()
+
+    def _flush_access(self) -> None:
+        if not self._pending_access:
+            return
+        self._conn.executemany(
+            "UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?",
+            [(accessed, namespace, key) for (namespace, key), accessed in self._pending_access.items()]
+        )
+        self._pending_access.clear()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 오래된 순으로 훑으면서 상한 아래로 내려갈 때까지 삭제
+        rows = self._conn.execute("SELECT namespace, key, size FROM cache ORDER BY last_access").fetchall()
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            total -= size
+        print(f"[CACHE] LRU 정리 후 크기: {total} bytes")
+
+@lru_cache(maxsize=1)
+def get_result_cache() -> Optional[ResultCache]:
+    if not OCR_CACHE_ENABLED:
+        return None
+    try:
+        return ResultCache(OCR_CACHE_PATH, OCR_CACHE_MAX_BYTES)
+    except Exception as e:
+        # 캐시를 못 열어도 파이프라인은 캐시 없이 동작
+        print(f"[WARN] OCR 캐시 초기화 실패, 캐시 없이 진행: {e}")
+        return None
+
+def flush_result_cache() -> None:
+    """
+    앱 종료 시 모아 둔 접근 시각 기록 (캐시를 연 적이 없으면 아무것도 안 함)
+    """
+    if get_result_cache.cache_info().currsize == 0:
+        return
+    cache = get_result_cache()
+    if cache is not None:
+        cache.flush()
@@ -1,9 +1,26 @@
-import os, requests, json, re
-import base64
-from typing import Optional, List, Dict
-from utils.env_utils import GEMINI_KEY
+import json, re
+from typing import Callable, Optional, List, Dict, Union
+from services.llm.gemini_client import API_URL, call_gemini
+from services.ocr.cache_service import CacheStats, content_hash, get_result_cache
+from utils.env_utils import get_int_env
 
-API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+# 여러 슬라이드를 한 번의 재정렬 요청으로 묶는 개수 (1이면 슬라이드별 호출)
+GEMINI_BATCH_SIZE = max(1, get_int_env("GEMINI_BATCH_SIZE", 1))
+GEMINI_BATCH_WAIT_MS = max(0, get_int_env("GEMINI_BATCH_WAIT_MS", 200))
+
+# 배치 재정렬 응답 스키마 (입력 순번 index로 슬라이드와 매칭)
+BATCH_REORDER_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "title": {"type": "STRING"},
+            "text": {"type": "STRING"}
+        },
+        "required": ["index", "title", "text"]
+    }
+}
 
 def build_prompt(text: str) -> str:
     return f"""
@@ -25,35 +42,35 @@ def build_prompt(text: str) -> str:
 본문: [재정렬된 본문]
 """
 
-def call_gemini(prompt: str, images: Optional[List[Dict]] = None) -> str:
-    headers = {"Content-Type": "application/json"}
-    params = {"key": GEMINI_KEY}
-    
-    parts = [{"text": prompt}]
-    if images:
-        for image_data in images:
-            image_bytes = image_data.get("data")
-            mime_type = image_data.get("mime_type")
-            
-            if image_bytes and mime_type:
-                encoded_image = base64.b64encode(image_bytes).decode('utf-8')
-                parts.append({
-                    "inline_data": {
-                        "mime_type": mime_type,
-                        "data": encoded_image
-                    }
-                })
-        
-    data = {"contents":[{"parts": parts}]}
-    
-    resp = requests.post(API_URL, headers=headers, params=params, json=data)
-    resp.raise_for_status()
-    return resp.json()["candidates"][0]["content"]["parts"][0]["text"]
-
-def process_gemini_reorder(cleaned_txt_path: str, slide_number: int) -> str:
-    with open(cleaned_txt_path, "r", encoding="utf-8") as f:
-        text = f.read().strip()
+def build_batch_prompt(texts: List[str]) -> str:
+    """
+    여러 슬라이드를 한 요청에 담는 프롬프트 (지시사항은 한 번만)
+    """
+    slides = "\n\n".join(f"[슬라이드 {i}]\n{text}" for i, text in enumerate(texts))
+    return f"""
+아래는 OCR로 추출한 강의 슬라이드 {len(texts)}장의 텍스트입니다. 각 슬라이드는 [슬라이드 번호]로 구분되어 있고,
+문장 순서가 섞여 있으며 일부는 보충 설명이나 필기입니다.
+
+{slides}
+
+각 슬라이드마다 독립적으로 다음 작업을 하세요 (슬라이드끼리 내용을 섞지 마세요):
+
+1. 문장을 논리적인 흐름에 맞게 자연스럽게 재정렬하세요.
+2. 각 문단은 하나의 개념 또는 주제를 담도록 구성하고, 줄바꿈이나 번호, 리스트 기호(- 등)를 사용해 구분하세요.
+3. 불필요한 기호(예: '*')는 제거하고, 문맥에 맞게 문장을 정돈하세요.
+4. 한글과 영어가 혼용되어 있다면, 가독성을 위해 **가능한 한 한글로 통일**하고 영어 용어는 괄호로 보완하세요.
+5. 문장이 중복되거나 불완전할 경우, 자연스러운 흐름으로 정리해도 됩니다.
+6. 재정렬된 텍스트의 내용을 대표할 수 있는 **슬라이드 제목**을 하나 생성하세요.
+
+출력 형식:
+슬라이드마다 {{"index": 슬라이드 번호, "title": 제목, "text": 재정렬된 본문}} 객체 하나씩, 모두 {len(texts)}개를 JSON 배열로 출력하세요.
+"""
+
+def _reorder_cache_key(text: str) -> str:
+    # 프롬프트 템플릿이나 모델(API_URL)이 바뀌면 키가 달라져 자동으로 무효화
+    return content_hash(API_URL, build_prompt(""), text)
 
+def _reorder_text(text: str) -> Dict[str, str]:
     prompt = build_prompt(text)
     result = call_gemini(prompt)
     result = result.replace("\n", " ")
@@ -63,10 +80,97 @@ def process_gemini_reorder(cleaned_txt_path: str, slide_number: int) -> str:
     if not title_match or not body_match:
         raise ValueError("Gemini 응답에서 제목/본문 파싱 실패")
 
-    output_json = [{
-        "slide_number": slide_number,
+    return {
         "title": title_match.group(1).strip(),
         "text": body_match.group(1).strip()
+    }
+
+def _parse_batch_response(raw: str, count: int) -> List[Dict[str, str]]:
+    items = json.loads(raw)
+    if not isinstance(items, list):
+        raise ValueError("Gemini 배치 응답이 배열이 아님")
+    by_index = {}
+    for item in items:
+        index = item.get("index")
+        if isinstance(index, int) and 0 <= index < count and item.get("title") and item.get("text") is not None:
+            by_index[index] = {
+                "title": str(item["title"]).strip(),
+                "text": str(item["text"]).replace("\n", " ").strip()
+            }
+    if len(by_index) != count:
+        raise ValueError(f"Gemini 배치 응답 슬라이드 수 불일치: {len(by_index)}/{count}")
+    return [by_index[i] for i in range(count)]
+
+def batch_reorder_texts(texts: List[str]) -> List[Union[Dict[str, str], Exception]]:
+    """
+    여러 슬라이드를 한 번의 JSON 출력 요청으로 재정렬
+    - 파싱/매칭에 실패하면 절반씩 나눠 다시 요청하고, 1장이 되면 기존 단건 프롬프트로 처리
+    - HTTP/네트워크 오류(429, 5xx 등)는 나누지 않고 그대로 올림 (과부하일 때 호출 수를 늘리지 않도록)
+    - 결과는 입력 순서대로, 실패한 슬라이드는 Exception 객체
+    """
+    if not texts:
+        return []
+    if len(texts) == 1:
+        try:
+            return [_reorder_text(texts[0])]
+        except Exception as e:
+            return [e]
+
+    raw = call_gemini(
+        build_batch_prompt(texts),
+        generation_config={
+            "responseMimeType": "application/json",
+            "responseSchema": BATCH_REORDER_SCHEMA
+        }
+    )
+    try:
+        return _parse_batch_response(raw, len(texts))
+    except ValueError as e:
+        # json.JSONDecodeError도 ValueError
+        print(f"[GEMINI] {len(texts)}장 배치 재정렬 실패, 나눠서 재시도: {e}")
+        mid = len(texts) // 2
+        return batch_reorder_texts(texts[:mid]) + batch_reorder_texts(texts[mid:])
+
+def reorder_text_cached(
+    text: str,
+    cache_stats: Optional[CacheStats] = None,
+    reorderer: Optional[Callable[[str], Dict[str, str]]] = None
+) -> Dict[str, str]:
+    """
+    같은 정리 텍스트(내용 해시 기준)는 Gemini를 다시 호출하지 않음
+    - reorderer: 실제 재정렬 호출 함수 (배치 재정렬 시 MicroBatcher를 넘김)
+    """
+    reorderer = reorderer or _reorder_text
+    cache = get_result_cache()
+    if cache is None:
+        return reorderer(text)
+
+    key = _reorder_cache_key(text)
+    cached = cache.get("gemini", key)
+    if cache_stats is not None:
+        cache_stats.record("gemini", cached is not None)
+    if cached is not None:
+        return json.loads(cached)
+
+    reordered = reorderer(text)
+    cache.put("gemini", key, json.dumps(reordered, ensure_ascii=False))
+    return reordered
+
+def process_gemini_reorder(
+    cleaned_txt_path: str,
+    slide_number: int,
+    cache_stats: Optional[CacheStats] = None,
+    reorderer: Optional[Callable[[str], Dict[str, str]]] = None
+) -> str:
+    with open(cleaned_txt_path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+
+    reordered = reorder_text_cached(text, cache_stats, reorderer)
+
+    output_json = [{
+        "slide_number": slide_number,
+        "title": reordered["title"],
+        "text": reordered["text"]
     }]
 
     output_path = cleaned_txt_path.replace("_cleaned.txt", "_gemini_reorder.json")
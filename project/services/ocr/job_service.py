@@ -0,0 +1,181 @@
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from services.convert.ppt_to_pdf_service import ensure_pdf
+from services.ocr.pipeline_service import process_pdf_pipeline
+from utils.env_utils import get_int_env
+
+# OCR 작업은 이벤트 루프 밖의 전용 풀에서 실행 (동시에 돌릴 덱 수 상한)
+OCR_JOB_WORKERS = max(1, get_int_env("OCR_JOB_WORKERS", 2))
+# 끝난 작업 결과 보관 시간
+OCR_JOB_TTL_SECONDS = get_int_env("OCR_JOB_TTL_SECONDS", 3600)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+_FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+class OcrJob:
+    def __init__(self, user_id: str, upload_path: str, session_dir: str):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.upload_path = upload_path
+        self.session_dir = session_dir
+        self.status = JOB_QUEUED
+        self.message: Optional[str] = None
+        self.total_slides: Optional[int] = None
+        self.completed: List[Dict] = []
+        self.results: Optional[List[Dict]] = None
+        self.timing: Dict = {}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINISHED_STATES
+
+    def _set_total(self, total: int) -> None:
+        with self._lock:
+            self.total_slides = total
+
+    def _add_slide(self, result: Dict) -> None:
+        with self._lock:
+            self.completed.append(result)
+
+    def _start(self) -> bool:
+        """
+        대기 → 실행 전환 (이미 취소 신호를 받았거나 끝난 작업이면 False)
+        """
+        with self._lock:
+            if self.cancel_event.is_set() or self.status in _FINISHED_STATES:
+                return False
+            self.status = JOB_RUNNING
+            return True
+
+    def _finish(
+        self,
+        status: str,
+        message: Optional[str] = None,
+        results: Optional[List[Dict]] = None,
+        timing: Optional[Dict] = None
+    ) -> None:
+        with self._lock:
+            if self.status in _FINISHED_STATES:
+                return
+            self.status = status
+            self.message = message
+            if results is not None:
+                self.results = results
+            if timing is not None:
+                self.timing = timing
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            done = len(self.completed)
+            return {
+                "job_id": self.job_id,
+                "user_id": self.user_id,
+                "status": self.status,
+                "message": self.message,
+                "session_dir": self.session_dir,
+                "progress": {
+                    "completed_slides": done,
+                    "total_slides": self.total_slides,
+                    "ratio": round(done / self.total_slides, 3) if self.total_slides else 0.0
+                },
+                # 끝나기 전에는 완료된 슬라이드만 부분 결과로 제공
+                "files": self.results if self.results is not None else sorted(self.completed, key=lambda r: r["slide"]),
+                "timing": self.timing
+            }
+
+_executor = ThreadPoolExecutor(max_workers=OCR_JOB_WORKERS, thread_name_prefix="ocr-job")
+_jobs: Dict[str, OcrJob] = {}
+_jobs_lock = threading.Lock()
+
+def _run_job(job: OcrJob) -> OcrJob:
+    if not job._start():
+        job._finish(JOB_CANCELLED)
+        return job
+
+    start_total = time.perf_counter()
+    try:
+        # PPT/PPTX이면 PDF로 변환 (PDF면 그대로 경로 반환)
+        start_conv = time.perf_counter()
+        pdf_path = ensure_pdf(job.upload_path, job.session_dir)
+        end_conv = time.perf_counter()
+
+        results, timing_pipeline = process_pdf_pipeline(
+            pdf_path,
+            job.session_dir,
+            cancel_event=job.cancel_event,
+            on_total=job._set_total,
+            on_slide_done=job._add_slide
+        )
+        timing_pipeline["ppt2pdf_time"] = round(end_conv - start_conv, 3)
+        timing_pipeline["total_time"] = round(time.perf_counter() - start_total, 3)
+        job._finish(
+            JOB_CANCELLED if job.cancel_event.is_set() else JOB_SUCCEEDED,
+            results=results,
+            timing=timing_pipeline
+        )
+    except Exception as e:
+        print(f"[ERR] OCR 작업 실패 ({job.job_id}): {e}")
+        job._finish(JOB_FAILED, str(e))
+    return job
+
+def _purge_expired_jobs() -> None:
+    now = time.time()
+    with _jobs_lock:
+        expired = [
+            job_id for job_id, job in _jobs.items()
+            if job.finished_at is not None and now - job.finished_at > OCR_JOB_TTL_SECONDS
+        ]
+        for job_id in expired:
+            del _jobs[job_id]
+
+def submit_job(user_id: str, upload_path: str, session_dir: str) -> OcrJob:
+    """
+    업로드된 파일에 대한 OCR 작업을 큐에 넣고 즉시 반환
+    """
+    _purge_expired_jobs()
+    job = OcrJob(user_id, upload_path, session_dir)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    job.future = _executor.submit(_run_job, job)
+    return job
+
+def get_job(job_id: str) -> Optional[OcrJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def cancel_job(job_id: str) -> Optional[OcrJob]:
+    """
+    대기 중이면 바로 취소, 실행 중이면 남은 슬라이드 처리를 중단하도록 신호
+    """
+    job = get_job(job_id)
+    if job is None or job.finished:
+        return job
+    job.cancel_event.set()
+    if job.future is not None and job.future.cancel():
+        job._finish(JOB_CANCELLED)
+    return job
+
+def shutdown_jobs() -> None:
+    """
+    앱 종료 시 실행 중인 작업에 취소 신호를 보내고 대기 중인 작업은 버림
+    """
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    for job in jobs:
+        if not job.finished:
+            job.cancel_event.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,30 +1,29 @@
 from google.cloud import vision
 from google.oauth2 import service_account
-import os, json
-from PIL import Image
-from utils.env_utils import GOOGLE_KEY
-
-# Vision API 클라이언트 설정
-credentials = service_account.Credentials.from_service_account_file(GOOGLE_KEY)
-client = vision.ImageAnnotatorClient(credentials=credentials)
-
-def upscale_image(input_path, scale_factor=1.5):
-    img = Image.open(input_path)
-    new_size = (int(img.width * scale_factor), int(img.height * scale_factor))
-    resized_img = img.resize(new_size, Image.LANCZOS)
-
-    upscaled_path = input_path.replace(".png", f"_upscaled_{int(scale_factor*100)}.png")
-    resized_img.save(upscaled_path)
-    print(f"[INFO] 이미지 확대 저장: {upscaled_path}")
-    return upscaled_path
-
-def run_document_text_detection(image_path: str) -> str:
-    with open(image_path, "rb") as f:
-        content = f.read()
-    image = vision.Image(content=content)
-    response = client.document_text_detection(image=image)
+import os, json, time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Union
+from services.ocr.cache_service import CacheStats, content_hash, get_result_cache
+from utils.env_utils import GOOGLE_KEY, get_int_env
+
+# OCR 결과 형식/기능이 바뀌면 올려서 기존 캐시 무효화
+OCR_CACHE_VERSION = "vision-document-text-v1"
+
+# 배치 OCR 설정
+# - Vision batch_annotate_images는 요청당 최대 16장, 요청 크기 제한이 있으므로 장수/바이트 둘 다 제한
+OCR_BATCH_SIZE = min(16, max(1, get_int_env("OCR_BATCH_SIZE", 1)))
+OCR_BATCH_MAX_BYTES = get_int_env("OCR_BATCH_MAX_BYTES", 8 * 1024 * 1024)
+OCR_BATCH_RETRIES = max(0, get_int_env("OCR_BATCH_RETRIES", 2))
+# 배치를 채우기 위해 기다리는 최대 시간
+OCR_BATCH_WAIT_MS = max(0, get_int_env("OCR_BATCH_WAIT_MS", 50))
 
-    full_text_annotation = response.full_text_annotation
+# Vision API 클라이언트는 처음 사용할 때 한 번만 생성 (gRPC 채널 생성 비용이 큼)
+@lru_cache(maxsize=1)
+def get_vision_client() -> vision.ImageAnnotatorClient:
+    credentials = service_account.Credentials.from_service_account_file(GOOGLE_KEY)
+    return vision.ImageAnnotatorClient(credentials=credentials)
+
+def _build_ocr_result(full_text_annotation) -> Dict:
     full_text_blocks = []
     printed_blocks = []
     handwritten_blocks = []
@@ -49,16 +48,136 @@ def run_document_text_detection(image_path: str) -> str:
             full_text_blocks.append(block_info)
             (printed_blocks if block.confidence >= threshold else handwritten_blocks).append(block_info)
 
+    return {
+        "full_text": full_text_annotation.text,
+        "full_text_blocks": full_text_blocks,
+        "printed_blocks": printed_blocks,
+        "handwritten_blocks": handwritten_blocks,
+    }
+
+def detect_document_text(content: bytes) -> Dict:
+    """
+    이미지 bytes를 Vision API로 OCR하고 결과 dict 반환 (파일 저장 없음)
+    """
+    image = vision.Image(content=content)
+    response = get_vision_client().document_text_detection(image=image)
+    if response.error.message:
+        raise RuntimeError(f"Vision API 오류: {response.error.message}")
+    return _build_ocr_result(response.full_text_annotation)
+
+def _split_by_size(contents: List[bytes]) -> List[List[int]]:
+    """
+    요청 1건에 들어갈 이미지 인덱스 묶음 (장수/바이트 상한 기준)
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+    for i, content in enumerate(contents):
+        if current and (len(current) >= OCR_BATCH_SIZE or current_bytes + len(content) > OCR_BATCH_MAX_BYTES):
+            groups.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += len(content)
+    if current:
+        groups.append(current)
+    return groups
+
+def _annotate_group(contents: List[bytes], indices: List[int], results: List) -> None:
+    feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+    requests = [
+        vision.AnnotateImageRequest(image=vision.Image(content=contents[i]), features=[feature])
+        for i in indices
+    ]
+    try:
+        batch_response = get_vision_client().batch_annotate_images(requests=requests)
+    except Exception as e:
+        # 요청 전체 실패는 묶음 안의 모든 이미지를 실패로 기록
+        for i in indices:
+            results[i] = e
+        return
+
+    for i, response in zip(indices, batch_response.responses):
+        if response.error.message:
+            results[i] = RuntimeError(f"Vision API 오류: {response.error.message}")
+        else:
+            results[i] = _build_ocr_result(response.full_text_annotation)
+
+def batch_detect_document_text(contents: List[bytes]) -> List[Union[Dict, Exception]]:
+    """
+    여러 이미지를 batch_annotate_images로 묶어서 OCR
+    - 결과는 입력 순서대로, 실패한 항목은 Exception 객체
+    - 실패한 항목만 골라서 OCR_BATCH_RETRIES번까지 재시도
+    """
+    results: List[Union[Dict, Exception, None]] = [None] * len(contents)
+    pending = list(range(len(contents)))
+
+    for attempt in range(OCR_BATCH_RETRIES + 1):
+        if attempt > 0:
+            time.sleep(0.5 * (2 ** (attempt - 1)))
+            print(f"[OCR] 배치 재시도 {attempt}회차: {len(pending)}장")
+        pending_contents = [contents[i] for i in pending]
+        for group in _split_by_size(pending_contents):
+            _annotate_group(contents, [pending[j] for j in group], results)
+        pending = [i for i in pending if isinstance(results[i], Exception)]
+        if not pending:
+            break
+
+    return results
+
+def detect_document_text_cached(
+    content: bytes,
+    cache_stats: Optional[CacheStats] = None,
+    detector: Optional[Callable[[bytes], Dict]] = None
+) -> Dict:
+    """
+    같은 페이지 이미지(내용 해시 기준)는 Vision API를 다시 호출하지 않음
+    - detector: 실제 OCR 호출 함수 (배치 OCR 시 MicroBatcher를 넘김)
+    """
+    detector = detector or detect_document_text
+    cache = get_result_cache()
+    if cache is None:
+        return detector(content)
+
+    key = content_hash(OCR_CACHE_VERSION, content)
+    cached = cache.get("ocr", key)
+    if cache_stats is not None:
+        cache_stats.record("ocr", cached is not None)
+    if cached is not None:
+        return json.loads(cached)
+
+    result = detector(content)
+    cache.put("ocr", key, json.dumps(result, ensure_ascii=False))
+    return result
+
+def run_document_text_detection(
+    image: Union[str, bytes],
+    output_base: str = None,
+    cache_stats: Optional[CacheStats] = None,
+    detector: Optional[Callable[[bytes], Dict]] = None
+) -> str:
+    """
+    OCR 결과를 {output_base}_ocr_result.json 으로 저장하고 경로 반환
+    - image: 이미지 파일 경로 또는 메모리상의 이미지 bytes
+    - output_base: bytes 입력 시 결과 파일 경로의 접두사 (경로 입력 시 생략 가능)
+    - cache_stats: 캐시 적중/미스 집계용 (선택)
+    - detector: 실제 OCR 호출 함수 (기본은 단건 document_text_detection)
+    """
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            content = f.read()
+        if output_base is None:
+            output_base = os.path.splitext(image)[0]
+    else:
+        content = image
+        if output_base is None:
+            raise ValueError("bytes 입력에는 output_base가 필요합니다.")
+
+    result = detect_document_text_cached(content, cache_stats, detector)
+
     # JSON 저장
-    filename = os.path.splitext(os.path.basename(image_path))[0]
-    output_path = os.path.join(os.path.dirname(image_path), f"{filename}_ocr_result.json")
+    output_path = f"{output_base}_ocr_result.json"
     with open(output_path, "w", encoding="utf-8") as f:
-        json.dump({
-            "full_text": full_text_annotation.text,
-            "full_text_blocks": full_text_blocks,
-            "printed_blocks": printed_blocks,
-            "handwritten_blocks": handwritten_blocks,
-        }, f, indent=2, ensure_ascii=False)
+        json.dump(result, f, indent=2, ensure_ascii=False)
 
     print(f"[OCR] JSON 저장: {output_path}")
     return output_path
@@ -1,24 +1,159 @@
-from pdf2image import convert_from_path
-from datetime import datetime
+from pdf2image import convert_from_path, pdfinfo_from_path
+from typing import Iterator, List, Optional, Tuple
+from PIL import Image
+from utils.env_utils import get_bool_env, get_int_env
+import io
 import os
+import time
 
-def pdf_to_images(pdf_path: str, output_dir: str, dpi: int = 300):
+# 한 번에 렌더링할 페이지 수 (메모리에 동시에 올라가는 페이지 상한)
+PDF_RENDER_WINDOW = max(1, get_int_env("PDF_RENDER_WINDOW", 2))
+# poppler 변환 스레드 수 (윈도우 안의 페이지를 나눠서 렌더링)
+PDF_RENDER_THREADS = max(1, get_int_env("PDF_RENDER_THREADS", 2))
+
+# OCR용 렌더링 설정
+# - 예전 300 DPI 렌더링 + 1.5배 LANCZOS 확대와 같은 해상도를 한 번에 렌더링 (300 * 1.5 = 450)
+OCR_RENDER_DPI = get_int_env("OCR_RENDER_DPI", 450)
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "PNG").strip().upper()  # PNG | JPEG | WEBP
+OCR_IMAGE_QUALITY = get_int_env("OCR_IMAGE_QUALITY", 90)  # JPEG/WEBP 품질
+# 페이지 글자 밀도에 따라 DPI를 고를지 여부와 범위
+OCR_ADAPTIVE_DPI = get_bool_env("OCR_ADAPTIVE_DPI", False)
+OCR_MIN_DPI = get_int_env("OCR_MIN_DPI", 300)
+OCR_MAX_DPI = get_int_env("OCR_MAX_DPI", 500)
+# 밀도 측정용 저해상도 렌더링 DPI
+_PROBE_DPI = 36
+
+def get_page_count(pdf_path: str) -> int:
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+def iter_pdf_pages(
+    pdf_path: str,
+    dpi: int = 300,
+    window: Optional[int] = None,
+    thread_count: Optional[int] = None,
+    render_times: Optional[List[float]] = None
+) -> Iterator[Tuple[int, Image.Image]]:
     """
-    PDF 파일을 이미지로 변환하고 output_dir에 저장
+    PDF를 window 페이지씩 나눠 렌더링하며 (페이지 번호, 이미지)를 하나씩 반환
+    - 전체 페이지를 한 번에 메모리에 올리지 않으므로 덱 길이와 무관하게 메모리 사용량이 일정
+    - render_times: 주면 페이지당 렌더링 시간(윈도우 렌더링 시간 / 페이지 수)을 페이지마다 추가
+    """
+    window = window or PDF_RENDER_WINDOW
+    thread_count = thread_count or PDF_RENDER_THREADS
+    total = get_page_count(pdf_path)
+
+    for first_page in range(1, total + 1, window):
+        last_page = min(first_page + window - 1, total)
+        start = time.perf_counter()
+        images = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            thread_count=min(thread_count, last_page - first_page + 1)
+        )
+        if render_times is not None and images:
+            per_page = (time.perf_counter() - start) / len(images)
+            render_times.extend([per_page] * len(images))
+        page_number = first_page
+        # 넘겨준 페이지는 리스트에서 빼서 소비자가 놓는 즉시 해제되도록 함
+        while images:
+            yield page_number, images.pop(0)
+            page_number += 1
+
+def encode_image(img: Image.Image, fmt: Optional[str] = None, quality: Optional[int] = None) -> bytes:
+    """
+    PIL 이미지를 한 번만 인코딩해서 bytes로 반환 (디스크에 쓰지 않음)
+    """
+    fmt = (fmt or OCR_IMAGE_FORMAT).upper()
+    quality = quality or OCR_IMAGE_QUALITY
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.convert("RGB").save(buf, "JPEG", quality=quality, optimize=True)
+    elif fmt == "WEBP":
+        img.save(buf, "WEBP", quality=quality)
+    else:
+        # PNG는 압축 레벨만 낮춰서 인코딩 시간 절약 (무손실이라 OCR 품질 동일)
+        img.save(buf, "PNG", compress_level=1)
+    return buf.getvalue()
+
+def estimate_text_density(pdf_path: str, page_number: int) -> float:
+    """
+    저해상도로 렌더링한 페이지에서 어두운 픽셀 비율로 글자 밀도를 추정 (0~1)
+    """
+    probe = convert_from_path(
+        pdf_path, dpi=_PROBE_DPI, first_page=page_number, last_page=page_number, grayscale=True
+    )[0]
+    histogram = probe.histogram()
+    dark = sum(histogram[:128])
+    total = probe.width * probe.height
+    probe.close()
+    return dark / total if total else 0.0
+
+def choose_dpi(pdf_path: str, page_number: int) -> int:
+    """
+    글자가 빽빽한 페이지(작은 글씨)는 높은 DPI, 여백이 많은 페이지는 낮은 DPI로 렌더링
+    """
+    density = estimate_text_density(pdf_path, page_number)
+    # 밀도 0~20% 구간을 최소~최대 DPI로 선형 매핑
+    ratio = min(density / 0.2, 1.0)
+    return int(OCR_MIN_DPI + (OCR_MAX_DPI - OCR_MIN_DPI) * ratio)
+
+def iter_pdf_page_bytes(
+    pdf_path: str,
+    dpi: Optional[int] = None,
+    fmt: Optional[str] = None,
+    adaptive: Optional[bool] = None,
+    render_times: Optional[List[float]] = None
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    OCR 입력용: 목표 해상도로 바로 렌더링 후 한 번만 인코딩한 (페이지 번호, 이미지 bytes) 반환
+    - 확대/재저장 단계와 임시 PNG 파일이 없음
+    - render_times: 주면 페이지마다 렌더링 + 인코딩 시간을 추가
+    """
+    if adaptive is None:
+        adaptive = OCR_ADAPTIVE_DPI
+
+    if not adaptive:
+        window_times: List[float] = []
+        for idx, img in iter_pdf_pages(pdf_path, dpi=dpi or OCR_RENDER_DPI, render_times=window_times):
+            start = time.perf_counter()
+            content = encode_image(img, fmt)
+            img.close()
+            if render_times is not None:
+                render_times.append(window_times.pop(0) + time.perf_counter() - start)
+            yield idx, content
+        return
+
+    # 페이지마다 DPI가 다르므로 한 장씩 렌더링
+    for idx in range(1, get_page_count(pdf_path) + 1):
+        start = time.perf_counter()
+        page_dpi = choose_dpi(pdf_path, idx)
+        img = convert_from_path(pdf_path, dpi=page_dpi, first_page=idx, last_page=idx)[0]
+        content = encode_image(img, fmt)
+        img.close()
+        if render_times is not None:
+            render_times.append(time.perf_counter() - start)
+        print(f"[RENDER] {idx}페이지 {page_dpi} DPI ({len(content)} bytes)")
+        yield idx, content
+
+def iter_pdf_to_images(pdf_path: str, output_dir: str, dpi: int = 300) -> Iterator[Tuple[int, str]]:
+    """
+    페이지를 렌더링되는 대로 PNG로 저장하고 (페이지 번호, 저장 경로)를 반환
     """
     # splitext로 확장자를 제외한 파일 이름 반환
     pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-    
-    # thread_count를 올려서 변환 속도 향상 가능
-    images = convert_from_path(pdf_path, dpi=dpi)
 
-    saved_paths = []
-    # enumerate로 이미지의 인덱스, 이미지를 모두 순회
-    for idx, img in enumerate(images, start=1):
+    for idx, img in iter_pdf_pages(pdf_path, dpi=dpi):
         slide_filename = f"{pdf_name}-{idx:02d}.png"
         slide_path = os.path.join(output_dir, slide_filename)
         img.save(slide_path, "PNG")
-        saved_paths.append(slide_path)
+        img.close()
         print(f"[SAVED] {slide_path}")
+        yield idx, slide_path
 
-    return saved_paths
\ No newline at end of file
+def pdf_to_images(pdf_path: str, output_dir: str, dpi: int = 300):
+    """
+    PDF 파일을 이미지로 변환하고 output_dir에 저장
+    """
+    return [slide_path for _, slide_path in iter_pdf_to_images(pdf_path, output_dir, dpi)]
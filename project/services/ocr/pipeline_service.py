@@ -1,10 +1,36 @@
 import os
-from services.ocr.pdf_service import pdf_to_images
-from services.ocr.ocr_service import upscale_image, run_document_text_detection
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from services.ocr.pdf_service import get_page_count, iter_pdf_page_bytes
+from services.ocr.ocr_service import (
+    run_document_text_detection,
+    batch_detect_document_text,
+    OCR_BATCH_SIZE,
+    OCR_BATCH_WAIT_MS
+)
 from services.ocr.clean_service import process_cleaning
-from services.ocr.gemini_service import process_gemini_reorder
+from services.ocr.cache_service import CacheStats
+from services.ocr.gemini_service import (
+    process_gemini_reorder,
+    batch_reorder_texts,
+    GEMINI_BATCH_SIZE,
+    GEMINI_BATCH_WAIT_MS
+)
+from utils.batching import MicroBatcher
+from utils.env_utils import get_bool_env, get_int_env
 import time
 
+# 동시 처리 모드 설정
+# - CPU 단계(clean)는 CPU 풀, 네트워크 단계(OCR, Gemini)는 I/O 풀에서 실행
+# - 각 풀의 워커 수가 단계별 동시 실행 상한
+OCR_PIPELINE_CONCURRENT = get_bool_env("OCR_PIPELINE_CONCURRENT", True)
+OCR_CPU_WORKERS = max(1, get_int_env("OCR_CPU_WORKERS", os.cpu_count() or 2))
+OCR_IO_WORKERS = max(1, get_int_env("OCR_IO_WORKERS", 8))
+OCR_CPU_POOL = os.getenv("OCR_CPU_POOL", "thread").strip().lower()  # thread | process
+# 렌더링은 끝났지만 아직 처리 중인 슬라이드 수 상한 (렌더링이 처리보다 너무 앞서가지 않도록)
+OCR_MAX_INFLIGHT_SLIDES = get_int_env("OCR_MAX_INFLIGHT_SLIDES", 0)
+
 def remove_file_safely(file_path):
     try:
         if os.path.exists(file_path):
@@ -12,92 +38,263 @@ def remove_file_safely(file_path):
             print(f"[DEL] {file_path}")
     except Exception as e:
         print(f"[ERR] 파일 삭제 실패: {file_path} - {e}")
-        
-def process_pdf_pipeline(pdf_path: str, session_dir: str):
+
+def _timed(fn, *args):
+    """
+    워커 안에서 순수 실행 시간만 측정 (풀 대기 시간 제외)
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def _run_stage(pool: Optional[Executor], fn, *args):
+    if pool is None:
+        return _timed(fn, *args)
+    return pool.submit(_timed, fn, *args).result()
+
+def _is_cancelled(cancel_event: Optional[threading.Event]) -> bool:
+    return cancel_event is not None and cancel_event.is_set()
+
+def _process_slide(
+    idx: int,
+    image_bytes: bytes,
+    output_base: str,
+    timing_per_step: Dict[str, List[float]],
+    cpu_pool: Optional[Executor] = None,
+    io_pool: Optional[Executor] = None,
+    cancel_event: Optional[threading.Event] = None,
+    cache_stats: Optional[CacheStats] = None,
+    ocr_batcher: Optional[MicroBatcher] = None,
+    gemini_batcher: Optional[MicroBatcher] = None
+) -> Dict:
+    """
+    슬라이드 1장 처리 (OCR -> clean -> gemini)
+    - 렌더링된 이미지는 bytes 그대로 OCR에 전달 (임시 이미지 파일 없음)
+    - 단계별 실패는 해당 슬라이드 안에서만 처리하고 다음 단계는 건너뜀
+    - 취소 요청이 들어오면 남은 단계는 실행하지 않음
+    """
+    result = {
+        "slide": idx,
+        "ocr_json": None,
+        "cleaned_txt": None,
+        "gemini_json": None
+    }
+    if _is_cancelled(cancel_event):
+        result["cancelled"] = True
+        return result
+
+    # OCR (배치 모드면 배처가 다른 슬라이드와 묶어서 호출하므로 I/O 풀을 거치지 않음)
+    try:
+        ocr_json_path, elapsed = _run_stage(
+            None if ocr_batcher else io_pool,
+            run_document_text_detection, image_bytes, output_base, cache_stats, ocr_batcher
+        )
+        timing_per_step["ocr"].append(elapsed)
+    except Exception as e:
+        print(f"[ERR] {idx}번째 슬라이드 OCR 처리 중 문제 발생: {e}")
+        ocr_json_path = None
+    result["ocr_json"] = ocr_json_path
+
+    # llm 전달 전처리
+    try:
+        if ocr_json_path and not _is_cancelled(cancel_event):
+            cleaned_txt_path, elapsed = _run_stage(cpu_pool, process_cleaning, ocr_json_path)
+            timing_per_step["clean"].append(elapsed)
+        else:
+            cleaned_txt_path = None
+    except Exception as e:
+        print(f"[ERR] {idx}번째 슬라이드 Cleaning 처리 중 문제 발생: {e}")
+        cleaned_txt_path = None
+    result["cleaned_txt"] = cleaned_txt_path
+
+    # gemini
+    try:
+        if cleaned_txt_path and not _is_cancelled(cancel_event):
+            gemini_json_path, elapsed = _run_stage(
+                None if gemini_batcher else io_pool,
+                process_gemini_reorder, cleaned_txt_path, idx, cache_stats, gemini_batcher
+            )
+            timing_per_step["gemini"].append(elapsed)
+        else:
+            gemini_json_path = None
+    except Exception as e:
+        print(f"[ERR] {idx}번째 슬라이드 Gemini 처리 중 문제 발생: {e}")
+        gemini_json_path = None
+    result["gemini_json"] = gemini_json_path
+
+    if gemini_json_path is None and _is_cancelled(cancel_event):
+        result["cancelled"] = True
+    return result
+
+def _make_cpu_pool(max_workers: int) -> Executor:
+    if OCR_CPU_POOL == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-cpu")
+
+def _notify_slide_done(on_slide_done: Optional[Callable[[Dict], None]], result: Dict) -> None:
+    """
+    진행 상황 콜백 호출 (콜백 오류가 파이프라인을 멈추지 않도록 격리)
+    """
+    if on_slide_done is None:
+        return
+    try:
+        on_slide_done({
+            "slide": result["slide"],
+            "gemini_json": result["gemini_json"],
+            "cancelled": result.get("cancelled", False)
+        })
+    except Exception as e:
+        print(f"[ERR] 진행 상황 콜백 실패: {e}")
+
+def _process_and_notify(on_slide_done: Optional[Callable[[Dict], None]], *args) -> Dict:
+    result = _process_slide(*args)
+    _notify_slide_done(on_slide_done, result)
+    return result
+
+def _run_concurrent(
+    pages: Iterable[Tuple[int, bytes, str]],
+    timing_per_step: Dict[str, List[float]],
+    cpu_workers: int,
+    io_workers: int,
+    cancel_event: Optional[threading.Event] = None,
+    on_slide_done: Optional[Callable[[Dict], None]] = None,
+    cache_stats: Optional[CacheStats] = None
+) -> List[Dict]:
+    """
+    슬라이드들을 병렬로 처리하되, 단계별 동시 실행 수는 각 풀 크기로 제한
+    - 페이지는 렌더링되는 대로 투입하고, 처리 중인 슬라이드 수가 상한에 닿으면 렌더링을 잠시 멈춤
+    """
+    max_inflight = OCR_MAX_INFLIGHT_SLIDES or (cpu_workers + io_workers) * 2
+    inflight = threading.BoundedSemaphore(max_inflight)
+    futures: List[Tuple[int, Future]] = []
+    # 슬라이드 오케스트레이션 스레드는 대부분 풀 결과를 기다리므로 두 풀 합만큼 둠
+    # 배치 풀은 OCR 배치 몫(io_workers // OCR_BATCH_SIZE)에 Gemini 배치를 쓰면 그 몫을 더함
+    batch_workers = max(1, io_workers // OCR_BATCH_SIZE)
+    if GEMINI_BATCH_SIZE > 1:
+        batch_workers += max(1, io_workers // GEMINI_BATCH_SIZE)
+    with _make_cpu_pool(cpu_workers) as cpu_pool, \
+         ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="ocr-io") as io_pool, \
+         ThreadPoolExecutor(max_workers=cpu_workers + io_workers, thread_name_prefix="ocr-slide") as slide_pool, \
+         ThreadPoolExecutor(max_workers=batch_workers, thread_name_prefix="ocr-batch") as batch_pool:
+        # OCR_BATCH_SIZE > 1 이면 동시에 OCR 단계에 들어온 슬라이드들을 batch_annotate_images 한 번으로 묶음
+        ocr_batcher = gemini_batcher = None
+        if OCR_BATCH_SIZE > 1:
+            ocr_batcher = MicroBatcher(
+                batch_detect_document_text,
+                max_batch_size=OCR_BATCH_SIZE,
+                max_wait=OCR_BATCH_WAIT_MS / 1000,
+                executor=batch_pool,
+                name="ocr-batcher"
+            )
+        # GEMINI_BATCH_SIZE > 1 이면 캐시 미스 슬라이드 여러 장을 재정렬 요청 한 번으로 묶음
+        if GEMINI_BATCH_SIZE > 1:
+            gemini_batcher = MicroBatcher(
+                batch_reorder_texts,
+                max_batch_size=GEMINI_BATCH_SIZE,
+                max_wait=GEMINI_BATCH_WAIT_MS / 1000,
+                executor=batch_pool,
+                name="gemini-batcher"
+            )
+        try:
+            for idx, image_bytes, output_base in pages:
+                inflight.acquire()
+                future = slide_pool.submit(
+                    _process_and_notify, on_slide_done,
+                    idx, image_bytes, output_base, timing_per_step, cpu_pool, io_pool,
+                    cancel_event, cache_stats, ocr_batcher, gemini_batcher
+                )
+                future.add_done_callback(lambda _: inflight.release())
+                futures.append((idx, future))
+            results = [future.result() for _, future in sorted(futures, key=lambda item: item[0])]
+        finally:
+            for batcher in (ocr_batcher, gemini_batcher):
+                if batcher is not None:
+                    batcher.close()
+    return results
+
+def process_pdf_pipeline(
+    pdf_path: str,
+    session_dir: str,
+    concurrent: Optional[bool] = None,
+    cpu_workers: Optional[int] = None,
+    io_workers: Optional[int] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_total: Optional[Callable[[int], None]] = None,
+    on_slide_done: Optional[Callable[[Dict], None]] = None
+):
+    """
+    PDF -> 슬라이드별 OCR/정리/재정렬 파이프라인
+    - cancel_event: 설정되면 남은 슬라이드/단계를 건너뜀
+    - on_total / on_slide_done: 작업 진행률 보고용 콜백 (백그라운드 작업에서 사용)
+    """
     timing_per_step = {
-        "upscale": [],
+        "render": [],
         "ocr": [],
         "clean": [],
         "gemini": []
     }
-    
-    image_paths = pdf_to_images(pdf_path, session_dir)
-    results = []
-    
-    upscaled_paths, ocr_json_paths, cleaned_txt_paths = [], [], []
-
-    for idx, image_path in enumerate(image_paths, start=1):
-        # upscale
-        start = time.perf_counter()
-        try:
-            upscaled_path = upscale_image(image_path, 1.5)
-            upscaled_paths.append(upscaled_path)
-            timing_per_step["upscale"].append(time.perf_counter() - start)
-        except Exception as e:
-            print(f"[ERR] {idx}번째 슬라이드 업스케일 처리 중 문제 발생: {e}")
-            upscaled_path = None
-
-        # OCR
-        start = time.perf_counter()
-        try:
-            if upscaled_path:
-                ocr_json_path = run_document_text_detection(upscaled_path)
-                ocr_json_paths.append(ocr_json_path)
-                timing_per_step["ocr"].append(time.perf_counter() - start)
-            else:
-                ocr_json_path = None
-        except Exception as e:
-            print(f"[ERR] {idx}번째 슬라이드 OCR 처리 중 문제 발생: {e}")
-            ocr_json_path = None
-
-        # llm 전달 전처리
-        start = time.perf_counter()
-        try:
-            if ocr_json_path:
-                cleaned_txt_path = process_cleaning(ocr_json_path)
-                cleaned_txt_paths.append(cleaned_txt_path)
-                timing_per_step["clean"].append(time.perf_counter() - start)
-            else:
-                cleaned_txt_path = None
-        except Exception as e:
-            print(f"[ERR] {idx}번째 슬라이드 Cleaning 처리 중 문제 발생: {e}")
-            cleaned_txt_path = None
+    if concurrent is None:
+        concurrent = OCR_PIPELINE_CONCURRENT
 
-        # gemini
-        start = time.perf_counter()
-        try:
-            if cleaned_txt_path:
-                gemini_json_path = process_gemini_reorder(cleaned_txt_path, idx)
-                timing_per_step["gemini"].append(time.perf_counter() - start)
-            else:
-                gemini_json_path = None
-        except Exception as e:
-            print(f"[ERR] {idx}번째 슬라이드 Gemini 처리 중 문제 발생: {e}")
-            gemini_json_path = None
+    cache_stats = CacheStats()
 
-        results.append({
-            "slide": idx,
-            "image": upscaled_path,
-            "ocr_json": ocr_json_path,
-            "cleaned_txt": cleaned_txt_path,
-            "gemini_json": gemini_json_path
-        })
+    start_wall = time.perf_counter()
+    if on_total is not None:
+        on_total(get_page_count(pdf_path))
+
+    # 페이지를 한 장씩 목표 해상도로 렌더링/인코딩하면서 바로 파이프라인에 투입
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    def _pages():
+        # 렌더링은 윈도우 단위라 next() 한 번에 여러 장이 렌더링될 수 있으므로 페이지별 시간은 렌더러가 기록
+        for idx, image_bytes in iter_pdf_page_bytes(pdf_path, render_times=timing_per_step["render"]):
+            if _is_cancelled(cancel_event):
+                break
+            yield idx, image_bytes, os.path.join(session_dir, f"{pdf_name}-{idx:02d}")
+
+    if concurrent:
+        results = _run_concurrent(
+            _pages(),
+            timing_per_step,
+            cpu_workers or OCR_CPU_WORKERS,
+            io_workers or OCR_IO_WORKERS,
+            cancel_event,
+            on_slide_done,
+            cache_stats
+        )
+    else:
+        results = []
+        for idx, image_bytes, output_base in _pages():
+            result = _process_slide(idx, image_bytes, output_base, timing_per_step, cancel_event=cancel_event, cache_stats=cache_stats)
+            results.append(result)
+            _notify_slide_done(on_slide_done, result)
 
     # 최종 파일 제외하고 임시파일 삭제
-    for path in image_paths + [p for p in upscaled_paths if p] + [p for p in ocr_json_paths if p] + [p for p in cleaned_txt_paths if p]:
-        remove_file_safely(path)
+    for result in results:
+        for path in (result["ocr_json"], result["cleaned_txt"]):
+            if path:
+                remove_file_safely(path)
 
-        
     # 삭제된 임시파일들은 results에서 삭제
     for result in results:
-        result.pop("image", None)      # upscaled_path가 저장되어 있음
         result.pop("ocr_json", None)
         result.pop("cleaned_txt", None)
-        
+
+    wall_clock = time.perf_counter() - start_wall
+
     # 단계별 시간 평균 계산 (실패한 단계 제외)
     timing_summary = {}
+    stage_time_sum = 0.0
     for step, times in timing_per_step.items():
         valid_times = [t for t in times if t is not None]
+        stage_time_sum += sum(valid_times)
         timing_summary[f"{step}_avg"] = round(sum(valid_times)/len(valid_times), 3) if valid_times else 0.0
 
-    return results, timing_summary
\ No newline at end of file
+    # 병렬 효과 확인용: 실제 경과 시간 vs 단계 시간 합
+    timing_summary["concurrent"] = concurrent
+    timing_summary["pipeline_wall_clock"] = round(wall_clock, 3)
+    timing_summary["stage_time_sum"] = round(stage_time_sum, 3)
+    timing_summary["speedup"] = round(stage_time_sum / wall_clock, 2) if wall_clock > 0 else 0.0
+    # OCR/Gemini 결과 캐시 적중/미스 수
+    timing_summary.update(cache_stats.to_dict())
+
+    return results, timing_summary
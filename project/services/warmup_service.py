@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+# 워커 역할별로 미리 로드할 서브시스템
+# - ocr: OCR 작업 전용 워커 / chat: 챗·벡터 검색 전용 워커 / all: 전부
+ROLE_SUBSYSTEMS = {
+    "all": ["embedding", "reranker", "vectordb", "redis", "vision", "gemini"],
+    "chat": ["embedding", "reranker", "vectordb", "redis", "gemini"],
+    "ocr": ["vision", "gemini"],
+    "none": [],
+}
+
+WORKER_ROLE = os.getenv("WORKER_ROLE", "all").strip().lower()
+
+def _warm_embedding() -> None:
+    from services.embedding.embedding_service import get_embedding_model
+    # 모델 로드 + 첫 추론(그래프/커널 초기화)까지 미리 수행
+    get_embedding_model().embed_documents(["warm-up"])
+
+def _warm_reranker() -> None:
+    from services.embedding.rerank_service import RERANKER, _get_cross_encoder
+    # embedding 재순위화는 임베딩 모델을 같이 쓰므로 cross-encoder만 따로 로드
+    if RERANKER == "cross-encoder":
+        _get_cross_encoder()
+
+def _warm_vectordb() -> None:
+    from services.embedding.vector_db_service import VECTOR_BACKEND, get_pinecone_client
+    # 로컬 백엔드는 namespace별로 처음 검색할 때 디스크에서 읽음
+    if VECTOR_BACKEND == "pinecone":
+        get_pinecone_client()
+
+def _warm_redis() -> None:
+    from services.chat.history_service import _get_redis_client
+    _get_redis_client().ping()
+
+def _warm_vision() -> None:
+    from services.ocr.ocr_service import get_vision_client
+    get_vision_client()
+
+def _warm_gemini() -> None:
+    from services.llm.gemini_client import _get_sync_client
+    _get_sync_client()
+
+SUBSYSTEMS: Dict[str, Callable[[], None]] = {
+    "embedding": _warm_embedding,
+    "reranker": _warm_reranker,
+    "vectordb": _warm_vectordb,
+    "redis": _warm_redis,
+    "vision": _warm_vision,
+    "gemini": _warm_gemini,
+}
+
+def get_preload_subsystems() -> List[str]:
+    """
+    PRELOAD_SUBSYSTEMS(쉼표 구분)가 있으면 그대로, 없으면 WORKER_ROLE 기본값
+    """
+    raw = os.getenv("PRELOAD_SUBSYSTEMS")
+    if raw is not None:
+        names = [name.strip().lower() for name in raw.split(",") if name.strip()]
+    else:
+        if WORKER_ROLE not in ROLE_SUBSYSTEMS:
+            print(f"[WARN] 알 수 없는 WORKER_ROLE={WORKER_ROLE}, 'all'로 처리")
+        names = ROLE_SUBSYSTEMS.get(WORKER_ROLE, ROLE_SUBSYSTEMS["all"])
+    unknown = [name for name in names if name not in SUBSYSTEMS]
+    if unknown:
+        print(f"[WARN] 알 수 없는 서브시스템 무시: {unknown}")
+    return [name for name in names if name in SUBSYSTEMS]
+
+_status: Dict[str, Dict] = {}
+_status_lock = threading.Lock()
+_finished = threading.Event()
+
+def warm_up(subsystems: List[str]) -> None:
+    """
+    서브시스템을 순서대로 초기화하고 각각 걸린 시간 기록
+    """
+    with _status_lock:
+        for name in subsystems:
+            _status[name] = {"state": "pending"}
+
+    for name in subsystems:
+        with _status_lock:
+            _status[name] = {"state": "loading"}
+        start = time.perf_counter()
+        try:
+            SUBSYSTEMS[name]()
+            elapsed = round(time.perf_counter() - start, 3)
+            print(f"[STARTUP] {name} 준비 완료 ({elapsed}s)")
+            with _status_lock:
+                _status[name] = {"state": "ready", "seconds": elapsed}
+        except Exception as e:
+            elapsed = round(time.perf_counter() - start, 3)
+            print(f"[STARTUP] {name} 초기화 실패 ({elapsed}s): {e}")
+            with _status_lock:
+                _status[name] = {"state": "failed", "seconds": elapsed, "error": str(e)}
+    _finished.set()
+
+def get_readiness() -> Dict:
+    with _status_lock:
+        status = {name: dict(info) for name, info in _status.items()}
+    ready = _finished.is_set() and all(info["state"] == "ready" for info in status.values())
+    return {
+        "ready": ready,
+        "role": WORKER_ROLE,
+        "subsystems": status
+    }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# project 디렉토리를 import 경로에 추가 (services/utils/scripts를 앱과 같은 방식으로 import)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from cachetools import LRUCache
+
+from scripts import gemini_stub_server
+from services.chat import chat_service, context_cache_service
+from services.embedding.document_loader import iter_slide_documents_from_folder
+from services.llm import gemini_client
+
+USER_ID = "u1"
+DECK = "deck1"
+
+def _slides(count: int):
+    return [
+        {"slide_number": i, "title": f"제목 {i}", "text": " ".join(f"개념{i}-{j} 설명 문장입니다." for j in range(40))}
+        for i in range(1, count + 1)
+    ]
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+    """
+    지연 없는 스텁 서버를 띄우고 Gemini 클라이언트/컨텍스트 캐시가 그 서버와 임시 슬라이드 폴더를 쓰도록 바꿈
+    """
+    gemini_stub_server._config.update(
+        base_latency_ms=0, ms_per_1k_input=0, ms_per_1k_cached=0, ms_per_chunk=0, min_cache_tokens=256, verbose=False
+    )
+    gemini_stub_server._caches.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), gemini_stub_server._Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base = f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+    monkeypatch.setattr(gemini_client, "GEMINI_API_BASE", base)
+    monkeypatch.setattr(gemini_client, "API_URL", f"{base}/models/{gemini_client.GEMINI_MODEL}:generateContent")
+    monkeypatch.setattr(gemini_client, "STREAM_API_URL", f"{base}/models/{gemini_client.GEMINI_MODEL}:streamGenerateContent")
+    monkeypatch.setattr(gemini_client, "CACHED_CONTENTS_URL", f"{base}/cachedContents")
+
+    deck_dir = tmp_path / USER_ID / DECK
+    deck_dir.mkdir(parents=True)
+    (deck_dir / "lecture_gemini_reorder.json").write_text(json.dumps(_slides(10), ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(context_cache_service, "SLIDES_BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(context_cache_service, "CONTEXT_CACHE_MIN_TOKENS", 256)
+    monkeypatch.setattr(context_cache_service, "_handles", LRUCache(maxsize=16))
+    monkeypatch.setattr(context_cache_service, "_locks", LRUCache(maxsize=16))
+    monkeypatch.setattr(context_cache_service, "_usage", LRUCache(maxsize=16))
+    monkeypatch.setattr(context_cache_service, "_generations", {})
+
+    # 히스토리 저장은 Redis 대신 메모리에 기록
+    turns = []
+    async def _append_turn(user_id, session_id, query, answer):
+        turns.append((user_id, session_id, query, answer))
+    monkeypatch.setattr(chat_service, "aappend_turn", _append_turn)
+    monkeypatch.setattr(chat_service, "CONTEXT_CACHE_ENABLED", True)
+    try:
+        yield turns
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def _run(coro):
+    # 클라이언트는 이벤트 루프에 묶이므로 같은 루프 안에서 닫음
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await gemini_client.aclose_gemini_clients()
+    return asyncio.run(_main())
+
+def _context_chunks():
+    documents = list(iter_slide_documents_from_folder(os.path.join(context_cache_service.SLIDES_BASE_DIR, USER_ID), DECK))
+    return [(doc.page_content, 1.0 - i * 0.1) for i, doc in enumerate(documents[:3])]
+
+async def _ask(deck, timing):
+    chunks = _context_chunks()
+    return await chat_service.chat_with_llm(
+        user_id=USER_ID,
+        session_id="s1",
+        query="개념 2를 다시 설명해줘",
+        context="\n\n".join(text for text, _ in chunks),
+        n_turns=0,
+        recent_pairs=[],
+        context_chunks=chunks,
+        deck=deck,
+        timing=timing
+    )
+
+def test_cache_hit_sends_fewer_uncached_input_tokens(stub):
+    plain, created, hit = {}, {}, {}
+
+    async def scenario():
+        await _ask(None, plain)
+        await _ask(DECK, created)
+        await _ask(DECK, hit)
+    _run(scenario())
+
+    assert created["context_cache"] == "created"
+    assert hit["context_cache"] == "hit"
+    assert len(gemini_stub_server._caches) == 1
+    plain_usage, hit_usage = plain["gemini_usage"], hit["gemini_usage"]
+    assert plain_usage["cached_tokens"] == 0
+    assert hit_usage["cached_tokens"] > 0
+    # 캐시 적중 턴은 매 턴 보내는(캐시되지 않은) 입력 토큰이 일반 호출보다 적어야 함
+    assert hit_usage["prompt_tokens"] - hit_usage["cached_tokens"] < plain_usage["prompt_tokens"]
+    assert all(turn[3] != chat_service.FALLBACK_ANSWER for turn in stub)
+
+def test_stale_cache_404_falls_back_to_plain_prompt(stub):
+    first, second = {}, {}
+
+    async def scenario():
+        await _ask(DECK, first)
+        # 서버 쪽에서 캐시가 먼저 만료/삭제된 상황
+        name = context_cache_service._handles[(USER_ID, DECK)]["name"]
+        await gemini_client.delete_cached_content(name)
+        return await _ask(DECK, second)
+    answer = _run(scenario())
+
+    assert first["context_cache"] == "created"
+    assert second["context_cache"] == "fallback"
+    assert answer != chat_service.FALLBACK_ANSWER
+    assert second["gemini_usage"]["cached_tokens"] == 0
+    assert (USER_ID, DECK) not in context_cache_service._handles
+    assert [turn[3] for turn in stub] == [stub[0][3], answer]
+
+def test_invalidate_user_drops_handles(stub):
+    async def scenario():
+        await _ask(DECK, {})
+        # 다른 사용자의 핸들은 그대로 남아야 함
+        context_cache_service._handles[("u2", DECK)] = {"name": None, "expires_at": 0, "slide_keys": set(), "tokens": 0}
+        return await context_cache_service.invalidate_user(USER_ID)
+    dropped = _run(scenario())
+
+    assert dropped == 1
+    assert [key for key in context_cache_service._handles.keys() if key[0] == USER_ID] == []
+    assert ("u2", DECK) in context_cache_service._handles
+    assert not any(key[0] == USER_ID for key in context_cache_service._usage.keys())
+    assert gemini_stub_server._caches == {}
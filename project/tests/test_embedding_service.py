@@ -0,0 +1,69 @@
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from services.embedding.embedding_service import EmbeddingService, normalize_query
+
+class _RecordingEmbedding(DeterministicFakeEmbedding):
+    """
+    모델에 실제로 들어간 입력을 기록하는 가짜 임베딩 (같은 텍스트 → 같은 벡터)
+    """
+    inputs: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.inputs.extend(texts)
+        return super().embed_documents(texts)
+
+@pytest.fixture
+def service():
+    base = _RecordingEmbedding(size=8, inputs=[])
+    svc = EmbeddingService(base)
+    try:
+        yield svc
+    finally:
+        svc._batcher.close()
+
+def test_cached_result_equals_uncached_embedding(service):
+    reference = DeterministicFakeEmbedding(size=8)
+    query = "  역전파  알고리즘을 설명해줘 "
+
+    first = service.embed_query(query)
+    second = service.embed_query(query)
+
+    # 캐시 도입 전과 같은 입력(원문)으로 계산한 결과와 같아야 함
+    assert first == reference.embed_documents([query])[0]
+    assert second == first
+    assert service.base.inputs == [query]
+    metrics = service.get_metrics()
+    assert metrics["query_calls"] == 2
+    assert metrics["query_cache_hits"] == 1
+    assert metrics["forward_passes"] == 1
+
+def test_normalized_variants_share_one_entry(service):
+    composed = "한글 질문"
+    decomposed = "한글  질문\n"
+    assert normalize_query(composed) == normalize_query(decomposed)
+
+    first = service.embed_query(composed)
+    assert service.embed_query(decomposed) == first
+    assert service.base.inputs == [composed]
+    assert service.get_metrics()["query_cache_size"] == 1
+
+def test_cache_returns_copies(service):
+    vector = service.embed_query("경사 하강법")
+    vector[0] = 123.0
+    assert service.embed_query("경사 하강법")[0] != 123.0
+
+def test_concurrent_queries_match_sequential(service):
+    queries = [f"질문 {i % 5}" for i in range(40)]
+    reference = DeterministicFakeEmbedding(size=8)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(service.embed_query, queries))
+
+    assert results == [reference.embed_documents([q])[0] for q in queries]
+    # 모델에는 원문만 들어감 (같은 질문이 동시에 들어오면 두 번 계산될 수는 있음)
+    assert set(service.base.inputs) == set(queries)
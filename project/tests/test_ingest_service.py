@@ -0,0 +1,105 @@
+import json
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from services.embedding import embedding_service, ingest_service, lexical_index, local_vector_store, vector_db_service
+from services.embedding.embedding_service import EmbeddingService
+
+INDEX_NAME = "test-index"
+USER_ID = "u1"
+DECK = "deck1"
+FILE_NAME = "lecture_gemini_reorder.json"
+
+def _write_deck(user_base_dir, slides):
+    deck_dir = user_base_dir / DECK
+    deck_dir.mkdir(parents=True, exist_ok=True)
+    data = [{"slide_number": number, "title": f"제목 {number}", "text": text} for number, text in slides]
+    (deck_dir / FILE_NAME).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+def _ingest(user_base_dir, force=False):
+    return ingest_service.ingest_folder(INDEX_NAME, USER_ID, str(user_base_dir), DECK, force=force)
+
+def _stored_ids():
+    vector_store = vector_db_service.get_vector_store(INDEX_NAME, namespace=USER_ID)
+    return vector_store.ids_matching(lambda metadata: True, namespace=USER_ID)
+
+@pytest.fixture
+def user_base_dir(monkeypatch, tmp_path):
+    """
+    local 벡터 백엔드 + 가짜 임베딩 모델로 임시 디렉토리에 적재
+    """
+    monkeypatch.setattr(vector_db_service, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(local_vector_store, "VECTOR_LOCAL_DIR", str(tmp_path / "vector_store"))
+    monkeypatch.setattr(local_vector_store, "_namespaces", {})
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical_index"))
+    monkeypatch.setattr(lexical_index, "_indexes", {})
+    model = EmbeddingService(DeterministicFakeEmbedding(size=8))
+    monkeypatch.setattr(embedding_service, "_embedding_model", model)
+    vector_db_service.invalidate_vector_store(INDEX_NAME)
+    try:
+        yield tmp_path / "output" / USER_ID
+    finally:
+        vector_db_service.invalidate_vector_store(INDEX_NAME)
+        model._batcher.close()
+
+def test_reingest_is_idempotent(user_base_dir):
+    _write_deck(user_base_dir, [(1, "첫 슬라이드"), (2, "두 번째 슬라이드"), (3, "세 번째 슬라이드")])
+
+    first = _ingest(user_base_dir)
+    assert (first["added"], first["updated"], first["skipped"], first["deleted"]) == (3, 0, 0, 0)
+    ids = _stored_ids()
+    assert len(ids) == len(set(ids)) == 3
+    assert sorted(ids) == sorted(first["upserted_ids"])
+
+    second = _ingest(user_base_dir)
+    assert (second["added"], second["updated"], second["skipped"], second["deleted"]) == (0, 0, 3, 0)
+    assert second["upserted_ids"] == []
+    assert sorted(_stored_ids()) == sorted(ids)
+
+    # force는 다시 임베딩·업서트하지만 ID가 같으므로 중복이 생기지 않음
+    forced = _ingest(user_base_dir, force=True)
+    assert forced["updated"] == 3
+    assert sorted(forced["upserted_ids"]) == sorted(ids)
+    assert sorted(_stored_ids()) == sorted(ids)
+
+def test_changed_and_removed_slides(user_base_dir):
+    _write_deck(user_base_dir, [(1, "첫 슬라이드"), (2, "두 번째 슬라이드"), (3, "세 번째 슬라이드")])
+    first = _ingest(user_base_dir)
+    kept_id = first["upserted_ids"][0]
+
+    _write_deck(user_base_dir, [(1, "첫 슬라이드"), (2, "고친 두 번째 슬라이드")])
+    result = _ingest(user_base_dir)
+
+    assert (result["added"], result["updated"], result["skipped"], result["deleted"]) == (0, 1, 1, 1)
+    assert len(result["upserted_ids"]) == 1
+    ids = _stored_ids()
+    assert len(ids) == len(set(ids)) == 2
+    # 바뀐 슬라이드의 이전 ID와 사라진 슬라이드의 ID는 남지 않음
+    assert set(ids) == {kept_id, *result["upserted_ids"]}
+    vector_store = vector_db_service.get_vector_store(INDEX_NAME, namespace=USER_ID)
+    texts = sorted(doc.page_content for doc in vector_store.get_by_ids(ids, namespace=USER_ID))
+    assert texts == ["[슬라이드 1] 제목 1\n첫 슬라이드", "[슬라이드 2] 제목 2\n고친 두 번째 슬라이드"]
+
+def test_first_ingest_purges_legacy_vectors(user_base_dir):
+    # 결정적 ID 도입 이전 방식: 랜덤 ID, metadata에 deck 없음
+    vector_store = vector_db_service.get_vector_store(INDEX_NAME, namespace=USER_ID)
+    vector_store.add_embeddings(
+        ["[슬라이드 1] 제목 1\n첫 슬라이드", "[슬라이드 1] 다른 파일"],
+        [[1.0] * 8, [0.5] * 8],
+        [{"slide_number": 1, "file": FILE_NAME}, {"slide_number": 1, "file": "other_gemini_reorder.json"}],
+        ["legacy-1", "legacy-other"],
+        namespace=USER_ID
+    )
+    _write_deck(user_base_dir, [(1, "첫 슬라이드")])
+
+    result = _ingest(user_base_dir)
+
+    assert result["legacy_deleted"] == 1
+    ids = _stored_ids()
+    assert "legacy-1" not in ids
+    # 이 덱의 파일이 아닌 이전 벡터는 건드리지 않음
+    assert "legacy-other" in ids
+    assert sorted(ids) == sorted(result["upserted_ids"] + ["legacy-other"])
+    # 두 번째 적재부터는 manifest에 덱이 있으므로 다시 찾지 않음
+    assert _ingest(user_base_dir)["legacy_deleted"] == 0
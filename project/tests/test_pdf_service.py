@@ -0,0 +1,78 @@
+import io
+import shutil
+
+import pytest
+from PIL import Image
+
+from services.ocr import pdf_service
+
+# 가짜 페이지 크기 (인치), 렌더링 결과는 dpi에 비례
+_PAGE_INCHES = (2, 1)
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    """
+    poppler 없이 렌더링 호출을 기록하는 가짜 convert_from_path (페이지 3장)
+    """
+    calls = []
+
+    def _convert(pdf_path, dpi, first_page, last_page, **kwargs):
+        calls.append({"dpi": dpi, "pages": list(range(first_page, last_page + 1)), "grayscale": kwargs.get("grayscale", False)})
+        size = (int(_PAGE_INCHES[0] * dpi), int(_PAGE_INCHES[1] * dpi))
+        return [Image.new("RGB", size, "white") for _ in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(pdf_service, "convert_from_path", _convert)
+    monkeypatch.setattr(pdf_service, "get_page_count", lambda pdf_path: 3)
+    return calls
+
+def _decode(content: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(content))
+
+def test_renders_each_page_once_at_target_dpi(fake_pdf):
+    render_times = []
+    pages = list(pdf_service.iter_pdf_page_bytes("deck.pdf", fmt="PNG", adaptive=False, render_times=render_times))
+
+    assert [idx for idx, _ in pages] == [1, 2, 3]
+    # 확대 단계 없이 목표 DPI로 한 번만 렌더링
+    assert {call["dpi"] for call in fake_pdf} == {pdf_service.OCR_RENDER_DPI}
+    assert sorted(page for call in fake_pdf for page in call["pages"]) == [1, 2, 3]
+    assert len(render_times) == 3
+    for _, content in pages:
+        img = _decode(content)
+        assert img.format == "PNG"
+        assert img.size == (int(_PAGE_INCHES[0] * pdf_service.OCR_RENDER_DPI), int(_PAGE_INCHES[1] * pdf_service.OCR_RENDER_DPI))
+
+def test_default_dpi_matches_old_render_and_upscale():
+    # 이전 파이프라인: 300 DPI 렌더링 후 1.5배 확대
+    assert pdf_service.OCR_RENDER_DPI == int(300 * 1.5)
+
+def test_adaptive_renders_each_page_once_after_probe(fake_pdf):
+    pages = list(pdf_service.iter_pdf_page_bytes("deck.pdf", fmt="PNG", adaptive=True))
+
+    assert [idx for idx, _ in pages] == [1, 2, 3]
+    probes = [call for call in fake_pdf if call["grayscale"]]
+    renders = [call for call in fake_pdf if not call["grayscale"]]
+    assert [call["pages"] for call in probes] == [[1], [2], [3]]
+    assert [call["pages"] for call in renders] == [[1], [2], [3]]
+    # 흰 페이지는 글자 밀도가 0이라 최소 DPI
+    assert {call["dpi"] for call in renders} == {pdf_service.OCR_MIN_DPI}
+
+def test_png_encoding_is_lossless():
+    img = Image.new("RGB", (64, 32))
+    img.putdata([(x * 4 % 256, y * 8 % 256, (x + y) % 256) for y in range(32) for x in range(64)])
+    decoded = _decode(pdf_service.encode_image(img, "PNG"))
+    assert decoded.format == "PNG"
+    assert decoded.convert("RGB").tobytes() == img.tobytes()
+
+@pytest.mark.skipif(shutil.which("pdftoppm") is None, reason="poppler(pdftoppm)가 설치되어 있지 않음")
+def test_direct_render_matches_upscaled_size(tmp_path):
+    pdf_path = tmp_path / "deck.pdf"
+    Image.new("RGB", (200, 100), "white").save(pdf_path, "PDF", resolution=100)
+
+    direct = [_decode(content) for _, content in pdf_service.iter_pdf_page_bytes(str(pdf_path), dpi=450, fmt="PNG", adaptive=False)]
+    old = [img for _, img in pdf_service.iter_pdf_pages(str(pdf_path), dpi=300)]
+
+    assert len(direct) == len(old) == 1
+    expected = (int(old[0].width * 1.5), int(old[0].height * 1.5))
+    assert abs(direct[0].width - expected[0]) <= 1
+    assert abs(direct[0].height - expected[1]) <= 1
@@ -0,0 +1,93 @@
+import pytest
+
+from services.chat import prompt_service
+from services.chat.prompt_service import assemble_prompt, select_context_chunks, select_history
+from services.chat.summary_service import format_history_for_prompt
+from utils.token_utils import estimate_tokens, truncate_to_tokens
+
+def _slide(number: int, words: int = 30) -> str:
+    return f"[슬라이드 {number}] 제목 {number}\n" + " ".join(f"내용{number}-{i}" for i in range(words))
+
+@pytest.mark.parametrize("max_tokens", [1, 2, 5, 17, 100])
+def test_truncate_stays_within_limit(max_tokens):
+    text = "긴 문장입니다. long sentence " * 50
+    truncated = truncate_to_tokens(text, max_tokens)
+    assert estimate_tokens(truncated) <= max_tokens
+    assert truncate_to_tokens("짧음", 100) == "짧음"
+
+def test_context_chunks_drop_near_duplicates():
+    original = _slide(1)
+    # 공백/대소문자만 다른 같은 슬라이드
+    duplicate = original.replace(" ", "  ").upper()
+    chunks = [(original, 0.9), (duplicate, 0.8), (_slide(2), 0.7)]
+    stats = {}
+
+    selected = select_context_chunks(chunks, budget=10_000, stats=stats)
+
+    assert selected == [original, _slide(2)]
+    assert stats == {"context_chunks_deduped": 1, "context_chunks_dropped": 0}
+
+def test_context_chunks_respect_budget_by_score():
+    chunks = [(_slide(i), score) for i, score in [(1, 0.2), (2, 0.9), (3, 0.5), (4, 0.7)]]
+    budget = estimate_tokens(_slide(2)) + estimate_tokens(_slide(4))
+    stats = {}
+
+    selected = select_context_chunks(chunks, budget=budget, stats=stats)
+
+    assert selected == [_slide(2), _slide(4)]
+    assert sum(estimate_tokens(text) for text in selected) <= budget
+    assert stats["context_chunks_dropped"] == 2
+
+def test_oversized_top_chunk_is_truncated_into_budget():
+    big = _slide(1, words=2000)
+    selected = select_context_chunks([(big, 0.9), (_slide(2), 0.5)], budget=100)
+
+    assert len(selected) == 1
+    assert big.startswith(selected[0].rstrip(" …"))
+    assert estimate_tokens(selected[0]) <= 100
+
+def test_history_keeps_latest_turns_within_budget():
+    pairs = [(f"질문 {i} " * 10, f"답변 {i} " * 20) for i in range(10)]
+    budget = estimate_tokens(format_history_for_prompt(pairs[-3:]))
+    stats = {}
+
+    kept, summary = select_history(pairs, None, budget, stats)
+
+    # 오래된 턴부터 버리고, 남은 턴은 원래 순서 유지
+    assert kept == pairs[-len(kept):]
+    assert 1 <= len(kept) <= 3
+    assert summary is None
+    assert stats["history_turns_dropped"] == len(pairs) - len(kept)
+    assert estimate_tokens(format_history_for_prompt(kept, summary)) <= budget
+
+@pytest.mark.parametrize("budget", [20, 50, 200, 500])
+def test_oversized_latest_turn_and_summary_fit_budget(budget):
+    pairs = [("짧은 질문", "짧은 답"), ("긴 질문 " * 300, "긴 답변 " * 400)]
+
+    kept, summary = select_history(pairs, "요약 " * 500, budget)
+
+    # 가장 최근 턴은 잘라서라도 유지 (예산이 머리말보다 작으면 버림)
+    if budget >= 50:
+        assert len(kept) == 1
+        assert kept[0][0].startswith("긴 질문")
+    assert estimate_tokens(format_history_for_prompt(kept, summary)) <= budget
+
+def test_assemble_prompt_records_sections(monkeypatch):
+    monkeypatch.setattr(prompt_service, "PROMPT_CONTEXT_BUDGET", estimate_tokens(_slide(1)))
+    timing = {}
+
+    prompt = assemble_prompt(
+        lambda history_block, context_text, query_text: f"지시문\n{history_block}\n{context_text}\n{query_text}",
+        "질문",
+        history_pairs=[("이전 질문", "이전 답")],
+        context_chunks=[(_slide(1), 0.9), (_slide(1), 0.8), (_slide(2), 0.5)],
+        timing=timing
+    )
+
+    assert _slide(1) in prompt and _slide(2) not in prompt
+    assert timing["context_chunks_deduped"] == 1
+    assert timing["context_chunks_dropped"] == 1
+    assert timing["history_turns_dropped"] == 0
+    sections = timing["prompt_tokens_by_section"]
+    assert sections["context"] <= prompt_service.PROMPT_CONTEXT_BUDGET
+    assert timing["prompt_tokens"] == estimate_tokens(prompt)
@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, List, Optional, Tuple
+
+class MicroBatcher:
+    """
+    여러 스레드에서 들어오는 단건 요청을 짧은 시간 동안 모아 한 번에 처리
+    - fn: 입력 리스트를 받아 같은 순서의 결과 리스트를 반환 (항목별 실패는 Exception 객체로 반환)
+    - max_batch_size개가 모이거나 max_wait초가 지나면 배치 실행
+    - executor를 주면 배치를 그 풀에서 실행 (여러 배치 동시 처리), 없으면 배처 스레드에서 순차 실행
+    """
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait: float = 0.05,
+        executor: Optional[Executor] = None,
+        name: str = "batcher"
+    ):
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.executor = executor
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        if self._closed:
+            raise RuntimeError("이미 종료된 배처입니다.")
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _collect(self, first: Tuple[Any, Future]) -> Tuple[List[Tuple[Any, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run_batch(self, batch: List[Tuple[Any, Future]]) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = self.fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"배치 결과 수 불일치: {len(results)} != {len(items)}")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            if self.executor is not None:
+                self.executor.submit(self._run_batch, batch)
+            else:
+                self._run_batch(batch)
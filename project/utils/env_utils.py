@@ -8,3 +8,38 @@ GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 
 if not GOOGLE_KEY or not GEMINI_KEY:
     print("[WARN] 환경 변수가 설정되지 않았습니다. .env 파일을 확인하세요.")
+
+def get_int_env(name: str, default: int) -> int:
+    """
+    정수형 환경변수 읽기 (미설정/파싱 실패 시 기본값)
+    """
+    raw = os.getenv(name, "").strip()
+    if raw == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        print(f"[WARN] 환경변수 {name}={raw!r} 를 정수로 해석할 수 없어 기본값 {default} 사용")
+        return default
+
+def get_float_env(name: str, default: float) -> float:
+    """
+    실수형 환경변수 읽기 (미설정/파싱 실패 시 기본값)
+    """
+    raw = os.getenv(name, "").strip()
+    if raw == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        print(f"[WARN] 환경변수 {name}={raw!r} 를 실수로 해석할 수 없어 기본값 {default} 사용")
+        return default
+
+def get_bool_env(name: str, default: bool) -> bool:
+    """
+    불리언 환경변수 읽기 (1/true/yes/on 이면 True)
+    """
+    raw = os.getenv(name, "").strip().lower()
+    if raw == "":
+        return default
+    return raw in ("1", "true", "yes", "on")
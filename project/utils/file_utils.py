@@ -1,6 +1,9 @@
 import os
 from datetime import datetime
 
+# 사용자별 슬라이드 JSON 폴더의 루트 ({SLIDES_BASE_DIR}/{user_id}/{date_folder}), 벡터 DB 적재와 컨텍스트 캐시가 함께 사용
+SLIDES_BASE_DIR = os.getenv("SLIDES_BASE_DIR", "/app/output")
+
 def create_session_dir(root: str = "output", user_id: str = None) -> str:
     timestamp = datetime.now().strftime("%y%m%d-%H%M%S")
     if user_id:
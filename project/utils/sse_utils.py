@@ -0,0 +1,9 @@
+import json
+from typing import Any
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    Server-Sent Events 형식의 이벤트 문자열 (data는 JSON으로 직렬화)
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
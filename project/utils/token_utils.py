@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+# 프롬프트 토큰 수 추정 (예산 계산용이라 정확할 필요는 없음)
+# - tiktoken이 있으면 cl100k_base 기준, 없으면 문자 수 기반 근사 (영문 4자 ≈ 1토큰, 한글 1자 ≈ 1토큰)
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"[WARN] tiktoken을 사용할 수 없어 문자 수로 토큰 추정: {e}")
+        return None
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+def truncate_to_tokens(text: str, max_tokens: int, suffix: str = " …") -> str:
+    """
+    토큰 수 상한에 맞게 뒤를 잘라냄 (잘렸으면 suffix 추가, suffix까지 합쳐 상한을 넘지 않음)
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        limit = max_tokens - estimate_tokens(suffix)
+        # 토큰 경계에서 자르면 (한글 글자 중간 등) 다시 셀 때 늘어날 수 있으므로 상한 안에 들 때까지 줄임
+        while limit > 0:
+            truncated = encoding.decode(tokens[:limit]) + suffix
+            if estimate_tokens(truncated) <= max_tokens:
+                return truncated
+            limit -= 1
+        return ""
+    # 근사 추정일 때는 이분 탐색으로 글자 수 결정
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid] + suffix) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + suffix if lo else ""